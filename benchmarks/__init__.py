@@ -0,0 +1,6 @@
+"""
+Benchmarks of the speed of the package: model loading, inference, treatment, backdoor paths, deconfounding sets and
+identification, on the bundled models and on seeded synthetic models of increasing size.
+
+Run with: python -m benchmarks --help
+"""
@@ -0,0 +1,51 @@
+from argparse import ArgumentParser
+from json import dump
+from pathlib import Path
+
+from .suite import BENCHMARKS, run_suite, scaling
+
+
+def main(argv=None):
+
+    parser = ArgumentParser(prog="python -m benchmarks", description="Benchmark the do-calculus package.")
+    parser.add_argument("--models", type=Path, default=Path("models"), help="a directory of models to benchmark")
+    parser.add_argument("--no-models", action="store_true", help="skip the bundled models")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[8, 16, 32, 64], help="vertex counts of the synthetic models")
+    parser.add_argument("--benchmarks", nargs="*", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark")
+    parser.add_argument("--seeds", type=int, default=3, help="synthetic models of each size")
+    parser.add_argument("--budget", type=float, default=5.0, help="seconds after which a run on a synthetic model is stopped, and the benchmark not run on larger models")
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--cardinality", type=int, default=2)
+    parser.add_argument("--latent", type=int, default=0)
+    parser.add_argument("--max-parents", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="a file to write the results to, as JSON")
+    parser.add_argument("--log", action="store_true", help="keep the package's logging enabled")
+    args = parser.parse_args(argv)
+
+    if not args.log:
+        from loguru import logger
+        logger.remove()
+
+    report = run_suite(
+        None if args.no_models else args.models, args.sizes, args.benchmarks, args.repeat, args.seeds, args.budget,
+        args.density, args.cardinality, args.latent, args.max_parents
+    )
+
+    for result in report["results"]:
+        if "parameters" not in result:
+            outcome = f"{result['best'] * 1000:10.3f} ms" if "best" in result else result.get("error", "skipped")
+            print(f"{result['benchmark']:<16} {result['model']:<28} {outcome}")
+
+    for name, curve in scaling(report["results"]).items():
+        print(f"\n{name} (median of best times, by vertices)")
+        for size, t in curve.items():
+            print(f"  {size:>6} {t * 1000:10.3f} ms")
+
+    if args.output:
+        with args.output.open("w") as f:
+            dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
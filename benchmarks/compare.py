@@ -0,0 +1,244 @@
+"""
+Compare every backend on random models and queries, checking that they agree and recording how long each takes and
+how much memory it allocates. Exits with a non-zero status if any backends disagree, or any raises an error other
+than one it is expected to raise (see EXPECTED), so it can gate a release.
+
+Run with: python -m benchmarks.compare --help
+"""
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from itertools import product
+from json import dump
+from pathlib import Path
+from statistics import median
+from sys import exit
+from time import perf_counter
+from tracemalloc import get_traced_memory, is_tracing, reset_peak, start, stop
+from typing import Callable, Dict, List, Optional
+
+from do.API import API
+from do.core.Expression import Expression
+from do.core.Model import Model, from_dict
+from do.core.Variables import Intervention, Outcome
+from do.core.helpers import within_precision
+
+from .generators import random_model, random_query
+from .suite import _metadata
+
+api = API()
+
+# The errors each backend may raise on a query it cannot answer, rather than because it is wrong: an effect may be
+#   unidentifiable, or have no deconfounding set; on a model with latent variables, treat may only find deconfounding
+#   sets containing a latent variable, whose outcomes it cannot sum over
+EXPECTED = {
+    "identification": {"Fail"},
+    "treat": {"NoDeconfoundingSet"},
+}
+
+EXPECTED_LATENT = {
+    "treat": {"MissingVariable"},
+}
+
+
+def enumerate_query(data: dict, head: Dict[str, str], body: Dict[str, str], do: Dict[str, str]) -> float:
+    """
+    A reference backend: compute P(head | body, do) by summing the joint distribution of a model over every
+    assignment of its variables, the tables of the intervened variables being replaced by the interventions. Takes
+    time exponential in the number of variables, and requires a model without latent variables.
+    @param data: A model in the form given to parse_model
+    @param head: A mapping of variable names to outcomes
+    @param body: A mapping of (observed) variable names to outcomes
+    @param do: A mapping of intervened variable names to outcomes
+    @return: The probability
+    """
+    endogenous = data["endogenous"]
+    names = list(endogenous)
+    tables = {name: {tuple(row[:-1]): row[-1] for row in detail["table"]} for name, detail in endogenous.items()}
+
+    joint, evidence = 0.0, 0.0
+
+    for values in product(*[[do[name]] if name in do else endogenous[name]["outcomes"] for name in names]):
+        assignment = dict(zip(names, values))
+        if any(assignment[name] != outcome for name, outcome in body.items()):
+            continue
+
+        p = 1.0
+        for name in names:
+            if name not in do:
+                p *= tables[name][(assignment[name], *[assignment[parent] for parent in endogenous[name]["parents"]])]
+
+        evidence += p
+        if all(assignment[name] == outcome for name, outcome in head.items()):
+            joint += p
+
+    return joint / evidence if evidence else 0.0
+
+
+def run(function: Callable[[], float]) -> dict:
+    """
+    Run one backend, measuring its latency, and then (running it again, with allocations traced, which slows it down
+    considerably) the peak memory it allocates.
+    @return: A dictionary of the result, seconds and peak bytes; or of the name of the exception raised
+    """
+    try:
+        with redirect_stdout(StringIO()):
+            start_time = perf_counter()
+            value = function()
+            seconds = perf_counter() - start_time
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        return {"error": type(e).__name__}
+
+    return {"value": value, "seconds": seconds, "peak_bytes": peak_bytes(function)}
+
+
+def peak_bytes(function: Callable[[], float]) -> int:
+    """
+    @return: The most memory allocated at once while running a function
+    """
+    tracing = is_tracing()
+    if not tracing:
+        start()
+
+    try:
+        reset_peak()
+        before, _ = get_traced_memory()
+        with redirect_stdout(StringIO()):
+            function()
+        _, peak = get_traced_memory()
+    finally:
+        if not tracing:
+            stop()
+
+    return max(peak - before, 0)
+
+
+def unexpected(data: dict, backend: str, outcome: dict) -> bool:
+    """
+    @return: True if a backend raised an error it is not expected to raise on the model
+    """
+    if "error" not in outcome:
+        return False
+
+    expected = EXPECTED.get(backend, set()) | (EXPECTED_LATENT.get(backend, set()) if "exogenous" in data else set())
+    return outcome["error"] not in expected
+
+
+def backends(data: dict, model: Model, x: str, y: str) -> Dict[str, Dict[str, Callable[[], float]]]:
+    """
+    Every way of computing each of three queries on a model: the marginal P(y), the conditional P(y | x), and the
+    effect P(y | do(x)), for the first outcome of each variable.
+    @return: A mapping of each query to a mapping of the name of each backend to a function computing it
+    """
+    xo, yo = model.variable(x).outcomes[0], model.variable(y).outcomes[0]
+    exact = "exogenous" not in data
+
+    queries = {
+        "marginal": {
+            "inference": lambda: api.probability(Expression(Outcome(y, yo)), model),
+            "identification": lambda: api.identification({Outcome(y, yo)}, set(), model, False),
+        },
+        "conditional": {
+            "inference": lambda: api.probability(Expression(Outcome(y, yo), Outcome(x, xo)), model),
+        },
+        "effect": {
+            "treat": lambda: api.treat(Expression(Outcome(y, yo)), [Intervention(x, xo)], model),
+            "identification": lambda: api.identification({Outcome(y, yo)}, {Intervention(x, xo)}, model, False),
+        },
+    }
+
+    if exact:
+        queries["marginal"]["enumeration"] = lambda: enumerate_query(data, {y: yo}, {}, {})
+        queries["conditional"]["enumeration"] = lambda: enumerate_query(data, {y: yo}, {x: xo}, {})
+        queries["effect"]["enumeration"] = lambda: enumerate_query(data, {y: yo}, {}, {x: xo})
+
+    return queries
+
+
+def compare(models: int, vertices: int, density: float, cardinality: int, latent: int, max_parents: int, seed: int = 0) -> dict:
+    """
+    Run every backend on every query of a number of random models. Backends disagree on a query if the values they
+    return differ, or if any raises an error it is not expected to raise.
+    @return: A JSON-serializable report of every result, of each disagreement, and a summary of each backend
+    """
+    results, disagreements = [], []
+
+    for s in range(seed, seed + models):
+        data = random_model(vertices, density, cardinality, latent, max_parents, s)
+        x, y = random_query(data, s)
+        model = from_dict(data)
+
+        for query, functions in backends(data, model, x, y).items():
+            outcomes = {name: run(function) for name, function in functions.items()}
+            values = {name: outcome["value"] for name, outcome in outcomes.items() if "value" in outcome}
+            errors = {name: outcome["error"] for name, outcome in outcomes.items() if unexpected(data, name, outcome)}
+
+            agree = not errors and all(within_precision(a, b) for a in values.values() for b in values.values())
+            results.append({"seed": s, "query": query, "x": x, "y": y, "backends": outcomes, "agree": agree})
+
+            if not agree:
+                disagreements.append({"seed": s, "query": query, "x": x, "y": y, "values": values, "errors": errors})
+
+    summary = dict()
+    for result in results:
+        for name, outcome in result["backends"].items():
+            entry = summary.setdefault(f"{result['query']}/{name}", {"runs": 0, "errors": dict(), "seconds": [], "peak_bytes": []})
+            entry["runs"] += 1
+            if "error" in outcome:
+                entry["errors"][outcome["error"]] = entry["errors"].get(outcome["error"], 0) + 1
+            else:
+                entry["seconds"].append(outcome["seconds"])
+                entry["peak_bytes"].append(outcome["peak_bytes"])
+
+    for entry in summary.values():
+        seconds, peaks = entry.pop("seconds"), entry.pop("peak_bytes")
+        entry["median_seconds"] = median(seconds) if seconds else None
+        entry["max_seconds"] = max(seconds) if seconds else None
+        entry["max_peak_bytes"] = max(peaks) if peaks else None
+
+    parameters = {"models": models, "vertices": vertices, "density": density, "cardinality": cardinality, "latent": latent, "max_parents": max_parents, "seed": seed}
+    return {"metadata": _metadata(), "parameters": parameters, "summary": summary, "disagreements": disagreements, "results": results}
+
+
+def main(argv: Optional[List[str]] = None):
+
+    parser = ArgumentParser(prog="python -m benchmarks.compare", description="Check that every backend agrees on random models, and compare their speed.")
+    parser.add_argument("--models", type=int, default=20, help="the number of random models")
+    parser.add_argument("--vertices", type=int, default=8)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--cardinality", type=int, default=2)
+    parser.add_argument("--latent", type=int, default=0, help="latent variables per model; models with any are not enumerated")
+    parser.add_argument("--max-parents", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the first model")
+    parser.add_argument("--output", type=Path, help="a file to write the full report to, as JSON")
+    parser.add_argument("--log", action="store_true", help="keep the package's logging enabled")
+    args = parser.parse_args(argv)
+
+    if not args.log:
+        from loguru import logger
+        logger.remove()
+
+    report = compare(args.models, args.vertices, args.density, args.cardinality, args.latent, args.max_parents, args.seed)
+
+    print(f"{'backend':<28} {'runs':>5} {'median ms':>10} {'max ms':>10} {'peak KiB':>10}  errors")
+    for name, entry in sorted(report["summary"].items()):
+        median_ms = "" if entry["median_seconds"] is None else f"{entry['median_seconds'] * 1000:.3f}"
+        max_ms = "" if entry["max_seconds"] is None else f"{entry['max_seconds'] * 1000:.3f}"
+        peak = "" if entry["max_peak_bytes"] is None else f"{entry['max_peak_bytes'] / 1024:.1f}"
+        errors = ", ".join(f"{error} x{n}" for error, n in entry["errors"].items())
+        print(f"{name:<28} {entry['runs']:>5} {median_ms:>10} {max_ms:>10} {peak:>10}  {errors}")
+
+    for d in report["disagreements"]:
+        print(f"DISAGREEMENT: seed {d['seed']}, {d['query']} of {d['y']} and {d['x']}: {d['values']}, unexpected errors {d['errors']}")
+
+    if args.output:
+        with args.output.open("w") as f:
+            dump(report, f, indent=2)
+
+    return 1 if report["disagreements"] else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,74 @@
+from itertools import product
+from random import Random
+from typing import Dict, List, Optional, Tuple
+
+
+def random_dag(vertices: int, density: float, max_parents: int, seed: Optional[int] = None) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Generate a random DAG, over vertices named V0, V1, ..., whose topological order is that of their indices.
+    @param vertices: The number of vertices
+    @param density: The probability of each possible edge (from an earlier vertex to a later one) being included,
+        before the limit on parents is applied
+    @param max_parents: The most parents any vertex may have
+    @param seed: A seed, making the graph reproducible
+    @return: A pair (names, parents), where names is a list of the vertices in topological order, and parents maps
+        each vertex to a sorted list of its parents
+    """
+    rng = Random(seed)
+    names = [f"V{i}" for i in range(vertices)]
+
+    parents = dict()
+    for i, name in enumerate(names):
+        candidates = [names[j] for j in range(i) if rng.random() < density]
+        rng.shuffle(candidates)
+        parents[name] = sorted(candidates[:max_parents], key=names.index)
+
+    return names, parents
+
+
+def random_model(vertices: int, density: float = 0.2, cardinality: int = 2, latent: int = 0, max_parents: int = 3, seed: Optional[int] = None) -> dict:
+    """
+    Generate a random model, in the form given to parse_model (and API.instantiate_model).
+    @param vertices: The number of endogenous variables
+    @param density: The probability of each possible edge being included, as in random_dag
+    @param cardinality: The number of outcomes of every variable
+    @param latent: The number of latent (exogenous) variables, each a parent of two random endogenous variables
+    @param max_parents: The most endogenous parents any variable may have
+    @param seed: A seed, making the model reproducible
+    @return: A dictionary describing the model, with a random table for every endogenous variable
+    """
+    rng = Random(seed)
+    names, parents = random_dag(vertices, density, max_parents, rng.random())
+
+    outcomes = {name: [f"{name.lower()}{k}" for k in range(cardinality)] for name in names}
+
+    endogenous = dict()
+    for name in names:
+        table = []
+        for given in product(*[outcomes[p] for p in parents[name]]):
+            weights = [rng.random() + 0.01 for _ in outcomes[name]]
+            total = sum(weights)
+            table.extend([outcome, *given, weight / total] for outcome, weight in zip(outcomes[name], weights))
+
+        endogenous[name] = {"outcomes": outcomes[name], "parents": parents[name], "table": table}
+
+    model = {"name": f"random-{vertices}-{seed}", "endogenous": endogenous}
+
+    if latent and vertices > 1:
+        model["exogenous"] = {f"U{i}": sorted(rng.sample(names, 2), key=names.index) for i in range(latent)}
+
+    return model
+
+
+def random_query(model: dict, seed: Optional[int] = None) -> Tuple[str, str]:
+    """
+    Choose a random (treatment, outcome) pair from a model, the treatment coming before the outcome in its topological
+    order.
+    @param model: A model generated by random_model
+    @param seed: A seed, making the choice reproducible
+    @return: A pair of variable names (x, y)
+    """
+    rng = Random(seed)
+    names = list(model["endogenous"])
+    i, j = sorted(rng.sample(range(len(names)), 2))
+    return names[i], names[j]
@@ -0,0 +1,162 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from platform import platform, python_version
+from statistics import median
+from subprocess import run
+from time import perf_counter, strftime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from do.API import API
+from do.core.Budget import limit
+from do.core.Exceptions import BudgetExceeded
+from do.core.Expression import Expression
+from do.core.Model import Model, from_dict, from_path
+from do.core.Variables import Intervention, Outcome
+
+from .generators import random_model, random_query
+
+api = API()
+
+# Each benchmark is given a loaded model and a (treatment, outcome) pair of variable names, and returns the function
+#   to time
+BENCHMARKS: Dict[str, Callable[[Model, str, str], Callable[[], object]]] = {
+    "inference": lambda m, x, y: lambda: api.probability(Expression(Outcome(y, m.variable(y).outcomes[0]), Outcome(x, m.variable(x).outcomes[0])), m),
+    "treat": lambda m, x, y: lambda: api.treat(Expression(Outcome(y, m.variable(y).outcomes[0])), [Intervention(x, m.variable(x).outcomes[0])], m),
+    "backdoors": lambda m, x, y: lambda: api.backdoors({x}, {y}, m.graph()),
+    "deconfound": lambda m, x, y: lambda: api.deconfound({x}, {y}, m.graph()),
+    "identification": lambda m, x, y: lambda: api.identification({Outcome(y, m.variable(y).outcomes[0])}, {Intervention(x, m.variable(x).outcomes[0])}, m, False),
+}
+
+
+def measure(function: Callable[[], object], repeat: int, budget: Optional[float] = None) -> dict:
+    """
+    Time a function, discarding anything it prints.
+    @param function: The function to time
+    @param repeat: The number of times to run it
+    @param budget: The most seconds each run may take, enforced by running it under a Budget, or None for no limit
+    @return: A dictionary of the times taken by each run, in seconds, and their minimum and median; of the budget
+        exceeded, if a run was stopped; or of the name of the exception raised, if the function failed
+    """
+    times = []
+
+    for _ in range(repeat):
+        with redirect_stdout(StringIO()), limit(seconds=budget, stats=False):
+            start = perf_counter()
+            try:
+                function()
+            except BudgetExceeded:
+                return {"skipped": True, "exceeded": budget}
+            except BaseException as e:
+                if isinstance(e, KeyboardInterrupt):
+                    raise
+                return {"error": type(e).__name__}
+            times.append(perf_counter() - start)
+
+    return {"times": times, "best": min(times), "median": median(times)}
+
+
+def _metadata() -> dict:
+    try:
+        commit = run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+
+    return {"timestamp": strftime("%Y-%m-%dT%H:%M:%S%z"), "python": python_version(), "platform": platform(), "commit": commit}
+
+
+def bundled(models: Path, benchmarks: Sequence[str], repeat: int) -> List[dict]:
+    """
+    Benchmark loading each model in a directory, and every benchmark on a query of its first and last variables (in
+    topological order).
+    """
+    results = []
+
+    for file in sorted(models.iterdir()):
+        results.append({"benchmark": "load", "model": file.name, **measure(lambda: from_path(file), repeat)})
+        if file.suffix in [".yml", ".yaml"]:
+            results.append({"benchmark": "load (stream)", "model": file.name, **measure(lambda: from_path(file, stream=True), repeat)})
+
+        model = from_path(file)
+        order = sorted(model._v, key=model.graph().get_topology)
+        x, y = order[0], order[-1]
+
+        for name in benchmarks:
+            results.append({"benchmark": name, "model": file.name, "query": [x, y], **measure(BENCHMARKS[name](model, x, y), repeat)})
+
+    return results
+
+
+def synthetic(sizes: Sequence[int], benchmarks: Sequence[str], repeat: int, seeds: int, budget: Optional[float], density: float, cardinality: int, latent: int, max_parents: int) -> List[dict]:
+    """
+    Benchmark loading, and every benchmark, on random models of each size, for a number of seeds per size. Each run
+    is stopped once it exceeds the budget, and recorded as skipped; once a benchmark exceeds the budget at some size,
+    it is skipped at every larger size.
+    """
+    results = []
+    exceeded = set()
+
+    for size in sorted(sizes):
+        for seed in range(seeds):
+            data = random_model(size, density, cardinality, latent, max_parents, seed)
+            x, y = random_query(data, seed)
+            parameters = {"vertices": size, "density": density, "cardinality": cardinality, "latent": latent, "max_parents": max_parents, "seed": seed}
+
+            results.append({"benchmark": "load", "parameters": parameters, **measure(lambda: from_dict(data), repeat)})
+
+            model = from_dict(data)
+
+            for name in benchmarks:
+                if name in exceeded:
+                    results.append({"benchmark": name, "parameters": parameters, "query": [x, y], "skipped": True})
+                    continue
+
+                result = measure(BENCHMARKS[name](model, x, y), repeat, budget)
+                results.append({"benchmark": name, "parameters": parameters, "query": [x, y], **result})
+
+                if "exceeded" in result or (budget is not None and result.get("median", 0) > budget):
+                    exceeded.add(name)
+
+    return results
+
+
+def run_suite(models: Optional[Path] = Path("models"), sizes: Sequence[int] = (8, 16, 32, 64), benchmarks: Sequence[str] = tuple(BENCHMARKS), repeat: int = 3, seeds: int = 3, budget: Optional[float] = 5.0, density: float = 0.2, cardinality: int = 2, latent: int = 0, max_parents: int = 3) -> dict:
+    """
+    Run the benchmark suite.
+    @param models: A directory of models to benchmark, or None to skip them
+    @param sizes: The numbers of vertices of the synthetic models; empty to skip them
+    @param benchmarks: The names of the benchmarks to run, from BENCHMARKS; model loading is always benchmarked
+    @param repeat: The number of times each benchmark is run
+    @param seeds: The number of random models of each size
+    @param budget: The time, in seconds, after which a run on a synthetic model is stopped, and beyond which a
+        benchmark is not run on larger synthetic models; or None to run every size to completion
+    @param density: The edge density of the synthetic models
+    @param cardinality: The number of outcomes of every variable of the synthetic models
+    @param latent: The number of latent variables of the synthetic models
+    @param max_parents: The most parents of any variable of the synthetic models
+    @return: A JSON-serializable dictionary of the results, and of the machine and revision they were measured on
+    """
+    results = []
+
+    if models is not None:
+        results.extend(bundled(models, benchmarks, repeat))
+
+    if sizes:
+        results.extend(synthetic(sizes, benchmarks, repeat, seeds, budget, density, cardinality, latent, max_parents))
+
+    return {"metadata": _metadata(), "results": results}
+
+
+def scaling(results: List[dict]) -> Dict[str, Dict[int, float]]:
+    """
+    Summarize the synthetic results as scaling curves.
+    @return: A mapping of each benchmark to a mapping of model size to the median (across seeds) of its best time
+    """
+    curves = dict()
+
+    for result in results:
+        if "parameters" not in result or "best" not in result:
+            continue
+        curves.setdefault(result["benchmark"], dict()).setdefault(result["parameters"]["vertices"], []).append(result["best"])
+
+    return {name: {size: median(times) for size, times in sorted(curve.items())} for name, curve in curves.items()}
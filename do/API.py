@@ -1,8 +1,12 @@
+from typing import Optional
+
 from .core.API import API as Core
 from .deconfounding.API import API as Deconfounding
 from .identification.API import API as Identification
 
 from .core.Expression import Expression
+from .core.Model import Model
+from .Explain import Cost, explain
 
 class API(Core, Deconfounding, Identification):
 
@@ -10,3 +14,15 @@ class API(Core, Deconfounding, Identification):
         Core.__init__(self)
         Deconfounding.__init__(self)
         Identification.__init__(self)
+
+    def explain(self, query: Expression, model: Model, backend: Optional[str] = None) -> Cost:
+        """
+        Estimate the work a query will take, without evaluating it, such as to reject a query, or send it elsewhere,
+        before it occupies a worker.
+        @param query: The query, whose body may contain Interventions
+        @param model: The model it would be computed in
+        @param backend: "inference", "treat" or "identification"; defaults to the backend the query would be computed
+            by, being inference for a query without interventions, and treat for one with them
+        @return: A Cost, whose work is the estimate to compare, or None if the query cannot be estimated
+        """
+        return explain(query, model, backend)
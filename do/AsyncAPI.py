@@ -0,0 +1,104 @@
+from asyncio import get_running_loop, wait_for
+from functools import partial
+from pathlib import Path
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Collection, Optional, Set, Tuple, Union
+
+from .API import API
+from .core.Budget import limit
+from .core.Expression import Expression
+from .core.Model import Model, from_bytes, from_dict
+from .core.Variables import Intervention, Outcome
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+
+class AsyncAPI:
+    """
+    An asyncio facade over the API, for use from an event loop. Files are read on the loop's default thread pool,
+    and everything CPU-bound (parsing models, and evaluating queries) runs on the given executor, so that the loop is
+    never blocked.
+
+    Every call takes an optional timeout, in seconds, after which it raises asyncio.TimeoutError; a call may also be
+    cancelled like any other coroutine. A query cancelled before it starts never runs. A query already running cannot
+    be interrupted, but is run under a budget (see do.core.Budget) with the same deadline, measured from when the call
+    was made rather than from when it started running, so it stops itself shortly after timing out rather than running
+    to completion in the background. A query cancelled without a timeout does run to completion; use a process pool
+    to keep such queries from competing with the rest of the service.
+
+    With a process pool, the model is sent to a worker on every call; a SharedModel (see API.share_model) is sent
+    without copying its tables. No call modifies the model it is given, so concurrent calls may share one model on a
+    thread pool.
+
+    @param executor: A thread or process pool on which to run CPU-bound work. Defaults to None, using the loop's
+        default thread pool.
+    @param timeout: The default timeout of every call, in seconds, or None for no timeout
+    """
+
+    def __init__(self, executor: Optional["Executor"] = None, timeout: Optional[float] = None):
+        self.executor = executor
+        self.timeout = timeout
+
+    async def _run(self, timeout: Optional[float], function: Callable, *args, **kwargs):
+        loop = get_running_loop()
+        future = loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+        return await wait_for(future, timeout if timeout is not None else self.timeout)
+
+    async def _query(self, timeout: Optional[float], method: str, *args):
+        timeout = timeout if timeout is not None else self.timeout
+
+        # The deadline is fixed when the call is made, so that time spent waiting for a worker counts against it
+        deadline = None if timeout is None else monotonic() + timeout
+        return await self._run(timeout, _call, method, deadline, *args)
+
+    async def instantiate_model(self, model_target: Union[str, Path, dict], lazy: bool = False, cache_size: Optional[int] = None, timeout: Optional[float] = None) -> Model:
+        """
+        Load a model from a dictionary, or a file, as API.instantiate_model.
+        """
+        if isinstance(model_target, dict):
+            return await self._run(timeout, from_dict, model_target, lazy, cache_size)
+
+        path = Path(model_target)
+
+        async def load() -> Model:
+            content = await get_running_loop().run_in_executor(None, path.read_bytes)
+            return await self._run(None, from_bytes, content, path.suffix, lazy=lazy, cache_size=cache_size)
+
+        return await wait_for(load(), timeout if timeout is not None else self.timeout)
+
+    async def probability(self, query: Expression, model: Model, timeout: Optional[float] = None) -> float:
+        """
+        Compute the probability of a query, as API.probability.
+        """
+        return await self._query(timeout, "probability", query, model)
+
+    async def treat(self, expression: Expression, interventions: Collection[Intervention], model: Model, timeout: Optional[float] = None) -> float:
+        """
+        Compute the probability of an expression under interventions, as API.treat.
+        """
+        return await self._query(timeout, "treat", expression, interventions, model)
+
+    async def identification(self, y: Set[Outcome], x: Set[Intervention], model: Model, include_proof: bool = True, timeout: Optional[float] = None) -> Union[float, Tuple[float, str]]:
+        """
+        Identify and evaluate the effect of x on y, as API.identification.
+        """
+        return await self._query(timeout, "identification", y, x, model, include_proof)
+
+    async def validate(self, model: Model, timeout: Optional[float] = None) -> bool:
+        """
+        Validate a model, as API.validate.
+        """
+        return await self._query(timeout, "validate", model)
+
+
+def _call(method: str, deadline: Optional[float], *args):
+    """
+    Call a method of the API, under a deadline if not None; a module-level function, so that it can be sent to a
+    process pool. The deadline is a time of time.monotonic, whose clock is shared by every process on a machine.
+    """
+    if deadline is None:
+        return getattr(API(), method)(*args)
+
+    with limit(seconds=max(deadline - monotonic(), 0.0)):
+        return getattr(API(), method)(*args)
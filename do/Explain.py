@@ -0,0 +1,221 @@
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from .core.Expression import Expression
+from .core.Model import Model
+from .core.Variables import Intervention
+from .deconfounding.Backdoor import any_backdoor_path, deconfound
+from .identification.Exceptions import Fail
+from .identification.Identification import Identification
+from .identification.LatentGraph import latent_transform
+from .identification.PExpression import PExpression, TemplateExpression
+
+BACKENDS = ["inference", "treat", "identification"]
+
+# treat searches the power set of the variables which could deconfound the query; deconfounding sets are only
+#   enumerated by explain if there are at most this many subsets to check
+SEARCH_LIMIT = 2 ** 12
+
+
+class Cost:
+    """
+    An estimate of the work a query will take, made without evaluating it.
+
+    Every backend computes probabilities over (some of) the variables of the query and their ancestors, which is
+    described by an elimination order of that part of the graph: its treewidth, the size of the largest factor (the
+    product of the numbers of outcomes of a variable and its neighbours when eliminated), and the total size of every
+    factor, elimination_work.
+
+    For treat, backdoor_path is whether any backdoor path is open, in which case the query is evaluated once per
+    outcome of each deconfounding set Z, making two inference queries each; adjustment_sets gives the size of the
+    outcome product of each set. The sets are found by searching the subsets of deconfounding_candidates, which is
+    skipped (leaving adjustment_sets None) if there are more than SEARCH_LIMIT subsets.
+
+    For identification, summed_variables maps each variable summed over in the identified expression to its number
+    of outcomes, and the expression needs table_lookups lookups to evaluate; identifiable is False if it is not.
+
+    work is the estimate to compare queries by: the number of table lookups for identification, and
+    elimination_work (times the number of inference queries made, for treat) otherwise. It is None if the work
+    cannot be estimated, as for an unidentifiable effect, or too many deconfounding candidates.
+    """
+
+    def __init__(self, backend: str, variables: int, treewidth: int, max_factor: int, elimination_work: int):
+        self.backend = backend
+        self.variables = variables
+        self.treewidth = treewidth
+        self.max_factor = max_factor
+        self.elimination_work = elimination_work
+
+        self.backdoor_path: Optional[bool] = None
+        self.deconfounding_candidates: Optional[int] = None
+        self.adjustment_sets: Optional[List[Tuple[List[str], int]]] = None
+
+        self.identifiable: Optional[bool] = None
+        self.summed_variables: Optional[Dict[str, int]] = None
+        self.table_lookups: Optional[int] = None
+
+        self.work: Optional[int] = elimination_work
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    def __str__(self) -> str:
+        return "\n".join(f"{key}: {value}" for key, value in self.__dict__.items() if value is not None)
+
+
+def elimination(model: Model, variables: Collection[str], removed: Collection[str] = ()) -> Tuple[int, int, int, int]:
+    """
+    Find an elimination order of the variables given and their (endogenous) ancestors, greedily choosing the variable
+    whose elimination adds the fewest edges to the moral graph (min-fill), with the given variables eliminated last.
+    @param model: The model containing the variables
+    @param variables: The names of the variables of a query
+    @param removed: The names of variables whose incoming edges are removed, as for an intervention
+    @return: A tuple (variables, treewidth, max_factor, work) of the number of variables eliminated, the width of the
+        order, the size of its largest factor, and the total size of its factors
+    """
+    graph = model.graph()
+    relevant = set(variables)
+    for v in variables:
+        if v not in removed:
+            relevant |= graph.ancestors(v)
+    relevant &= set(model._v)
+
+    domain = {v: len(model.variable(v).outcomes) for v in relevant}
+
+    # Moralize: connect each variable to its parents, and its parents to one another
+    neighbours = {v: set() for v in relevant}
+    for v in relevant:
+        parents = [] if v in removed else [p for p in model.variable(v).parents if p in relevant]
+        family = [v] + parents
+        for a in family:
+            neighbours[a].update(b for b in family if b != a)
+
+    width, largest, work = 0, 1, 0
+    remaining = set(relevant)
+    last = set(variables) & relevant
+
+    def fill(v: str) -> int:
+        adjacent = list(neighbours[v])
+        return sum(1 for i, a in enumerate(adjacent) for b in adjacent[i + 1:] if b not in neighbours[a])
+
+    while remaining:
+        candidates = (remaining - last) or remaining
+        v = min(candidates, key=lambda c: (fill(c), len(neighbours[c]), c))
+
+        size = domain[v]
+        for n in neighbours[v]:
+            size *= domain[n]
+
+        width = max(width, len(neighbours[v]))
+        largest = max(largest, size)
+        work += size
+
+        for a in neighbours[v]:
+            neighbours[a] |= neighbours[v] - {a}
+            neighbours[a].discard(v)
+
+        del neighbours[v]
+        remaining.remove(v)
+        last.discard(v)
+
+    return len(relevant), width, largest, work
+
+
+def _lookups(expression, model: Model) -> int:
+    """
+    Count the table lookups made evaluating an identified expression, as the identification API does.
+    """
+    if isinstance(expression, TemplateExpression):
+        return 1
+
+    assignments = 1
+    for v in expression.sigma:
+        assignments *= len(model.variable(v).outcomes)
+
+    return assignments * sum(_lookups(term, model) for term in expression.terms)
+
+
+def _summed(expression, model: Model) -> Dict[str, int]:
+    if isinstance(expression, TemplateExpression):
+        return dict()
+
+    summed = {v: len(model.variable(v).outcomes) for v in expression.sigma}
+    for term in expression.terms:
+        summed.update(_summed(term, model))
+    return summed
+
+
+def explain(query: Expression, model: Model, backend: Optional[str] = None) -> Cost:
+    """
+    Estimate the work a query will take, inspecting only the graph of the model and the numbers of outcomes of its
+    variables.
+    @param query: The query, whose body may contain Interventions
+    @param model: The model it would be computed in
+    @param backend: "inference", "treat" or "identification"; defaults to inference for a query without
+        interventions, and treat for one with them, as the API would compute them
+    @return: A Cost
+    """
+    head = {o.name for o in query.head()}
+    body = {o.name for o in query.body() if not isinstance(o, Intervention)}
+    interventions = {o.name for o in query.body() if isinstance(o, Intervention)}
+
+    if backend is None:
+        backend = "treat" if interventions else "inference"
+
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend}; expected one of {', '.join(BACKENDS)}")
+
+    if backend == "inference" and interventions:
+        raise ValueError("the inference backend does not handle interventions")
+
+    if backend == "identification":
+        cost = Cost(backend, *elimination(model, head | interventions, interventions))
+
+        latent = latent_transform(model._g.copy(), model._g.v - set(model._v))
+        p = PExpression([], [TemplateExpression(x, list(latent.parents(x))) for x in latent.v])
+
+        try:
+            expression = Identification(head, interventions, p, latent, False)
+        except Fail:
+            cost.identifiable = False
+            cost.work = None
+            return cost
+
+        cost.identifiable = True
+        cost.summed_variables = _summed(expression, model)
+        cost.table_lookups = _lookups(expression, model)
+        cost.work = cost.table_lookups
+        return cost
+
+    if backend == "inference" or not interventions:
+        return Cost(backend, *elimination(model, head | body))
+
+    # The backdoor paths themselves may be exponentially many, so only whether there are any is found
+    graph = model.graph()
+
+    if not any_backdoor_path(interventions, head, graph, body):
+        cost = Cost(backend, *elimination(model, head | body | interventions, interventions))
+        cost.backdoor_path = False
+        return cost
+
+    descendants = set().union(*[graph.descendants(x) for x in interventions])
+    candidates = graph.v - head - interventions - descendants
+
+    cost = Cost(backend, *elimination(model, head | body | interventions | (candidates & set(model._v)), interventions))
+    cost.backdoor_path = True
+    cost.deconfounding_candidates = len(candidates)
+
+    if 2 ** len(candidates) > SEARCH_LIMIT:
+        cost.work = None
+        return cost
+
+    sets: List[Set[str]] = [set(z) for z in deconfound(interventions, head, graph) if not set(z) & body]
+
+    cost.adjustment_sets = []
+    for z in sets:
+        size = 1
+        for v in z:
+            size *= len(model.variable(v).outcomes)
+        cost.adjustment_sets.append((sorted(z), size))
+
+    cost.work = 2 * sum(size for _, size in cost.adjustment_sets) * cost.elimination_work
+    return cost
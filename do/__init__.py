@@ -1,4 +1,26 @@
-from .API import API
+# Submodules are only imported once one of their names is first used, so that importing the package is cheap
+_exports = {
+    "API": ".API",
+    "AsyncAPI": ".AsyncAPI",
+    "Expression": ".core.Expression",
+    "Intervention": ".core.Variables",
+    "Outcome": ".core.Variables",
+    "Variable": ".core.Variables",
+}
 
-from .core.Expression import Expression
-from .core.Variables import Intervention, Outcome, Variable
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import import_module
+
+    value = getattr(import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
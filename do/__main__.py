@@ -0,0 +1,228 @@
+"""
+Run a file of queries against a model, in parallel, streaming each result as it completes.
+
+Each line of the query file is a JSON object, with the same "head" and "body" strings as the test files, such as:
+
+    {"id": "effect", "head": "Xj = xj", "body": "do(Xi = xi)", "backend": "identification"}
+
+The body may contain observations, interventions ("do(X = x)"), or both, and is optional. "backend" is optional,
+overriding --backend for the one query, and "id" defaults to the line number. A query with interventions is computed
+by treat (or by identification, if chosen), and one without by inference, unless a backend is given.
+
+Each result is written as a line of JSON, in the order the queries complete, with the id of its query and either its
+"probability" or the "error" raised; the exit status is non-zero if any query failed.
+
+Run with: do --help
+"""
+from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import nullcontext, redirect_stdout
+from io import StringIO
+from json import dumps, loads
+from os import cpu_count
+from pathlib import Path
+from sys import exit, stderr, stdin, stdout
+from time import perf_counter
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+from .API import API
+from .Explain import BACKENDS
+from .core.Budget import limit
+from .core.Exceptions import ProbabilityException
+from .core.Expression import Expression
+from .core.Model import Model
+from .core.Stats import collect
+from .core.Variables import Intervention, parse_outcomes_and_interventions
+
+# The model of each worker process, loaded once by _load
+_model: Optional[Model] = None
+
+api = API()
+
+
+def _load(path: Path, lazy: bool):
+    """
+    Load the model to evaluate queries in, once per process.
+    """
+    global _model
+    _model = api.instantiate_model(path, lazy=lazy)
+
+
+def _worker(path: Path, lazy: bool, log: bool):
+    """
+    Set up a worker process: remove every logging handler, unless logging is kept, and load the model. The handlers
+    are those of this process alone, so the process which started the pool keeps its own.
+    """
+    if not log:
+        from loguru import logger
+        logger.remove()
+
+    _load(path, lazy)
+
+
+def _evaluate(query: dict, backend: Optional[str], timeout: Optional[float], stats: bool, memory: bool) -> dict:
+    """
+    Evaluate one query in the model of the current process.
+    @param query: A query, as read from the query file, with its "id"
+    @param backend: The backend to use if the query does not name one, or None to choose by the query
+    @param timeout: The most seconds the query may run for, or None for no limit
+    @param stats: Whether to include the Stats collected while computing the query
+    @param memory: Whether those Stats account for memory
+    @return: A JSON-serializable result
+    """
+    result = {"id": query["id"]}
+    start = perf_counter()
+
+    collector = collect(memory=memory) if stats else nullcontext()
+    budget = limit(seconds=timeout) if timeout is not None else nullcontext()
+
+    with collector as collected:
+        try:
+            head = parse_outcomes_and_interventions(query["head"])
+            body = parse_outcomes_and_interventions(query.get("body", ""))
+            interventions = {v for v in body if isinstance(v, Intervention)}
+            observations = body - interventions
+
+            backend = query.get("backend", backend) or ("treat" if interventions else "inference")
+            result["backend"] = backend
+
+            # Anything the engines print would be interleaved with the results
+            with budget, redirect_stdout(StringIO()):
+                if backend == "inference":
+                    if interventions:
+                        raise ValueError("the inference backend does not handle interventions")
+                    p = api.probability(Expression(head, observations), _model)
+
+                elif backend == "treat":
+                    p = api.treat(Expression(head, observations), interventions, _model)
+
+                elif backend == "identification":
+                    if observations:
+                        raise ValueError("the identification backend does not handle observations in the body")
+                    p = api.identification(head, interventions, _model, False)
+
+                else:
+                    raise ValueError(f"unknown backend {backend}; expected one of {', '.join(BACKENDS)}")
+
+            result["probability"] = p
+
+        # The errors of the engines (such as Fail or BudgetExceeded) derive from ProbabilityException, which is a
+        #   BaseException rather than an Exception, so are named alongside it; KeyboardInterrupt and SystemExit are
+        #   not caught, and so still stop the run
+        except (Exception, ProbabilityException) as e:
+            result.update(error=type(e).__name__, message=str(e))
+
+    result["seconds"] = perf_counter() - start
+    if stats:
+        result["stats"] = collected.as_dict()
+
+    return result
+
+
+def read_queries(file: TextIO) -> Iterator[dict]:
+    """
+    Read the queries of a query file, skipping blank lines.
+    @return: An iterator of the queries, each with an "id"
+    """
+    for number, line in enumerate(file, start=1):
+        if line.strip():
+            query = loads(line)
+            query.setdefault("id", number)
+            yield query
+
+
+def run(model: Path, queries: Iterator[dict], output: TextIO, workers: int = 1, backend: Optional[str] = None, timeout: Optional[float] = None, stats: bool = False, memory: bool = False, lazy: bool = False, log: bool = False) -> Tuple[int, int]:
+    """
+    Evaluate queries, writing each result to the output as it completes. With one worker, the queries are evaluated
+    in order, in this process; otherwise each worker of a process pool loads the model once, and at most a few
+    queries per worker are read ahead of those completed, so that a query file of any length may be streamed.
+    Unless log is True, the package logs nothing while the queries are evaluated; the logging handlers of this process
+    are left as they are.
+    @return: A pair of the number of queries evaluated, and the number that failed
+    """
+    arguments = (backend, timeout, stats, memory)
+    done, failed = 0, 0
+
+    def write(result: dict):
+        nonlocal done, failed
+        done += 1
+        failed += "error" in result
+        output.write(dumps(result, default=str) + "\n")
+        output.flush()
+
+    if workers == 1:
+
+        # The handlers of this process belong to the caller, so rather than being removed, the package's own
+        #   messages are disabled for the run
+        if not log:
+            from loguru import logger
+            logger.disable("do")
+
+        try:
+            _load(model, lazy)
+            for query in queries:
+                write(_evaluate(query, *arguments))
+        finally:
+            if not log:
+                logger.enable("do")
+
+        return done, failed
+
+    with ProcessPoolExecutor(workers, initializer=_worker, initargs=(model, lazy, log)) as executor:
+        pending: List[Future] = []
+
+        for query in queries:
+            if len(pending) >= 4 * workers:
+                completed, remaining = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    write(future.result())
+                pending = list(remaining)
+
+            pending.append(executor.submit(_evaluate, query, *arguments))
+
+        while pending:
+            completed, remaining = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                write(future.result())
+            pending = list(remaining)
+
+    return done, failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    parser = ArgumentParser(prog="do", description="Evaluate a file of queries against a model, in parallel.")
+    parser.add_argument("model", type=Path, help="the model, as a JSON, YAML or compiled file")
+    parser.add_argument("queries", help="the query file, one JSON query per line, or - to read from standard input")
+    parser.add_argument("--output", type=Path, help="a file to write the results to; defaults to standard output")
+    parser.add_argument("--workers", type=int, default=cpu_count() or 1, help="the number of worker processes; 1 evaluates every query in this process")
+    parser.add_argument("--backend", choices=BACKENDS, help="the backend of every query not naming one; defaults to inference for queries without interventions, and treat for queries with them")
+    parser.add_argument("--timeout", type=float, help="the most seconds each query may run for before failing with BudgetExceeded")
+    parser.add_argument("--stats", action="store_true", help="include the stats collected while computing each query")
+    parser.add_argument("--memory", action="store_true", help="include peak memory in the stats (implies --stats); much slower")
+    parser.add_argument("--lazy", action="store_true", help="build each table of the model only once it is first looked up")
+    parser.add_argument("--log", action="store_true", help="keep the package's logging enabled")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    queries = stdin if args.queries == "-" else open(args.queries)
+    output = args.output.open("w") if args.output else stdout
+
+    try:
+        done, failed = run(args.model, read_queries(queries), output, args.workers, args.backend, args.timeout, args.stats or args.memory, args.memory, args.lazy, args.log)
+    finally:
+        if queries is not stdin:
+            queries.close()
+        if output is not stdout:
+            output.close()
+
+    if failed:
+        print(f"{failed} of {done} queries failed", file=stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
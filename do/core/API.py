@@ -1,9 +1,15 @@
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Optional, Tuple, Union
 
 from .Expression import Expression
 from .Inference import inference, validate
 from .Model import Model, from_dict, from_path
+from .Stats import Stats, measure
+
+# Columnar data, compiled and shared models depend on numpy, which is only imported once they are used
+if TYPE_CHECKING:
+    from .Columnar import Columns
+    from .Shared import SharedModel
 
 
 class API:
@@ -11,12 +17,66 @@ class API:
     def validate(self, model: Model) -> bool:
         return validate(model)
 
-    def probability(self, query: Expression, model: Model) -> float:
+    def probability(self, query: Expression, model: Model, stats: bool = False) -> Union[float, Tuple[float, Stats]]:
+        """
+        Compute the probability of an (observational) query.
+        @param query: The Expression to compute
+        @param model: The model to compute it in
+        @param stats: If True, return the Stats collected while computing it along with the probability
+        @return: The probability, or a pair (probability, stats) if stats is True
+        """
+        if stats:
+            return measure(inference, query, model)
+
         return inference(query, model)
 
-    def instantiate_model(self, model_target: Union[str, Path, dict]) -> Model:
-        
+    def instantiate_model(self, model_target: Union[str, Path, dict], lazy: bool = False, cache_size: Optional[int] = None, shared: bool = False) -> Model:
+        """
+        Load a model from a dictionary, or a file.
+        @param model_target: A dictionary describing the model, or the path of a JSON, YAML or compiled model
+        @param lazy: If True, each table of the model is only built the first time it is looked up
+        @param cache_size: The most tables a lazy model keeps built at once, or None for no limit
+        @param shared: If True, the model is taken from the process-wide registry, which only loads a file or
+            dictionary if no model with the same content has already been loaded. The model returned is shared, and
+            read-only.
+        @return: The Model loaded
+        """
+
+        if shared:
+            from .Registry import registry
+            return registry.get(model_target, lazy, cache_size)
+
         if isinstance(model_target, dict):
-            return from_dict(model_target)
+            return from_dict(model_target, lazy, cache_size)
+
+        return from_path(Path(model_target) if isinstance(model_target, str) else model_target, lazy=lazy, cache_size=cache_size)
+
+    def learn_model(self, spec: dict, records: "Columns", smoothing: float = 0.0) -> Model:
+        """
+        Build a model by estimating the table of each variable from records of observations.
+        @param spec: A model as given to instantiate_model, but with no "table" for any variable
+        @param records: The path of a CSV (or Parquet) file, or columns of records, with a column for every
+            endogenous variable
+        @param smoothing: A pseudo-count added to the count of every row of every table
+        @return: The Model learned
+        """
+        from .Columnar import from_records
+        return from_records(spec, records, smoothing)
+
+    def compile_model(self, model: Model, destination: Union[str, Path]):
+        """
+        Compile a model to a binary file, which instantiate_model loads by memory-mapping its tables.
+        @param model: The model to compile
+        @param destination: The path of the file to write, which should have the suffix ".dcm"
+        """
+        from .Compiled import save
+        save(model, destination)
 
-        return from_path(Path(model_target) if isinstance(model_target, str) else model_target)
+    def share_model(self, model: Model) -> "SharedModel":
+        """
+        Compile a model into shared memory, so that it can be sent to worker processes without copying its tables.
+        @param model: The model to share
+        @return: A SharedModel, usable anywhere a Model is, which should be unlinked once no longer needed
+        """
+        from .Shared import share
+        return share(model)
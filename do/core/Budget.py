@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Iterator, Optional
+
+from .Exceptions import BudgetExceeded
+from .Stats import collect, active as active_stats
+
+# The budget of the current context, if one is set; the engines look it up once per call, and check nothing when
+#   there is none
+_active: ContextVar[Optional["Budget"]] = ContextVar("budget", default=None)
+
+
+class Budget:
+    """
+    Limits on the work a query may do, checked cooperatively by inference, treat and identification as they run.
+    Each limit is optional; once any is exceeded, the engine raises BudgetExceeded.
+    @param seconds: The wall-clock time allowed, from when the budget is created
+    @param steps: The most recursive steps (sub-queries, ID calls, and evaluations of terms) allowed
+    @param combinations: The most assignments of outcomes that may be enumerated in total, such as outcomes of a
+        parent summed over by Jeffrey's rule, of a deconfounding set, or of the variables summed over in an
+        identified expression
+    @param factor_size: The most assignments that may be summed over at once, checked before enumerating them
+    """
+
+    def __init__(self, seconds: Optional[float] = None, steps: Optional[int] = None, combinations: Optional[int] = None, factor_size: Optional[int] = None):
+        self.start = monotonic()
+        self.deadline = None if seconds is None else self.start + seconds
+        self.max_steps = steps
+        self.max_combinations = combinations
+        self.max_factor_size = factor_size
+
+        self.steps = 0
+        self.combinations = 0
+
+    @property
+    def elapsed(self) -> float:
+        return monotonic() - self.start
+
+    def _exceeded(self, reason: str):
+        raise BudgetExceeded(reason, self, active_stats())
+
+    def check(self):
+        """
+        @raise BudgetExceeded if the deadline has passed
+        """
+        if self.deadline is not None and monotonic() > self.deadline:
+            self._exceeded(f"deadline of {self.deadline - self.start:.3f}s exceeded")
+
+    def step(self):
+        """
+        Record one recursive step, checking the limit on steps and the deadline.
+        """
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self._exceeded(f"more than {self.max_steps} steps")
+        self.check()
+
+    def enumerate(self, n: int):
+        """
+        Record that n assignments are about to be enumerated, checking the size of the factor and the limit on
+        combinations.
+        """
+        if self.max_factor_size is not None and n > self.max_factor_size:
+            self._exceeded(f"a factor of {n} assignments exceeds the limit of {self.max_factor_size}")
+
+        self.combinations += n
+        if self.max_combinations is not None and self.combinations > self.max_combinations:
+            self._exceeded(f"more than {self.max_combinations} combinations")
+        self.check()
+
+
+def active() -> Optional[Budget]:
+    """
+    @return: The Budget of the current context, or None if none is set
+    """
+    return _active.get()
+
+
+@contextmanager
+def limit(seconds: Optional[float] = None, steps: Optional[int] = None, combinations: Optional[int] = None, factor_size: Optional[int] = None, stats: bool = True) -> Iterator[Budget]:
+    """
+    Set a budget for every query made within a with block, such as:
+
+        with limit(seconds=0.5, steps=10000):
+            api.probability(query, model)
+
+    If no Stats collector is attached, one is attached for the block (unless stats is False, such as when timing the
+    block), so that a BudgetExceeded raised always carries the stats of the work done up to that point. A budget set
+    in a nested block replaces the outer one until the block ends.
+    @return: The Budget, whose counts may be inspected afterwards
+    """
+    budget = Budget(seconds, steps, combinations, factor_size)
+    token = _active.set(budget)
+    try:
+        if stats and active_stats() is None:
+            with collect():
+                yield budget
+        else:
+            yield budget
+    finally:
+        _active.reset(token)
+
@@ -0,0 +1,177 @@
+from csv import reader
+from itertools import product
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Union
+
+from numpy import add, asarray, bincount, int64, unique, zeros
+from numpy import array as np_array
+
+from .Exceptions import InvalidOutcome, MissingVariable
+from .Model import Model, parse_model
+
+# A chunk of columnar data: a mapping of the name of each column to a sequence of its values, all the same length
+Chunk = Mapping[str, Sequence]
+Columns = Union[str, Path, Chunk, Iterable[Chunk]]
+
+
+def read_csv(path: Union[str, Path], chunk_size: int = 65536) -> Iterator[Dict[str, List[str]]]:
+    """
+    Read a CSV file with a header row as chunks of columns, holding no more than chunk_size rows at once.
+    @param path: The path of the CSV file
+    @param chunk_size: The most rows in each chunk
+    @return: An iterator of chunks, each a dictionary of column name to a list of its values
+    """
+    with Path(path).open(newline="") as f:
+        rows = reader(f)
+        header = [name.strip() for name in next(rows)]
+
+        while True:
+            chunk = {name: [] for name in header}
+            columns = [chunk[name] for name in header]
+
+            count = 0
+            for row in rows:
+                for column, value in zip(columns, row):
+                    column.append(value.strip())
+                count += 1
+                if count == chunk_size:
+                    break
+
+            if count == 0:
+                return
+
+            yield chunk
+
+            if count < chunk_size:
+                return
+
+
+def read_parquet(path: Union[str, Path], chunk_size: int = 65536) -> Iterator[Dict[str, list]]:
+    """
+    Read a Parquet file as chunks of columns, holding no more than chunk_size rows at once. Requires pyarrow.
+    @param path: The path of the Parquet file
+    @param chunk_size: The most rows in each chunk
+    @return: An iterator of chunks, each a dictionary of column name to a list of its values
+    """
+    try:
+        from pyarrow.parquet import ParquetFile
+    except ImportError as e:
+        raise ImportError("reading Parquet files requires pyarrow to be installed") from e
+
+    for batch in ParquetFile(str(path)).iter_batches(batch_size=chunk_size):
+        yield batch.to_pydict()
+
+
+def chunks(data: Columns) -> Iterable[Chunk]:
+    """
+    Normalize columnar data to an iterable of chunks.
+    @param data: The path of a CSV (or Parquet) file, a single chunk of columns, or an iterable of chunks
+    @return: An iterable of chunks, each a mapping of column name to a sequence of its values
+    """
+    if isinstance(data, (str, Path)):
+        return read_parquet(data) if Path(data).suffix == ".parquet" else read_csv(data)
+
+    if isinstance(data, Mapping):
+        return [data]
+
+    return data
+
+
+def _codes(values: Sequence, name: str, domain: Sequence[str]):
+    """
+    Convert a column of outcomes to their indices in the outcomes of a variable.
+    @raise InvalidOutcome if a value is not an outcome of the variable
+    """
+    labels, inverse = unique(asarray(values, dtype=str), return_inverse=True)
+    position = {outcome: i for i, outcome in enumerate(domain)}
+
+    for label in labels:
+        if label.strip() not in position:
+            raise InvalidOutcome(f"{label} is not an outcome of {name}")
+
+    return np_array([position[label.strip()] for label in labels], dtype=int64)[inverse.ravel()]
+
+
+def _endogenous(spec: dict) -> Dict[str, dict]:
+    """
+    Copy the endogenous variables of a graph specification, to be given tables.
+    """
+    return {name: {"outcomes": list(detail.get("outcomes", [])), "parents": list(detail.get("parents", []))} for name, detail in spec["endogenous"].items()}
+
+
+def from_probabilities(spec: dict, tables: Mapping[str, Columns], probability: str = "P") -> Model:
+    """
+    Build a model from a graph specification and a table of precomputed probabilities for each variable.
+    @param spec: A model in the same form given to parse_model, but with no "table" for any variable
+    @param tables: A mapping of the name of each endogenous variable to columnar data with a column for the variable,
+        a column for each of its parents, and a column of probabilities
+    @param probability: The name of the column of probabilities
+    @return: A Model of ConditionalProbabilityTables
+    """
+    endogenous = _endogenous(spec)
+
+    for name, detail in endogenous.items():
+        if name not in tables:
+            raise MissingVariable(name)
+
+        rows = []
+        columns = [name] + detail["parents"]
+
+        for chunk in chunks(tables[name]):
+            rows.extend([*values[:-1], float(values[-1])] for values in zip(*[chunk[c] for c in columns], chunk[probability]))
+
+        detail["table"] = rows
+
+    return parse_model(spec | {"endogenous": endogenous})
+
+
+def from_records(spec: dict, records: Columns, smoothing: float = 0.0) -> Model:
+    """
+    Build a model from a graph specification and records of observations, estimating the table of each variable as
+    the (smoothed) frequency of each of its outcomes under each combination of outcomes of its parents. Records are
+    counted a chunk at a time, so they need not fit in memory.
+    @param spec: A model in the same form given to parse_model, but with no "table" for any variable; the outcomes of
+        every variable must be given
+    @param records: Columnar data with a column for every endogenous variable, each row being one observation
+    @param smoothing: A (Laplace) pseudo-count added to the count of every row. If 0, a combination of outcomes of
+        the parents that is never observed has no rows in the table.
+    @return: A Model of ConditionalProbabilityTables
+    """
+    endogenous = _endogenous(spec)
+
+    # Counts of each variable, laid out in row-major order over (variable, parent_1, parent_2, ...)
+    domains = {name: [endogenous[v]["outcomes"] for v in [name] + detail["parents"]] for name, detail in endogenous.items()}
+    counts = dict()
+
+    for name, d in domains.items():
+        size = 1
+        for domain in d:
+            size *= len(domain)
+        counts[name] = zeros(size, dtype=int64)
+
+    for chunk in chunks(records):
+        codes = {name: _codes(chunk[name], name, detail["outcomes"]) for name, detail in endogenous.items()}
+
+        for name, detail in endogenous.items():
+            index = codes[name]
+            for parent in detail["parents"]:
+                index = index * len(endogenous[parent]["outcomes"]) + codes[parent]
+
+            add(counts[name], bincount(index, minlength=len(counts[name])), out=counts[name])
+
+    for name, detail in endogenous.items():
+        outcomes = domains[name][0]
+
+        # One row of counts per outcome of the variable, one column per combination of outcomes of the parents
+        observed = counts[name].reshape(len(outcomes), -1) + smoothing
+        totals = observed.sum(axis=0)
+
+        rows = []
+        for i, outcome in enumerate(outcomes):
+            for j, given in enumerate(product(*domains[name][1:])):
+                if totals[j] > 0:
+                    rows.append([outcome, *given, float(observed[i, j] / totals[j])])
+
+        detail["table"] = rows
+
+    return parse_model(spec | {"endogenous": endogenous})
@@ -0,0 +1,179 @@
+from json import dumps as json_dumps, loads as json_loads
+from pathlib import Path
+from struct import calcsize, pack, unpack_from
+from typing import List, Tuple, Union
+
+from numpy import array, float64, frombuffer, int32, memmap, ndarray, uint8
+
+from .ConditionalProbabilityTable import DenseProbabilityTable, dense
+from .Exceptions import IncompatibleModelFile, MissingVariable
+from .Graph import Graph
+from .Model import Model
+from .Variables import Variable
+
+# A compiled model is a single binary file (a "bundle"):
+#   - a fixed header: the magic bytes, the format version, and the length of the metadata
+#   - the metadata as UTF-8 JSON: vertices (in topological order), and the outcomes, parents and table position
+#       of each endogenous variable
+#   - the edges of the graph, as pairs of int32 indices into the vertices
+#   - every table, as contiguous float64 arrays
+# Every array starts on an 8-byte boundary, so it can be viewed in place from a memory-mapped file or shared buffer.
+
+MAGIC = b"DOMODEL\0"
+VERSION = 1
+
+_header = "<8sIIQ"
+
+
+def _align(n: int) -> int:
+    return (n + 7) // 8 * 8
+
+
+def _layout(model: Model) -> Tuple[bytes, List[Tuple[int, ndarray]], int]:
+    """
+    Lay out a model as a bundle.
+    @param model: The model to lay out
+    @return: A tuple (head, arrays, size), where head is the header and metadata, arrays is a list of
+        (offset, array) pairs to be written after it, and size is the total size of the bundle in bytes
+    """
+    graph = model.graph()
+
+    vertices = sorted(graph.v, key=graph.get_topology)
+    position = {v: i for i, v in enumerate(vertices)}
+
+    edges = array([(position[s], position[t]) for s, t in sorted(graph.e)], dtype=int32).reshape(-1, 2)
+
+    variables = dict()
+    tables = []
+    offset = 0
+
+    for variable in sorted(model.all_variables(), key=lambda v: position[v.name]):
+        table = model.table(variable.name)
+        domains = [model.variable(p).outcomes if p in model._v else sorted({o.outcome for row in table.table_rows for o in row[1] if o.name == p}) for p in table.parents]
+
+        # A parent which is not a variable of the model has only the outcomes its rows give it; with none, the table
+        #   has no entries to lay out, and could answer no lookup
+        for parent, domain in zip(table.parents, domains):
+            if len(domain) == 0:
+                raise MissingVariable(f"{parent}, a parent of {variable.name}, is not a variable of the model and has no outcome in its table, so the table cannot be compiled")
+
+        probabilities = table.probabilities if isinstance(table, DenseProbabilityTable) else dense(table, domains)
+
+        variables[variable.name] = {
+            "outcomes": variable.outcomes,
+            "parents": variable.parents,
+            "table": {"parents": list(table.parents), "domains": domains, "offset": offset, "size": len(probabilities)}
+        }
+        tables.append(probabilities)
+        offset += len(probabilities)
+
+    metadata = {"vertices": vertices, "edges": len(edges), "endogenous": variables}
+
+    encoded = json_dumps(metadata).encode("utf-8")
+    head = pack(_header, MAGIC, VERSION, 0, len(encoded)) + encoded
+    head += b" " * (_align(len(head)) - len(head))
+
+    arrays = []
+    cursor = len(head)
+
+    arrays.append((cursor, edges.ravel()))
+    cursor = _align(cursor + edges.nbytes)
+
+    for probabilities in tables:
+        arrays.append((cursor, probabilities.astype(float64, copy=False)))
+        cursor += probabilities.nbytes
+
+    return head, arrays, cursor
+
+
+def save(model: Model, destination: Union[str, Path]):
+    """
+    Compile a model to a bundle on disk, which can be loaded (and memory-mapped) by load.
+    @param model: The model to compile
+    @param destination: The path of the file to write
+    """
+    head, arrays, size = _layout(model)
+
+    with Path(destination).open("wb") as f:
+        f.write(head)
+        for offset, a in arrays:
+            f.write(b"\0" * (offset - f.tell()))
+            a.tofile(f)
+
+
+def write(model: Model, buffer) -> int:
+    """
+    Compile a model into a writable buffer, such as a shared memory segment.
+    @param model: The model to compile
+    @param buffer: A writable buffer of at least compiled_size(model) bytes
+    @return: The number of bytes written
+    """
+    head, arrays, size = _layout(model)
+
+    raw = ndarray((size,), dtype=uint8, buffer=buffer)
+    raw[:len(head)] = frombuffer(head, dtype=uint8)
+    for offset, a in arrays:
+        raw[offset:offset + a.nbytes] = a.view(uint8)
+
+    return size
+
+
+def compiled_size(model: Model) -> int:
+    """
+    The size in bytes of a model once compiled.
+    """
+    return _layout(model)[2]
+
+
+def load(source: Union[str, Path]) -> Model:
+    """
+    Load a compiled model, memory-mapping its tables rather than reading them. Processes loading the same file
+    share the pages of its tables.
+    @param source: The path of a bundle written by save
+    @return: A Model whose tables are views of the file
+    """
+    return from_buffer(memmap(source, dtype=uint8, mode="r"))
+
+
+def from_buffer(raw) -> Model:
+    """
+    Construct a model from a compiled bundle in memory, without copying its tables.
+    @param raw: A uint8 array, or any object supporting the buffer protocol, containing the bundle
+    @return: A Model whose tables are views of the given buffer
+    """
+    if not isinstance(raw, ndarray):
+        raw = frombuffer(raw, dtype=uint8)
+
+    magic, version, _, length = unpack_from(_header, raw)
+
+    if magic != MAGIC:
+        raise IncompatibleModelFile("not a compiled model")
+
+    if version != VERSION:
+        raise IncompatibleModelFile(f"compiled model is version {version}, expected version {VERSION}")
+
+    start = calcsize(_header)
+    metadata = json_loads(bytes(raw[start:start + length]).decode("utf-8"))
+
+    cursor = _align(start + length)
+
+    vertices = metadata["vertices"]
+    edges = raw[cursor:cursor + metadata["edges"] * 8].view(int32).reshape(-1, 2)
+    cursor = _align(cursor + edges.nbytes)
+
+    e = {(vertices[s], vertices[t]) for s, t in edges.tolist()}
+
+    variables = dict()
+    tables = dict()
+
+    for name, detail in metadata["endogenous"].items():
+        variable = Variable(name, detail["outcomes"], detail["parents"])
+        table = detail["table"]
+
+        start = cursor + table["offset"] * 8
+        probabilities = raw[start:start + table["size"] * 8].view(float64)
+
+        variables[name] = variable
+        tables[name] = DenseProbabilityTable(variable, table["parents"], table["domains"], probabilities)
+
+    return Model(Graph(set(vertices), e, vertices), variables, tables)
@@ -1,8 +1,8 @@
+from itertools import product
 from math import floor, ceil
-from numpy import empty
 from typing import List, Union
 
-from .Exceptions import MissingTableRow
+from .Exceptions import InvalidOutcome, MissingTableRow
 from .Variables import Variable, Outcome, Intervention
 
 
@@ -24,14 +24,13 @@ class ConditionalProbabilityTable:
 
         self.table_rows = []
 
-        latent = len(parents) - (len(table_rows) - 2)
-
         # Clean up the rows; Each is formatted as: [outcome of variable, parent_1, parent_2, ..., probability]
+        #   Latent parents, which come last, have no column
         for row in table_rows:
             outcome = Outcome(variable.name, row[0])
             p = row[1:-1]
 
-            self.table_rows.append([outcome, [Outcome(v, x) for v, x in zip(parents[:-latent], p)], row[-1]])
+            self.table_rows.append([outcome, [Outcome(v, x) for v, x in zip(parents, p)], row[-1]])
 
     def __str__(self) -> str:
         """
@@ -39,6 +38,8 @@ class ConditionalProbabilityTable:
         @return: A string representation of the table.
         """
 
+        from numpy import empty
+
         # Create a snazzy numpy table
         # Rows: 1 for a header + 1 for each row; Columns: 1 for variable, 1 for each given var, 1 for the probability
         rows = 1 + len(self.table_rows)
@@ -98,3 +99,141 @@ class ConditionalProbabilityTable:
         # Iterated over all the rows and didn't find the correct one
         print(f"Couldn't find row: {outcome} | {', '.join(map(str, given))}")
         raise MissingTableRow
+
+    def set_probability(self, outcome: Union[Outcome, Intervention], given: list, p: float):
+        """
+        Set the probability of the row corresponding to the given outcome and given data, adding the row if the
+        table does not have it
+        @param outcome: The specific outcome of the row
+        @param given: A list of Outcome objects
+        @param p: The new probability of the row
+        """
+        for row in self.table_rows:
+            if outcome == row[0] and set(row[1]) == set(given):
+                row[2] = p
+                return
+
+        self.table_rows.append([Outcome(outcome.name, outcome.outcome), [Outcome(v.name, v.outcome) for v in given], p])
+
+
+class DenseProbabilityTable(ConditionalProbabilityTable):
+    """
+    A ConditionalProbabilityTable backed by a flat array of probabilities, one entry for every combination of an
+    outcome of the variable and outcomes of its parents. The array may be a view of a memory-mapped or shared
+    buffer, in which case the table holds no per-row Python objects until its rows are asked for.
+    @param variable: A Variable object, representing the variable this table computes a probability for
+    @param parents: A (possibly empty) list of the names of the parents of the variable
+    @param domains: A list of the outcomes of each parent, in the same order as the parents
+    @param probabilities: A flat float64 array, indexed in row-major order over (variable, parent_1, parent_2, ...),
+        where a missing row is represented by NaN
+    """
+
+    def __init__(self, variable: Variable, parents: List[str], domains: List[List[str]], probabilities):
+        self.variable = variable
+        self.parents = parents
+        self.domains = domains
+        self.probabilities = probabilities
+
+        # Mixed-radix strides; the outcome of the variable is the most significant "digit"
+        self._index = [{outcome: i for i, outcome in enumerate(variable.outcomes)}]
+        self._index.extend({outcome: i for i, outcome in enumerate(domain)} for domain in domains)
+
+        self._strides = []
+        stride = 1
+        for index in reversed(self._index):
+            self._strides.insert(0, stride)
+            stride *= len(index)
+
+        self._rows = None
+
+    @property
+    def table_rows(self) -> List:
+        """
+        The rows of the table, each formatted as [<OUTCOME>, [<GIVEN_1_OUTCOME>, ...], <P>], built on first use.
+        """
+        if self._rows is None:
+            self._rows = []
+            names = [self.variable.name] + list(self.parents)
+            domains = [self.variable.outcomes] + list(self.domains)
+            for cross, p in zip(product(*domains), self.probabilities.tolist()):
+                if p == p:      # NaN marks a row that was missing from the table
+                    outcomes = [Outcome(name, value) for name, value in zip(names, cross)]
+                    self._rows.append([outcomes[0], outcomes[1:], p])
+        return self._rows
+
+    def probability_lookup(self, outcome: Union[Outcome, Intervention], given: list) -> float:
+        """
+        Directly lookup the probability for the row corresponding to the queried outcome and given data
+        @param outcome: The specific outcome to lookup
+        @param given: A list of Outcome objects
+        @return: A probability corresponding to the respective row. Raises an Exception otherwise.
+        """
+        values = {v.name: v.outcome for v in given}
+
+        if len(values) == len(given) == len(self.parents) and all(parent in values for parent in self.parents):
+            try:
+                position = self._index[0][outcome.outcome] * self._strides[0]
+                for i, parent in enumerate(self.parents, start=1):
+                    position += self._index[i][values[parent]] * self._strides[i]
+            except KeyError:
+                position = None
+
+            if position is not None:
+                p = float(self.probabilities[position])
+                if p == p:
+                    return p
+
+        print(f"Couldn't find row: {outcome} | {', '.join(map(str, given))}")
+        raise MissingTableRow
+
+    def set_probability(self, outcome: Union[Outcome, Intervention], given: list, p: float):
+        """
+        Set the probability of the row corresponding to the given outcome and given data. If the array is read-only
+        (such as a view of a memory-mapped file), the table is given its own copy of it first.
+        @param outcome: The specific outcome of the row
+        @param given: A list of Outcome objects, one for each parent
+        @param p: The new probability of the row
+        """
+        values = {v.name: v.outcome for v in given}
+
+        try:
+            position = self._index[0][outcome.outcome] * self._strides[0]
+            for i, parent in enumerate(self.parents, start=1):
+                position += self._index[i][values[parent]] * self._strides[i]
+        except KeyError:
+            raise InvalidOutcome(f"{outcome} | {', '.join(map(str, given))}")
+
+        if not self.probabilities.flags.writeable:
+            self.probabilities = self.probabilities.copy()
+
+        self.probabilities[position] = p
+        self._rows = None
+
+
+def dense(table: ConditionalProbabilityTable, domains: List[List[str]]):
+    """
+    Convert the rows of a ConditionalProbabilityTable to the flat array of probabilities used by a
+    DenseProbabilityTable.
+    @param table: The table to convert
+    @param domains: A list of the outcomes of each parent of the table, in the same order as its parents
+    @return: A flat float64 array of the probabilities of the table, with NaN for any missing rows
+    """
+    index = [{outcome: i for i, outcome in enumerate(table.variable.outcomes)}]
+    index.extend({outcome: i for i, outcome in enumerate(domain)} for domain in domains)
+
+    size = 1
+    for i in index:
+        size *= len(i)
+
+    from numpy import full, nan
+
+    probabilities = full(size, nan)
+
+    for row_outcome, row_given, row_p in table.table_rows:
+        values = {v.name: v.outcome for v in row_given}
+        position = index[0][row_outcome.outcome]
+        for i, parent in enumerate(table.parents, start=1):
+            position = position * len(index[i]) + index[i][values[parent]]
+        probabilities[position] = row_p
+
+    return probabilities
@@ -47,3 +47,61 @@ class EmptyExpressionHead(ProbabilityException):
 
 class ExogenousNonRoot(ProbabilityException):
     pass
+
+
+class IncompatibleModelFile(ProbabilityException):
+    """
+    Raised when attempting to load a compiled model from a file which is not one, or which was compiled by an
+    incompatible version.
+    """
+    pass
+
+
+class DuplicateTableRow(ProbabilityException):
+    """
+    Raised when a table contains more than one row for the same outcome of its variable and outcomes of its parents.
+    """
+    pass
+
+
+class InconsistentDistribution(ProbabilityException):
+    """
+    Raised when the probabilities of the outcomes of a variable, given some outcomes of its parents, do not sum to 1.
+    """
+    pass
+
+
+class CyclicGraph(ProbabilityException):
+    """
+    Raised when the graph of a model contains a cycle, and so is not a DAG.
+    """
+    pass
+
+
+class InvalidModel(ProbabilityException):
+    """
+    Raised when a model fails validation, containing every problem found, each represented as an exception.
+    """
+
+    def __init__(self, problems: list):
+        super().__init__(f"{len(problems)} problem(s) found in model:\n" + "\n".join(f"{type(p).__name__}: {p}" for p in problems))
+        self.problems = problems
+
+
+class ReadOnlyModel(ProbabilityException):
+    """
+    Raised when attempting to modify a model which is shared, such as one held by a registry.
+    """
+    pass
+
+
+class BudgetExceeded(ProbabilityException):
+    """
+    Raised when a query exceeds a limit of the budget it is run under, containing the budget, with the work counted
+    against it, and the Stats of the work done up to that point (if collected).
+    """
+
+    def __init__(self, reason: str, budget, stats=None):
+        super().__init__(reason)
+        self.budget = budget
+        self.stats = stats
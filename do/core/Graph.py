@@ -1,5 +1,8 @@
-from typing import Collection, Optional, Sequence, Set, Tuple, Union
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Set, Tuple, Union
 
+from .Exceptions import CyclicGraph
+from .Hooks import span
+from .Stats import active
 from .Types import VClass, Vertex
 
 
@@ -7,12 +10,15 @@ class Graph:
 
     """A basic graph, with edge control."""
 
-    def __init__(self, v: Set[str], e: Set[Tuple[str, str]], topology: Optional[Sequence[Union[str, VClass]]] = None):
+    def __init__(self, v: Set[str], e: Set[Tuple[str, str]], topology: Optional[Sequence[Union[str, VClass]]] = None, strict: bool = True):
         """
         Initializer for a basic Graph.
         @param v: A set of vertices
         @param e: A set of edges, each edge being (source, target)
         @param topology: An optional sequence of vertices defining the topological ordering of the graph
+        @param strict: If False, a graph with a cycle is built anyway, the vertices on or below a cycle being placed
+            last in the ordering, so that the cycle can be reported (such as by validate) rather than failing here
+        @raise CyclicGraph if the graph has a cycle, strict is True, and no topology is given
         """
 
         self.v = v
@@ -29,13 +35,23 @@ class Graph:
         self.outgoing_disabled = set()
         self.incoming_disabled = set()
 
+        # The vertices on or below a cycle, if the graph was built with one; queries on the graph refuse to run
+        self.cyclic: List[str] = []
+
         if not topology:
-            topology = self.topology_sort()
+            topology = self.topology_sort(strict)
+            if len(topology) < len(self.incoming):
+                sorted_vertices = set(topology)
+                self.cyclic = sorted(v for v in self.incoming if v not in sorted_vertices)
+                topology.extend(self.cyclic)
         else:
             topology = list(filter(lambda x: x in v, topology))
 
         self.topology_map = {vertex: index for index, vertex in enumerate(topology, start=1)}
 
+        # The ancestors and descendants of each vertex, computed while no edges are disabled
+        self.closures = dict()
+
     def __str__(self) -> str:
         """
         String builtin for the Graph class
@@ -90,14 +106,29 @@ class Graph:
         @return: A set of reachable ancestors of v
         """
 
+        key = ("ancestors", to_label(v))
+        stats = active()
+
+        if key in self.closures and not self.incoming_disabled and not self.outgoing_disabled:
+            if stats is not None:
+                stats.count("closure_cache_hit")
+            return set(self.closures[key])
+
+        if stats is not None:
+            stats.count("closure_cache_miss")
+
+        # Each vertex is expanded once, however many paths reach it
         ancestors = set()
-        queue = []
-        queue.extend(self.parents(v))
+        stack = list(self.parents(v))
+
+        while stack:
+            current = stack.pop()
+            if current not in ancestors:
+                ancestors.add(current)
+                stack.extend(self.parents(current))
 
-        while queue:
-            current = queue.pop(0)
-            ancestors.add(current)
-            queue.extend(self.parents(current))
+        if not self.incoming_disabled and not self.outgoing_disabled:
+            self.closures[key] = frozenset(ancestors)
 
         return ancestors
 
@@ -108,14 +139,29 @@ class Graph:
         @return: A set of reachable descendants of v
         """
 
+        key = ("descendants", to_label(v))
+        stats = active()
+
+        if key in self.closures and not self.incoming_disabled and not self.outgoing_disabled:
+            if stats is not None:
+                stats.count("closure_cache_hit")
+            return set(self.closures[key])
+
+        if stats is not None:
+            stats.count("closure_cache_miss")
+
+        # Each vertex is expanded once, however many paths reach it
         children = set()
-        queue = []
-        queue.extend(list(self.children(v)))
+        stack = list(self.children(v))
+
+        while stack:
+            current = stack.pop()
+            if current not in children:
+                children.add(current)
+                stack.extend(self.children(current))
 
-        while queue:
-            current = queue.pop(0)
-            children.add(current)
-            queue.extend(list(self.children(current)))
+        if not self.incoming_disabled and not self.outgoing_disabled:
+            self.closures[key] = frozenset(children)
 
         return children
 
@@ -142,6 +188,130 @@ class Graph:
         self.outgoing_disabled.clear()
         self.incoming_disabled.clear()
 
+    def view(self, incoming_disabled: Collection[Vertex] = (), outgoing_disabled: Collection[Vertex] = ()) -> "Graph":
+        """
+        A view of the graph, sharing its vertices, edges and closures, but with edges of its own disabled, so that
+        disabling edges in the view leaves the graph (and any other view of it) unchanged. Taking a view takes
+        constant time, besides disabling the edges given; the graph must not be modified while a view is in use.
+        @param incoming_disabled: Vertices whose incoming edges are disabled in the view, besides those of the graph
+        @param outgoing_disabled: Vertices whose outgoing edges are disabled in the view, besides those of the graph
+        @return: The view
+        """
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view.incoming_disabled = self.incoming_disabled | {to_label(v) for v in incoming_disabled}
+        view.outgoing_disabled = self.outgoing_disabled | {to_label(v) for v in outgoing_disabled}
+        return view
+
+    def add_vertex(self, v: str):
+        """
+        Add a vertex with no edges, placed last in the topological ordering.
+        @param v: The vertex to add
+        """
+        if v in self.v:
+            return
+
+        self.v.add(v)
+        self.incoming[v] = set()
+        self.outgoing[v] = set()
+        self.topology_map[v] = max(self.topology_map.values(), default=0) + 1
+
+    def remove_vertex(self, v: str):
+        """
+        Remove a vertex, along with every edge into or out of it.
+        @param v: The vertex to remove
+        """
+        for parent in list(self.incoming[v]):
+            self.remove_edge(parent, v)
+
+        for child in list(self.outgoing[v]):
+            self.remove_edge(v, child)
+
+        self.v.remove(v)
+        del self.incoming[v]
+        del self.outgoing[v]
+        del self.topology_map[v]
+
+    def add_edge(self, s: str, t: str):
+        """
+        Add an edge, reordering only the vertices between s and t in the topological ordering if t currently comes
+        before s (Pearce & Kelly, 2006), and forgetting only the closures the edge changes.
+        @param s: The source of the edge
+        @param t: The target of the edge
+        @raise CyclicGraph if the edge would create a cycle, in which case the graph is unchanged
+        """
+        if (s, t) in self.e:
+            return
+
+        if s == t:
+            raise CyclicGraph(f"adding {s} -> {t} creates a cycle")
+
+        lower, upper = self.topology_map[t], self.topology_map[s]
+
+        if lower < upper:
+            forward = self._reach(t, self.outgoing, lambda v: self.topology_map[v] <= upper)
+            if s in forward:
+                raise CyclicGraph(f"adding {s} -> {t} creates a cycle")
+
+            backward = self._reach(s, self.incoming, lambda v: self.topology_map[v] >= lower)
+
+            # The affected vertices take the same positions as before, those reaching s before those reached from t
+            positions = sorted(self.topology_map[v] for v in forward | backward)
+            ordered = sorted(backward, key=self.topology_map.get) + sorted(forward, key=self.topology_map.get)
+            for position, v in zip(positions, ordered):
+                self.topology_map[v] = position
+
+        self._invalidate(s, t)
+
+        self.e.add((s, t))
+        self.outgoing[s].add(t)
+        self.incoming[t].add(s)
+
+    def remove_edge(self, s: str, t: str):
+        """
+        Remove an edge, forgetting only the closures the edge changes. The topological ordering remains valid.
+        @param s: The source of the edge
+        @param t: The target of the edge
+        """
+        if (s, t) not in self.e:
+            return
+
+        self._invalidate(s, t)
+
+        self.e.remove((s, t))
+        self.outgoing[s].remove(t)
+        self.incoming[t].remove(s)
+
+    def _reach(self, start: str, adjacency: Dict[str, Set[str]], within: Callable[[str], bool] = lambda v: True) -> Set[str]:
+        """
+        Every vertex reachable from start (including itself) along the given adjacency, ignoring disabled edges and
+        not passing through any vertex for which within is False.
+        """
+        reached = {start}
+        stack = [start]
+
+        while stack:
+            for v in adjacency[stack.pop()]:
+                if v not in reached and within(v):
+                    reached.add(v)
+                    stack.append(v)
+
+        return reached
+
+    def _invalidate(self, s: str, t: str):
+        """
+        Forget the closures changed by adding or removing the edge (s, t): the descendants of s and its ancestors, and
+        the ancestors of t and its descendants.
+        """
+        if not self.closures:
+            return
+
+        for v in self._reach(s, self.incoming):
+            self.closures.pop(("descendants", v), None)
+
+        for v in self._reach(t, self.outgoing):
+            self.closures.pop(("ancestors", v), None)
+
     def get_topology(self, v: Vertex) -> int:
         """
         Determine the "depth" a given Variable is at in a topological sort of the graph
@@ -162,9 +332,10 @@ class Graph:
         Copy builtin allowing the Graph to be copied
         @return: A copied Graph
         """
-        copied = Graph(self.v.copy(), set(self.e.copy()))
+        copied = Graph(self.v.copy(), set(self.e.copy()), sorted(self.v, key=self.get_topology))
         copied.incoming_disabled = self.incoming_disabled.copy()
         copied.outgoing_disabled = self.outgoing_disabled.copy()
+        copied.cyclic = self.cyclic.copy()
         return copied
 
     def __getitem__(self, v: set):
@@ -184,22 +355,38 @@ class Graph:
         """
         return sorted(variables, key=lambda v: self.get_topology(v))
 
-    def topology_sort(self) -> Sequence[str]:
+    def topology_sort(self, strict: bool = True) -> Sequence[str]:
+        """
+        Sort the vertices of the graph in layers: the roots, then every vertex whose parents are all in the layers
+        before it, and so on, with each layer sorted by name. Takes time linear in the size of the graph.
+        @param strict: If False, a graph with a cycle is sorted as far as possible, leaving out every vertex on or
+            below a cycle, rather than failing
+        @return: A list of the vertices in topological order
+        @raise CyclicGraph if the graph has a cycle, and strict is True
+        """
+
+        with span("graph.topology_sort", vertices=len(self.v)):
+            remaining = {v: len(self.incoming[v]) for v in self.incoming}
+            layer = sorted(v for v, n in remaining.items() if n == 0)
+            topology = []
 
-        topology = []
-        v = self.v.copy()
-        e = self.e.copy()
+            while layer:
+                topology.extend(layer)
 
-        while len(v) > 0:
+                following = []
+                for s in layer:
+                    for t in self.outgoing[s]:
+                        remaining[t] -= 1
+                        if remaining[t] == 0:
+                            following.append(t)
 
-            roots = set(filter(lambda t: not any((s, t) in e for s in v), v))
-            assert len(roots) > 0
+                layer = sorted(following)
 
-            topology.extend(sorted(list(roots)))
-            v -= roots
-            e -= set(filter(lambda edge: edge[0] in roots, e))
+            if strict and len(topology) < len(remaining):
+                unsorted = sorted(v for v, n in remaining.items() if n > 0)
+                raise CyclicGraph(f"vertices on or below a cycle: {', '.join(unsorted)}")
 
-        return topology
+            return topology
 
     def without_incoming_edges(self, x: Collection[Vertex]):
 
@@ -0,0 +1,205 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from os import getpid
+from pathlib import Path
+from threading import Lock, get_ident
+from time import perf_counter_ns
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# Every exporter installed; instrumentation points do nothing while this is empty. It is never changed in place, but
+#   replaced (under _lock) by install and uninstall, so that other threads may iterate over it at any time
+_exporters: Tuple["Exporter", ...] = ()
+_lock = Lock()
+
+# Timestamps are recorded in nanoseconds since this module was loaded
+_origin = perf_counter_ns()
+
+_disabled = nullcontext()
+
+
+class Exporter(ABC):
+    """
+    Receives every span and event recorded while installed. A span is a named, timed block of code, such as loading
+    a model or a backdoor search; an event is a point in time, such as an inference rule being applied.
+    """
+
+    @abstractmethod
+    def record(self, name: str, start: int, duration: Optional[int], args: dict, thread: int):
+        """
+        @param name: The name of the span or event, such as "model.load" or "inference.bayes_rule"
+        @param start: When it started, in nanoseconds
+        @param duration: How long the span took, in nanoseconds, or None for an event
+        @param args: Details of the span or event, such as the path of a model
+        @param thread: The identifier of the thread it was recorded on
+        """
+
+    def close(self):
+        """
+        Called when the exporter is uninstalled by exporting, such as to write out a file.
+        """
+        pass
+
+
+class JSONExporter(Exporter):
+    """
+    Write every span and event to a JSON file, as a list of records of their name, start and duration (in seconds),
+    details and thread, once closed.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.records = []
+
+    def record(self, name: str, start: int, duration: Optional[int], args: dict, thread: int):
+        self.records.append({"name": name, "start": start / 1e9, "duration": None if duration is None else duration / 1e9, "args": args, "thread": thread})
+
+    def close(self):
+        from json import dump
+
+        with self.path.open("w") as f:
+            dump(self.records, f, default=str)
+
+
+class ChromeTraceExporter(Exporter):
+    """
+    Write every span and event to a file in the Chrome trace event format, once closed, to be viewed in
+    chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.events = []
+
+    def record(self, name: str, start: int, duration: Optional[int], args: dict, thread: int):
+        event = {"name": name, "cat": name.split(".")[0], "ts": start / 1000, "pid": getpid(), "tid": thread, "args": args}
+        if duration is None:
+            event.update(ph="i", s="t")
+        else:
+            event.update(ph="X", dur=duration / 1000)
+        self.events.append(event)
+
+    def close(self):
+        from json import dump
+
+        with self.path.open("w") as f:
+            dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+class Histograms(Exporter):
+    """
+    Keep the durations of every span, and the number of every event, by name, in memory.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, List[int]] = dict()
+        self.counts: Dict[str, int] = dict()
+
+    def record(self, name: str, start: int, duration: Optional[int], args: dict, thread: int):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if duration is not None:
+            self.durations.setdefault(name, []).append(duration)
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        @return: A mapping of the name of each span to its count and its total, mean, median, 90th and 99th percentile
+            and maximum duration, in seconds; and of each event to its count
+        """
+        from statistics import quantiles
+
+        summary = {name: {"count": n} for name, n in self.counts.items()}
+
+        for name, durations in self.durations.items():
+            seconds = sorted(d / 1e9 for d in durations)
+            cuts = quantiles(seconds, n=100, method="inclusive") if len(seconds) > 1 else seconds * 99
+            summary[name].update(total=sum(seconds), mean=sum(seconds) / len(seconds), p50=cuts[49], p90=cuts[89], p99=cuts[98], max=seconds[-1])
+
+        return summary
+
+
+class _Span:
+
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = perf_counter_ns()
+        for exporter in _exporters:
+            exporter.record(self.name, self.start - _origin, end - self.start, self.args, get_ident())
+
+
+def enabled() -> bool:
+    """
+    @return: True if any exporter is installed
+    """
+    return bool(_exporters)
+
+
+def span(name: str, **args):
+    """
+    Time a block of code, such as:
+
+        with span("model.load", path=str(path)):
+            ...
+
+    @param name: The name of the span
+    @param args: Details of the span, passed on to every exporter
+    @return: A context manager, which records nothing if no exporter is installed
+    """
+    if not _exporters:
+        return _disabled
+
+    return _Span(name, args)
+
+
+def event(name: str, **args):
+    """
+    Record that something happened, if any exporter is installed.
+    @param name: The name of the event
+    @param args: Details of the event, passed on to every exporter
+    """
+    if not _exporters:
+        return
+
+    now = perf_counter_ns() - _origin
+    for exporter in _exporters:
+        exporter.record(name, now, None, args, get_ident())
+
+
+def install(exporter: Exporter):
+    global _exporters
+
+    with _lock:
+        _exporters = _exporters + (exporter,)
+
+
+def uninstall(exporter: Exporter):
+    global _exporters
+
+    with _lock:
+        index = _exporters.index(exporter)
+        _exporters = _exporters[:index] + _exporters[index + 1:]
+
+
+@contextmanager
+def exporting(*exporters: Exporter) -> Iterator[tuple]:
+    """
+    Install exporters for the duration of a with block, closing each (and so writing out its file) afterwards.
+    Exporters are process-wide, so spans and events recorded on any thread are exported.
+    @return: The exporters
+    """
+    for exporter in exporters:
+        install(exporter)
+
+    try:
+        yield exporters
+    finally:
+        for exporter in exporters:
+            uninstall(exporter)
+            exporter.close()
@@ -1,20 +1,34 @@
 from itertools import product
-from loguru import logger
-from typing import Collection
+from typing import Collection, Generator, List
 
-from .Exceptions import ExogenousNonRoot, ProbabilityIndeterminableException
+from .Budget import active as active_budget
+from .ConditionalProbabilityTable import DenseProbabilityTable
+from .Exceptions import CyclicGraph, DuplicateTableRow, ExogenousNonRoot, InconsistentDistribution, InvalidModel, InvalidOutcome, MissingTableRow, ProbabilityException, ProbabilityIndeterminableException
 from .Expression import Expression
+from .Hooks import enabled, event, span
 from .Model import Model
+from .Stats import active
 from .Variables import Outcome, Intervention
 
-from .helpers import within_precision
+from .helpers import logger, trampoline
 
 
 def inference(expression: Expression, model: Model):
 
-    def _compute(head: Collection[Outcome], body: Collection[Intervention], depth=0) -> float:
+    # A query on a cycle would be computed in terms of itself, forever
+    cyclic = model.graph().cyclic
+    if cyclic:
+        raise CyclicGraph(f"vertices on or below a cycle: {', '.join(cyclic)}")
+
+    # Looked up once per query, rather than at every step
+    stats = active()
+    budget = active_budget()
+    hooks = enabled()
+
+    def _compute(head: Collection[Outcome], body: Collection[Intervention], depth=0) -> Generator[Generator, float, float]:
         """
-        Compute the probability of some head given some body
+        Compute the probability of some head given some body. Run by trampoline: each sub-query is yielded, and its
+        probability sent back, rather than computed by a recursive call.
         @param head: A list of some number of Outcome objects
         @param body: A list of some number of Outcome objects
         @param depth: Used for horizontal offsets in outputting info
@@ -29,9 +43,20 @@ def inference(expression: Expression, model: Model):
         current_expression = Expression(head, body)
         logger.info(f"query: {current_expression}")
 
+        if stats is not None:
+            stats.count("query")
+            stats.reach(depth)
+
+        if budget is not None:
+            budget.step()
+
         # If the calculation for this contains two separate outcomes for a variable (Y = y | Y = ~y), 0
         if contradictory_outcome_set(head + body):
             logger.error("two separate outcomes for one variable, P = 0.0")
+            if stats is not None:
+                stats.count("contradiction")
+            if hooks:
+                event("inference.contradiction", depth=depth)
             return 0.0
 
         ###############################################
@@ -41,9 +66,13 @@ def inference(expression: Expression, model: Model):
 
         if len(head) > 1:
             logger.info(f"applying reverse product rule to {current_expression}")
+            if stats is not None:
+                stats.count("product_rule")
+            if hooks:
+                event("inference.product_rule", depth=depth)
 
-            result_1 = _compute(head[:-1], [head[-1]] + body, depth+1)
-            result_2 = _compute([head[-1]], body, depth+1)
+            result_1 = yield _compute(head[:-1], [head[-1]] + body, depth+1)
+            result_2 = yield _compute([head[-1]], body, depth+1)
             result = result_1 * result_2
 
             logger.success(f"{current_expression} = {result}")
@@ -55,6 +84,10 @@ def inference(expression: Expression, model: Model):
 
         if set(model.variable(head[0].name).parents) == set(v.name for v in body):
             logger.info(f"querying table for: {current_expression}")
+            if stats is not None:
+                stats.count("table_lookup")
+            if hooks:
+                event("inference.table_lookup", depth=depth)
             table = model.table(head[0].name)                           # Get table
             probability = table.probability_lookup(head[0], body)       # Get specific row
             logger.success(f"{current_expression} = {probability}")
@@ -69,6 +102,10 @@ def inference(expression: Expression, model: Model):
 
         if set(head).issubset(set(body)):
             logger.success(f"identity rule: X|X = 1.0, therefore {current_expression} = 1.0")
+            if stats is not None:
+                stats.count("identity_rule")
+            if hooks:
+                event("inference.identity_rule", depth=depth)
             return 1.0
 
         #################################################
@@ -83,6 +120,10 @@ def inference(expression: Expression, model: Model):
         if descendants_in_rhs:
             logger.info(f"Children of the LHS in the RHS: {','.join(descendants_in_rhs)}")
             logger.info("Applying Bayes' rule.")
+            if stats is not None:
+                stats.count("bayes_rule")
+            if hooks:
+                event("inference.bayes_rule", depth=depth)
 
             # Not elegant, but simply take one of the children from the body out and recurse
             child = list(descendants_in_rhs)[0]
@@ -91,9 +132,9 @@ def inference(expression: Expression, model: Model):
 
             logger.info(f"{Expression(child, head + new_body)} * {Expression(head, new_body)} / {Expression(child, new_body)}")
 
-            result_1 = _compute(child, head + new_body, depth+1)
-            result_2 = _compute(head, new_body, depth+1)
-            result_3 = _compute(child, new_body, depth+1)
+            result_1 = yield _compute(child, head + new_body, depth+1)
+            result_2 = yield _compute(head, new_body, depth+1)
+            result_3 = yield _compute(child, new_body, depth+1)
             if result_3 == 0:       # Avoid dividing by 0! coverage: skip
                 logger.success(f"{Expression([child], new_body)} = 0, therefore the result is 0.")
                 return 0
@@ -114,12 +155,19 @@ def inference(expression: Expression, model: Model):
 
         if missing_parents:
             logger.info("Attempting application of Jeffrey's Rule")
+            if stats is not None:
+                stats.count("jeffrey_rule")
+            if hooks:
+                event("inference.jeffrey_rule", depth=depth)
 
             for missing_parent in missing_parents:
 
                 # Add one parent back in and recurse
                 parent_outcomes = model.variable(missing_parent).outcomes
 
+                if budget is not None:
+                    budget.enumerate(len(parent_outcomes))
+
                 # Consider the missing parent and sum every probability involving it
                 total = 0.0
                 for parent_outcome in parent_outcomes:
@@ -128,8 +176,8 @@ def inference(expression: Expression, model: Model):
 
                     logger.info(f"{Expression(head, [as_outcome] + body)}, * {Expression([as_outcome], body)}")
 
-                    result_1 = _compute(head, [as_outcome] + body, depth+1)
-                    result_2 = _compute([as_outcome], body, depth+1)
+                    result_1 = yield _compute(head, [as_outcome] + body, depth+1)
+                    result_2 = yield _compute([as_outcome], body, depth+1)
                     outcome_result = result_1 * result_2
 
                     total += outcome_result
@@ -149,7 +197,11 @@ def inference(expression: Expression, model: Model):
 
             if can_drop:
                 logger.info(f"can drop: {[str(item) for item in can_drop]}")
-                result = _compute(head, list(set(body) - set(can_drop)), depth+1)
+                if stats is not None:
+                    stats.count("drop_non_parents")
+                if hooks:
+                    event("inference.drop_non_parents", depth=depth)
+                result = yield _compute(head, list(set(body) - set(can_drop)), depth+1)
                 logger.success(f"{current_expression} = {result}")
                 return result
 
@@ -168,7 +220,15 @@ def inference(expression: Expression, model: Model):
         assert not isinstance(out, Intervention), \
             f"Error: basic inference engine does not handle Interventions ({out.name} is an Intervention)"
 
-    return _compute(list(head), list(body))
+    if stats is None and not hooks:
+        return trampoline(_compute(list(head), list(body)))
+
+    with span("inference", query=str(expression)):
+        if stats is None:
+            return trampoline(_compute(list(head), list(body)))
+
+        with stats.phase("inference"):
+            return trampoline(_compute(list(head), list(body)))
 
 
 def contradictory_outcome_set(outcomes: Collection[Outcome]) -> bool:
@@ -186,29 +246,115 @@ def contradictory_outcome_set(outcomes: Collection[Outcome]) -> bool:
 def validate(model: Model) -> bool:
     """
     Ensures a model is 'valid' and 'consistent'.
-    1. Ensures the is a DAG (contains no cycles)
+    1. Ensures the graph is a DAG (contains no cycles)
     2. Ensures all variables denoted as exogenous are roots.
-    3. Ensures all distributions are consistent (the sum of probability of each outcome is 1.0)
+    3. Ensures every table has exactly one row for each outcome of its variable and outcomes of its parents, and that
+        the probabilities of the outcomes of its variable sum to 1.0 given each outcome of its parents.
+
+    Tables are checked one at a time, directly from their rows, without running any inference.
 
-    Returns True on success (indicating a valid model), or raises an appropriate Exception indicating a failure.
+    Returns True on success (indicating a valid model), or raises an InvalidModel exception containing every problem
+    found otherwise.
     """
+    problems = []
+
     # no cycles
-    ...
+    graph = model.graph()
+    order = graph.topology_sort(strict=False)
+    if len(order) < len(graph.v):
+        problems.append(CyclicGraph(f"vertices on or below a cycle: {', '.join(sorted(set(graph.v) - set(order)))}"))
 
     # exogenous variables are all roots
     exogenous = model._g.v - set(model._v.keys())
     roots = model._g.roots()
     for variable in exogenous:
         if variable not in roots:
-            raise ExogenousNonRoot(variable)
+            problems.append(ExogenousNonRoot(variable))
 
     # consistent distributions
-    for name, variable in model._v.items():
-        t = 0
-        for outcome in variable.outcomes:
-            t += inference(Expression(Outcome(name, outcome)), model)
+    for name in model._v:
+        problems.extend(table_problems(model, name))
 
-        assert within_precision(t, 1)
+    if problems:
+        raise InvalidModel(problems)
 
     # all checks passed -> valid model
     return True
+
+
+def table_problems(model: Model, name: str) -> List[ProbabilityException]:
+    """
+    Check the table of one variable of a model, counting the rows and summing the probabilities of each outcome of
+    its parents with array arithmetic.
+    @param model: The model containing the table
+    @param name: The name of the variable whose table is checked
+    @return: A list of every problem found, each represented as an exception: InvalidOutcome for a row with an
+        unknown outcome, MissingTableRow, DuplicateTableRow, and InconsistentDistribution
+    """
+    from numpy import abs as np_abs, asarray, bincount, float64, int64, isnan, nan_to_num, nonzero, unravel_index
+
+    table = model.table(name)
+    parents = list(table.parents)
+    outcomes = model.variable(name).outcomes
+
+    if isinstance(table, DenseProbabilityTable):
+        domains = [outcomes] + list(table.domains)
+        present = ~isnan(table.probabilities)
+        counts = present.astype(int64)
+        sums = nan_to_num(table.probabilities)
+        problems = []
+
+    else:
+        # The outcomes of a latent parent are only known from the rows of the table
+        domains = [outcomes] + [model.variable(p).outcomes if p in model._v else sorted({o.outcome for row in table.table_rows for o in row[1] if o.name == p}) for p in parents]
+        index = [{outcome: i for i, outcome in enumerate(domain)} for domain in domains]
+
+        positions = []
+        probabilities = []
+        problems = []
+
+        for row_outcome, row_given, row_p in table.table_rows:
+            values = {v.name: v.outcome for v in row_given}
+            try:
+                position = index[0][row_outcome.outcome]
+                for i, parent in enumerate(parents, start=1):
+                    position = position * len(index[i]) + index[i][values[parent]]
+            except KeyError:
+                problems.append(InvalidOutcome(f"{row_outcome} | {', '.join(map(str, row_given))}"))
+                continue
+
+            positions.append(position)
+            probabilities.append(row_p)
+
+        size = 1
+        for domain in domains:
+            size *= len(domain)
+
+        positions = asarray(positions, dtype=int64)
+        counts = bincount(positions, minlength=size)
+        sums = bincount(positions, weights=asarray(probabilities, dtype=float64), minlength=size)
+
+    shape = [len(domain) for domain in domains]
+
+    def given(column: int) -> str:
+        cross = [domain[i] for domain, i in zip(domains[1:], unravel_index(column, shape[1:]))]
+        return ", ".join(f"{p} = {o}" for p, o in zip(parents, cross))
+
+    def row(position: int) -> str:
+        outcome, column = divmod(int(position), counts.size // len(outcomes))
+        return f"{name} = {outcomes[outcome]}" + (f" | {given(column)}" if parents else "")
+
+    for position in nonzero(counts == 0)[0]:
+        problems.append(MissingTableRow(row(position)))
+
+    for position in nonzero(counts > 1)[0]:
+        problems.append(DuplicateTableRow(row(position)))
+
+    # One row per outcome of the variable, one column per outcome of the parents; only complete columns are summed
+    complete = (counts.reshape(len(outcomes), -1) == 1).all(axis=0)
+    totals = sums.reshape(len(outcomes), -1).sum(axis=0)
+
+    for column in nonzero(complete & (np_abs(totals - 1) >= 1 / (10 ** 5)))[0]:
+        problems.append(InconsistentDistribution(f"P({name}" + (f" | {given(column)}" if parents else "") + f") sums to {totals[column]}"))
+
+    return problems
@@ -1,13 +1,18 @@
-from json import load as json_load
+from collections import OrderedDict
 from pathlib import Path
-from typing import Collection, Mapping
-from loguru import logger
-from yaml import safe_load as yaml_load
+from threading import Lock
+from typing import Collection, List, Mapping, Optional, Tuple, Union
 
 from .ConditionalProbabilityTable import ConditionalProbabilityTable
-from .Exceptions import MissingVariable
+from .Exceptions import MissingVariable, ReadOnlyModel
 from .Graph import Graph
-from .Variables import Variable
+from .Hooks import span
+from .Stats import active
+from .Types import Vertex
+from .Streaming import StreamedTable, safe_loader, stream_yaml
+from .Variables import Outcome, Variable
+
+from .helpers import logger
 
 
 class Model:
@@ -17,9 +22,24 @@ class Model:
         self._v = {k: variables[k] for k in variables}
         self._d = {k: distribution[k] for k in distribution}
 
+        # Shared models (such as those held by a registry) are read-only
+        self.read_only = False
+
     def graph(self) -> Graph:
         return self._g
 
+    def intervened(self, interventions: Collection[Vertex]) -> "Model":
+        """
+        A view of the model in which the incoming edges of the given variables are disabled, sharing its variables and
+        tables. The model itself is unchanged, so any number of threads may take views of a (shared) model at once.
+        @param interventions: The variables (or Interventions) to isolate as roots
+        @return: The view
+        """
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view._g = self._g.view(incoming_disabled=interventions)
+        return view
+
     def variable(self, key: str) -> Variable:
         if key not in self._v:
             logger.error(f"unknown variable: {key}")
@@ -35,34 +55,298 @@ class Model:
     def all_variables(self) -> Collection[Variable]:
         return self._v.values()
 
+    def replace_table(self, table: ConditionalProbabilityTable):
+        """
+        Replace the table of an endogenous variable.
+        @param table: The new table, whose variable and parents must be those of the variable it replaces the table of
+        """
+        self._writable()
+
+        variable = self.variable(table.variable.name)
+        if set(table.parents) != set(variable.parents):
+            raise ValueError(f"table of {variable.name} has parents {table.parents}, expected {variable.parents}")
+
+        self._store(variable, table)
+
+    def set_probability(self, outcome: Outcome, given: Collection[Outcome], p: float):
+        """
+        Set the probability of one row of the table of an endogenous variable, in place.
+        @param outcome: The outcome of the variable in the row
+        @param given: The outcomes of the parents of the variable in the row
+        @param p: The new probability of the row
+        """
+        self._writable()
+
+        table = self.table(outcome.name)
+        table.set_probability(outcome, list(given), p)
+        self._store(self._v[outcome.name], table)
+
+    def add_variable(self, variable: Variable, table: ConditionalProbabilityTable):
+        """
+        Add an endogenous variable, along with an edge from each of its parents.
+        @param variable: The new Variable, whose parents must already be in the model
+        @param table: The table of the new variable
+        """
+        self._writable()
+
+        if variable.name in self._g.v:
+            raise ValueError(f"{variable.name} is already in the model")
+
+        for parent in variable.parents:
+            if parent not in self._g.v:
+                raise MissingVariable(parent)
+
+        self._g.add_vertex(variable.name)
+        for parent in variable.parents:
+            self._g.add_edge(parent, variable.name)
+
+        self._v[variable.name] = variable
+        self._store(variable, table)
+
+    def remove_variable(self, name: str):
+        """
+        Remove an endogenous variable, along with every edge into it. The variable must not have any children.
+        @param name: The name of the variable to remove
+        """
+        self._writable()
+
+        variable = self.variable(name)
+        if self._g.outgoing[name]:
+            raise ValueError(f"{name} has children {self._g.outgoing[name]}, whose tables depend on it")
+
+        self._g.remove_vertex(name)
+        del self._v[name]
+        self._discard(variable)
+
+    def add_edge(self, parent: str, child: str, table: Optional[ConditionalProbabilityTable] = None):
+        """
+        Add an edge, which may come from an exogenous variable.
+        @param parent: The name of the parent
+        @param child: The name of the (endogenous) child
+        @param table: The new table of the child, required if the parent is endogenous
+        @raise CyclicGraph if the edge would create a cycle, in which case the model is unchanged
+        """
+        self._reparent(parent, child, table, True)
+
+    def remove_edge(self, parent: str, child: str, table: Optional[ConditionalProbabilityTable] = None):
+        """
+        Remove an edge.
+        @param parent: The name of the parent
+        @param child: The name of the (endogenous) child
+        @param table: The new table of the child, required if the parent is endogenous
+        """
+        self._reparent(parent, child, table, False)
+
+    def _reparent(self, parent: str, child: str, table: Optional[ConditionalProbabilityTable], add: bool):
+        self._writable()
+
+        variable = self.variable(child)
+        if parent not in self._g.v:
+            raise MissingVariable(parent)
+
+        if parent not in self._v:
+            self._g.add_edge(parent, child) if add else self._g.remove_edge(parent, child)
+            return
+
+        parents = variable.parents + [parent] if add else [p for p in variable.parents if p != parent]
+
+        if table is None or set(table.parents) != set(parents):
+            raise ValueError(f"a table of {child} with parents {parents} is required")
+
+        self._g.add_edge(parent, child) if add else self._g.remove_edge(parent, child)
+
+        replaced = Variable(child, variable.outcomes, parents)
+        self._v[child] = replaced
+        self._discard(variable)
+        self._store(replaced, table)
+
+    def _writable(self):
+        if self.read_only:
+            raise ReadOnlyModel("this model is shared, and cannot be modified")
+
+    def _store(self, variable: Variable, table: ConditionalProbabilityTable):
+        self._d[variable.name] = table
+        self._d[variable] = table
+
+    def _discard(self, variable: Variable):
+        self._d.pop(variable.name, None)
+        self._d.pop(variable, None)
+
+
+class LazyModel(Model):
+    """
+    A Model whose graph and variables are built up front, but whose tables are only built from their rows the first
+    time each is looked up. Built tables are kept in a bounded cache, from which the least recently used are evicted,
+    to be rebuilt if they are needed again.
+    @param graph: The graph of the model
+    @param variables: A mapping of the name of each endogenous variable to its Variable
+    @param rows: A mapping of the name of each endogenous variable to the (parents, rows) of its table, as given to
+        build_table
+    @param cache_size: The most tables to keep built at once, or None to keep every table once built
+    """
+
+    def __init__(self, graph: Graph, variables: Mapping[str, Variable], rows: Mapping[str, Tuple[List[str], Union[list, StreamedTable]]], cache_size: Optional[int] = None):
+        super().__init__(graph, variables, dict())
+        self._rows = {k: rows[k] for k in rows}
+        self._cache_size = cache_size
+        self._d = OrderedDict()
+        self._lock = Lock()
+
+        # Tables given or modified since loading, which are never evicted
+        self._pinned = dict()
+
+    def table(self, key: str) -> ConditionalProbabilityTable:
+        if key not in self._v:
+            logger.error(f"unknown variable: {key}")
+            raise MissingVariable(key)
+
+        if key in self._pinned:
+            return self._pinned[key]
+
+        stats = active()
+
+        with self._lock:
+            if key in self._d:
+                self._d.move_to_end(key)
+                if stats is not None:
+                    stats.count("table_cache_hit")
+                return self._d[key]
+
+        if stats is not None:
+            stats.count("table_cache_miss")
+
+        parents, rows = self._rows[key]
+        cpt = build_table(self._v[key], parents, rows, self._v)
+
+        with self._lock:
+            self._d[key] = cpt
+            if self._cache_size is not None and len(self._d) > self._cache_size:
+                self._d.popitem(last=False)
+
+        return cpt
+
+    def _store(self, variable: Variable, table: ConditionalProbabilityTable):
+        with self._lock:
+            self._d.pop(variable.name, None)
+        self._pinned[variable.name] = table
+
+    def _discard(self, variable: Variable):
+        with self._lock:
+            self._d.pop(variable.name, None)
+        self._pinned.pop(variable.name, None)
+        self._rows.pop(variable.name, None)
 
-def from_dict(data: dict) -> Model:
-    return parse_model(data)
+    def __getstate__(self):
+        # Tables are rebuilt on demand, so only the rows need to be sent to another process
+        state = self.__dict__.copy()
+        state["_d"] = OrderedDict()
+        del state["_lock"]
+        return state
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
 
-def from_path(p: Path) -> Model:
+
+def from_dict(data: dict, lazy: bool = False, cache_size: Optional[int] = None, strict: bool = True) -> Model:
+    return parse_model(data, lazy, cache_size, strict)
+
+
+def from_path(p: Path, stream: bool = False, lazy: bool = False, cache_size: Optional[int] = None, strict: bool = True) -> Model:
+    """
+    Load a model from a file.
+    @param p: The path of a JSON, YAML, or compiled (.dcm) model
+    @param stream: If True, a YAML model is parsed as a stream of events, with the rows of each table read into flat
+        arrays and built into DenseProbabilityTables, rather than first being read as nested lists
+    @param lazy: If True, a LazyModel is returned, which only builds each table when it is first looked up
+    @param cache_size: The most tables a LazyModel keeps built at once, or None for no limit
+    @param strict: If False, a model whose graph has a cycle is loaded anyway, so that validate can report the cycle
+        along with any other problems; it cannot be queried
+    @return: The Model loaded
+    @raise CyclicGraph if the graph of the model has a cycle, and strict is True
+    """
     if not p.exists() or not p.is_file():
         raise FileNotFoundError
 
-    if p.suffix == ".json":
-        return parse_model(json_load(p.read_text()))
+    with span("model.load", path=str(p)):
+        if p.suffix == ".json":
+            from json import load as json_load
 
-    elif p.suffix in [".yml", ".yaml"]:
-        return parse_model(yaml_load(p.read_text()))
+            with p.open() as f:
+                return parse_model(json_load(f), lazy, cache_size, strict)
 
-    else:
-        raise Exception(f"Unknown extension for {p}")
+        elif p.suffix in [".yml", ".yaml"]:
+            from yaml import load as yaml_load
 
-def parse_model(data: dict) -> Model:
+            with p.open("rb") as f:
+                return parse_model(stream_yaml(f) if stream else yaml_load(f, Loader=safe_loader()), lazy, cache_size, strict)
+
+        elif p.suffix == ".dcm":
+            from .Compiled import load
+            return load(p)
+
+        else:
+            raise Exception(f"Unknown extension for {p}")
+
+
+def from_bytes(content: bytes, suffix: str, stream: bool = False, lazy: bool = False, cache_size: Optional[int] = None) -> Model:
+    """
+    Load a model from the contents of a file, already read into memory.
+    @param content: The contents of a JSON, YAML, or compiled (.dcm) model
+    @param suffix: The suffix of the file the contents were read from, which determines its format
+    @param stream: If True, a YAML model is parsed as a stream of events, as in from_path
+    @param lazy: If True, a LazyModel is returned, which only builds each table when it is first looked up
+    @param cache_size: The most tables a LazyModel keeps built at once, or None for no limit
+    @return: The Model loaded
+    """
+    with span("model.load", suffix=suffix, size=len(content)):
+        if suffix == ".json":
+            from json import loads as json_loads
+            return parse_model(json_loads(content), lazy, cache_size)
+
+        elif suffix in [".yml", ".yaml"]:
+            from yaml import load as yaml_load
+            return parse_model(stream_yaml(content) if stream else yaml_load(content, Loader=safe_loader()), lazy, cache_size)
+
+        elif suffix == ".dcm":
+            from .Compiled import from_buffer
+            return from_buffer(content)
+
+        else:
+            raise Exception(f"Unknown extension {suffix}")
+
+
+def build_table(variable: Variable, parents: List[str], rows: Union[list, StreamedTable], variables: Mapping[str, Variable]) -> ConditionalProbabilityTable:
+    """
+    Build the table of a variable from its rows.
+    @param variable: The Variable the table is for
+    @param parents: The names of the parents of the table, as given in the model
+    @param rows: The rows of the table, as read from the model
+    @param variables: A mapping of the name of every endogenous variable to its Variable
+    @return: A ConditionalProbabilityTable, or a DenseProbabilityTable if the rows were streamed and fit one
+    """
+    if isinstance(rows, StreamedTable):
+        if all(parent in variables for parent in variable.parents):
+            cpt = rows.dense(variable, variable.parents, [variables[parent].outcomes for parent in variable.parents])
+            if cpt is not None:
+                return cpt
+        return rows.table(variable, parents)
+
+    return ConditionalProbabilityTable(variable, parents, rows)
+
+
+def parse_model(data: dict, lazy: bool = False, cache_size: Optional[int] = None, strict: bool = True) -> Model:
 
     """
     variables: maps string name to the Variable object instantiated
     outcomes: maps string name *and* corresponding Variable to a list of outcome values
     tables: maps strings/Variables to corresponding ConditionalProbabilityTables
+    rows: maps string name to the parents and rows of its table, kept rather than built if the model is lazy
     """
     variables = dict()
     outcomes = dict()
     tables = dict()
+    rows = dict()
 
     for name, detail in data["endogenous"].items():
 
@@ -77,12 +361,21 @@ def parse_model(data: dict) -> Model:
         variables[name] = variable
 
         # Store by both the Variable object as well as its name, for ease of access
-        outcomes[name] = v_outcomes
-        outcomes[variable] = v_outcomes
+        outcomes[name] = variable.outcomes
+        outcomes[variable] = variable.outcomes
+
+    # Tables are built once every variable is known, so that streamed tables can be laid out over their parents' outcomes
+    for name, detail in data["endogenous"].items():
+
+        variable = variables[name]
+        v_parents = detail["parents"] if "parents" in detail else []
+
+        if lazy:
+            rows[name] = (v_parents, detail["table"])
+            continue
 
         # Load in the table and construct a CPT
-        table = detail["table"]
-        cpt = ConditionalProbabilityTable(variable, v_parents, table)
+        cpt = build_table(variable, v_parents, detail["table"], variables)
 
         # Map the name/variable to the table
         tables[name] = cpt
@@ -101,6 +394,11 @@ def parse_model(data: dict) -> Model:
                 v.add(c)
                 e.add((variable, c))
 
-    graph = Graph(v, e)
+    # A cycle fails the load, unless it is to be left for validate to report along with any other problems
+    with span("graph.build", vertices=len(v), edges=len(e)):
+        graph = Graph(v, e, strict=strict)
+
+    if lazy:
+        return LazyModel(graph, variables, rows, cache_size)
 
     return Model(graph, variables, tables)
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from hashlib import sha256
+from json import dumps as json_dumps
+from pathlib import Path
+from sys import getsizeof
+from threading import RLock
+from typing import Dict, Optional, Tuple, Union
+
+from .ConditionalProbabilityTable import DenseProbabilityTable, dense
+from .Model import LazyModel, Model, from_dict, from_path
+
+
+class ModelRegistry:
+    """
+    A cache of loaded models, keyed by a hash of the content they were loaded from, so that loading the same file
+    (or an equal dictionary) again returns the same Model rather than a new one. The least recently used models are
+    evicted once the models held exceed a memory bound.
+    Models returned are shared by every caller, and so are read-only; queries (including treat, which intervenes
+    on a view of the model's graph) never modify a model, so a shared model may be queried from any number of threads.
+    Models are loaded outside the registry's lock, so a slow load does not hold up looking up other models; two
+    threads loading the same content at once may both load it, the first to finish being kept.
+    @param max_bytes: The most memory, estimated by footprint, that the models held may take up, or None for no bound.
+        The most recently used model is always kept, even if it alone exceeds the bound.
+    @param prewarm: If True, each model is prepared when first loaded, as by prewarm
+    """
+
+    def __init__(self, max_bytes: Optional[int] = 512 * 2 ** 20, prewarm: bool = False):
+        self.max_bytes = max_bytes
+        self.prewarm = prewarm
+
+        self._models: Dict[str, Tuple[Model, int]] = OrderedDict()
+        self._files: Dict[Path, Tuple[int, int, str]] = dict()
+        self._bytes = 0
+        self._lock = RLock()
+
+    def get(self, target: Union[str, Path, dict], lazy: bool = False, cache_size: Optional[int] = None) -> Model:
+        """
+        Get the model of a file or dictionary, loading it only if no model with the same content is held.
+        @param target: A dictionary describing the model, or the path of a JSON, YAML or compiled model
+        @param lazy: If True, the model is loaded as a LazyModel; lazy and eager models are held separately
+        @param cache_size: The most tables a LazyModel keeps built at once, or None for no limit
+        @return: The shared Model
+        """
+        if isinstance(target, dict):
+            return self._get(self._key(target, lazy, cache_size), lambda: from_dict(target, lazy, cache_size))
+
+        path = Path(target).resolve()
+        return self._get(self._key(path, lazy, cache_size), lambda: from_path(path, lazy=lazy, cache_size=cache_size))
+
+    def _key(self, target: Union[str, Path, dict], lazy: bool, cache_size: Optional[int]) -> str:
+        options = f"lazy={cache_size}:" if lazy else ""
+
+        if isinstance(target, dict):
+            return options + self._dict_key(target)
+
+        return options + self._file_key(Path(target).resolve())
+
+    @staticmethod
+    def _dict_key(data: dict) -> str:
+        return "dict:" + sha256(json_dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _file_key(self, path: Path) -> str:
+        """
+        The key of a file, which is only hashed again if its size or modification time has changed.
+        """
+        stat = path.stat()
+
+        with self._lock:
+            if path in self._files:
+                mtime, size, key = self._files[path]
+                if mtime == stat.st_mtime_ns and size == stat.st_size:
+                    return key
+
+        key = path.suffix + ":" + sha256(path.read_bytes()).hexdigest()
+
+        with self._lock:
+            self._files[path] = (stat.st_mtime_ns, stat.st_size, key)
+
+        return key
+
+    def _get(self, key: str, load) -> Model:
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+        # Loading (and measuring) a model may be slow, so is done without holding the lock
+        model = load()
+        if self.prewarm:
+            prewarm(model)
+        model.read_only = True
+        size = footprint(model)
+
+        with self._lock:
+
+            # Another thread loaded the same content first; every caller gets the same model
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+            self._models[key] = (model, size)
+            self._bytes += size
+
+            while self.max_bytes is not None and self._bytes > self.max_bytes and len(self._models) > 1:
+                _, (_, evicted) = self._models.popitem(last=False)
+                self._bytes -= evicted
+
+            return model
+
+    def clear(self):
+        """
+        Remove every model held.
+        """
+        with self._lock:
+            self._models.clear()
+            self._files.clear()
+            self._bytes = 0
+
+    def __contains__(self, target: Union[str, Path, dict]) -> bool:
+        return self.contains(target)
+
+    def contains(self, target: Union[str, Path, dict], lazy: bool = False, cache_size: Optional[int] = None) -> bool:
+        """
+        Whether the model of a file or dictionary, loaded with the given options (as by get), is held.
+        """
+        key = self._key(target, lazy, cache_size)
+        with self._lock:
+            return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    @property
+    def size(self) -> int:
+        """
+        The memory, estimated by footprint, taken up by the models held.
+        """
+        return self._bytes
+
+
+def prewarm(model: Model):
+    """
+    Compute ahead of time what queries on a model would otherwise compute on first use: the ancestors and descendants
+    of every vertex of its graph, and the flat arrays of its tables, each of which replaces the table it was built
+    from. The tables of a LazyModel are left to be built on demand.
+    @param model: The model to prepare
+    """
+    graph = model.graph()
+    for v in graph.v:
+        graph.ancestors(v)
+        graph.descendants(v)
+
+    if isinstance(model, LazyModel):
+        return
+
+    for name, variable in model._v.items():
+        table = model._d[name]
+        if isinstance(table, DenseProbabilityTable) or not all(parent in model._v for parent in table.parents):
+            continue
+
+        domains = [model._v[parent].outcomes for parent in table.parents]
+        compiled = DenseProbabilityTable(variable, table.parents, domains, dense(table, domains))
+        model._d[name] = compiled
+        model._d[variable] = compiled
+
+
+def footprint(model: Model) -> int:
+    """
+    Estimate the memory taken up by a model, in bytes: the size of every object reachable from it, counting each
+    object once. Arrays which are views of a buffer (such as a memory-mapped file) count only their header.
+    @param model: The model to measure
+    @return: The estimated size of the model
+    """
+    from numpy import ndarray
+
+    seen = set()
+    stack = [model]
+    total = 0
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+
+        total += getsizeof(current)
+
+        # An array's size includes its data only if it owns it, rather than being a view of a buffer
+        if isinstance(current, ndarray):
+            continue
+        elif isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.append(current.__dict__)
+        elif hasattr(current, "__slots__"):
+            stack.extend(getattr(current, slot) for slot in current.__slots__ if hasattr(current, slot))
+
+    return total
+
+
+# A registry shared by the whole process
+registry = ModelRegistry()
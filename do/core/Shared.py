@@ -0,0 +1,120 @@
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterator
+
+from .Compiled import compiled_size, from_buffer, write
+from .Model import Model
+
+# The shared models this process has created or attached to, by the name of their segment, so that a model sent to
+# this process any number of times is only attached once
+_attached: Dict[str, "SharedModel"] = dict()
+
+
+class _Segment(SharedMemory):
+
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            # Tables still view the segment, which is unmapped once they are released too
+            pass
+
+
+class SharedModel(Model):
+    """
+    A Model compiled into a segment of shared memory, whose tables are views of that segment rather than copies.
+    A SharedModel is pickled as only the name of its segment; unpickling it in another process attaches to the same
+    segment, so sending one to a worker costs the same regardless of the size of the model, and each worker process
+    attaches once no matter how many tasks it is sent.
+    Create one with share, and call unlink on it once no process needs it any longer.
+    @param segment: The segment of shared memory containing the compiled model
+    @param owner: Whether this process created the segment, and so is responsible for unlinking it
+    """
+
+    def __init__(self, segment: SharedMemory, owner: bool):
+        compiled = from_buffer(segment.buf)
+        super().__init__(compiled.graph(), compiled._v, compiled._d)
+        self.segment = segment
+        self.owner = owner
+        self.read_only = True
+
+    @property
+    def name(self) -> str:
+        return self.segment.name
+
+    def __reduce__(self):
+        return attach, (self.segment.name,)
+
+    def unlink(self):
+        """
+        Release the segment. Its memory is freed once every process attached to it has released it, or exited.
+        Only the process which created the segment may unlink it.
+        """
+        _attached.pop(self.segment.name, None)
+        self._d = dict()
+
+        try:
+            self.segment.close()
+        except BufferError:
+            # A table is still in use elsewhere in this process; the mapping is released along with it
+            pass
+
+        if self.owner:
+            self.segment.unlink()
+
+
+def share(model: Model) -> SharedModel:
+    """
+    Compile a model into a new segment of shared memory.
+    @param model: The model to share
+    @return: A SharedModel which can be sent to other processes without copying its tables
+    """
+    segment = _Segment(create=True, size=compiled_size(model))
+    write(model, segment.buf)
+
+    shared = SharedModel(segment, True)
+    _attached[segment.name] = shared
+    return shared
+
+
+def attach(name: str) -> SharedModel:
+    """
+    Attach to a model shared by another process, or return the model already attached to in this process.
+    @param name: The name of the segment containing the model
+    @return: The SharedModel
+    """
+    if name not in _attached:
+        _attached[name] = SharedModel(_open(name), False)
+
+    return _attached[name]
+
+
+@contextmanager
+def attached(name: str) -> Iterator[SharedModel]:
+    """
+    Attach to a model shared by another process for the duration of a with block only, such as for one task of a
+    worker, so that a worker outliving the model does not keep its segment mapped. A model already attached to, as
+    by attach, is used as it is.
+    @param name: The name of the segment containing the model
+    @return: The SharedModel
+    """
+    if name in _attached:
+        yield _attached[name]
+        return
+
+    model = SharedModel(_open(name), False)
+    try:
+        yield model
+    finally:
+        model.unlink()
+
+
+def _open(name: str) -> SharedMemory:
+    try:
+        return _Segment(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, every process attaching registers the segment to be unlinked when it exits
+        segment = _Segment(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
@@ -0,0 +1,197 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from tracemalloc import get_traced_memory, is_tracing, reset_peak, start as start_tracing, stop as stop_tracing
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# The collector of the current context, if one is attached; the code instrumented looks it up once per call, and
+#   records nothing when there is none
+_active: ContextVar[Optional["Stats"]] = ContextVar("stats", default=None)
+
+
+class Stats:
+    """
+    Counts of the work done by inference, treat and identification, collected while attached with collect.
+
+    counts maps the name of each event to the number of times it occurred, such as a rule being applied
+    ("bayes_rule", "jeffrey_rule", "id_line_4", ...), a table being looked up ("table_lookup"), or a cache being hit
+    or missed ("closure_cache_hit", "table_cache_miss", "memo_hit", ...). depth is the deepest recursion reached, and
+    timings maps the name of each phase ("inference", "treat", "identification", ...) to the total seconds spent in
+    it; phases nest, so the time of a treat includes that of the inference queries it makes.
+
+    largest maps the name of each intermediate collection built by enumeration to the size of the largest one built,
+    such as the backdoor paths between a pair of vertices ("backdoor_paths"), or the outcomes of the variables summed
+    over at once ("adjustment_product", "summed_assignments").
+
+    If memory is True, allocations are traced (with tracemalloc) while the collector is attached: peak_bytes is the
+    most memory allocated at once since it was attached, and memory maps each phase to the most it allocated at once
+    ("peak_bytes") and the total it allocated and did not free ("allocated_bytes"), over every time it ran. Tracing
+    allocations slows everything down considerably.
+
+    Work done on an executor, in another thread or process, is not counted, except where noted (such as identification
+    on a thread pool, which is counted in the worker and merged).
+    @param memory: Whether to account for memory
+    """
+
+    def __init__(self, memory: bool = False):
+        self.counts: Counter = Counter()
+        self.depth = 0
+        self.timings: Dict[str, float] = dict()
+        self.largest: Dict[str, int] = dict()
+
+        self.memory_enabled = memory
+        self.peak_bytes = 0
+        self.memory: Dict[str, Dict[str, int]] = dict()
+
+        # For each phase running, the memory allocated when it began, and the most allocated at once since
+        self._running: List[List[int]] = []
+
+    def count(self, event: str, n: int = 1):
+        self.counts[event] += n
+
+    def reach(self, depth: int):
+        if depth > self.depth:
+            self.depth = depth
+
+    def size(self, collection: str, n: int):
+        """
+        Record the size of an intermediate collection.
+        """
+        if n > self.largest.get(collection, 0):
+            self.largest[collection] = n
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time a block of code, adding the time taken to that of the given phase, and (if memory is accounted for) the
+        memory it allocated.
+        """
+        tracing = self.memory_enabled and is_tracing()
+        if tracing:
+            self._enter()
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + perf_counter() - start
+
+            if tracing:
+                base, peak, current = self._exit()
+                usage = self.memory.setdefault(name, {"peak_bytes": 0, "allocated_bytes": 0})
+                usage["peak_bytes"] = max(usage["peak_bytes"], peak - base)
+                usage["allocated_bytes"] += current - base
+
+    def _enter(self):
+        # The peak traced by tracemalloc is reset on entering each phase, so the peak of the phase running is
+        #   carried up to the phase around it on leaving
+        current, peak = get_traced_memory()
+        if self._running:
+            self._running[-1][1] = max(self._running[-1][1], peak)
+        reset_peak()
+        self._running.append([current, current])
+
+    def _exit(self) -> Tuple[int, int, int]:
+        current, peak = get_traced_memory()
+        base, running = self._running.pop()
+        running = max(running, peak)
+        if self._running:
+            self._running[-1][1] = max(self._running[-1][1], running)
+        return base, running, current
+
+    def merge(self, other: "Stats"):
+        """
+        Add the counts, depth, timings and sizes collected by another collector, such as one attached in a worker
+        thread, to this one.
+        """
+        self.counts.update(other.counts)
+        self.reach(other.depth)
+        for name, t in other.timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + t
+        for collection, n in other.largest.items():
+            self.size(collection, n)
+
+    def as_dict(self) -> dict:
+        summary = {"counts": dict(self.counts), "depth": self.depth, "timings": dict(self.timings), "largest": dict(self.largest)}
+        if self.memory_enabled:
+            summary.update(peak_bytes=self.peak_bytes, memory={name: dict(usage) for name, usage in self.memory.items()})
+        return summary
+
+    def __str__(self) -> str:
+        lines = [f"{event}: {n}" for event, n in sorted(self.counts.items())]
+        lines.append(f"depth: {self.depth}")
+        lines.extend(f"{name}: {t * 1000:.3f} ms" for name, t in sorted(self.timings.items()))
+        lines.extend(f"largest {collection}: {n}" for collection, n in sorted(self.largest.items()))
+        if self.memory_enabled:
+            lines.append(f"peak: {self.peak_bytes / 1024:.1f} KiB")
+            lines.extend(f"{name}: {usage['peak_bytes'] / 1024:.1f} KiB peak, {usage['allocated_bytes'] / 1024:.1f} KiB retained" for name, usage in sorted(self.memory.items()))
+        return "\n".join(lines)
+
+
+def active() -> Optional[Stats]:
+    """
+    @return: The Stats collecting in the current context, or None if none is attached
+    """
+    return _active.get()
+
+
+@contextmanager
+def collect(stats: Optional[Stats] = None, memory: bool = False) -> Iterator[Stats]:
+    """
+    Attach a collector for the duration of a with block, such as:
+
+        with collect() as stats:
+            api.probability(query, model)
+        print(stats.counts["bayes_rule"])
+
+    Collectors attached in a nested block replace the outer one until the block ends.
+    @param stats: The Stats to add to, or None to start a new one
+    @param memory: If a new Stats is started, whether it accounts for memory; tracemalloc is started for the block
+        if it is not already tracing
+    @return: The Stats collecting
+    """
+    stats = stats if stats is not None else Stats(memory)
+    token = _active.set(stats)
+
+    started = stats.memory_enabled and not is_tracing()
+    if started:
+        start_tracing()
+    if stats.memory_enabled:
+        stats._enter()
+
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+        if stats.memory_enabled:
+            base, peak, _ = stats._exit()
+            stats.peak_bytes = max(stats.peak_bytes, peak - base)
+        if started:
+            stop_tracing()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[Optional[Stats]]:
+    """
+    Time a block of code as a phase of the collector in the current context, if one is attached.
+    @return: The Stats collecting, or None
+    """
+    stats = _active.get()
+    if stats is None:
+        yield None
+    else:
+        with stats.phase(name):
+            yield stats
+
+
+def measure(function: Callable[..., T], *args, **kwargs) -> Tuple[T, Stats]:
+    """
+    Call a function with a new collector attached.
+    @return: A pair (result, stats) of the value the function returns, and the Stats collected while it ran
+    """
+    with collect() as stats:
+        return function(*args, **kwargs), stats
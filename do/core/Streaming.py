@@ -0,0 +1,184 @@
+from array import array
+from typing import IO, Dict, Iterator, List, Optional, Union
+
+from .ConditionalProbabilityTable import ConditionalProbabilityTable, DenseProbabilityTable
+from .Variables import Variable
+
+
+def safe_loader():
+    """
+    The fastest safe YAML loader available: the LibYAML-based CSafeLoader if PyYAML was built with it, or the pure
+    Python SafeLoader otherwise.
+    """
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+
+    return SafeLoader
+
+
+class StreamedTable:
+    """
+    The rows of a table as read by stream_yaml, held in flat typed arrays rather than nested lists. Each column of
+    outcomes is stored as integer codes, in order of first appearance in that column.
+    Iterating over a StreamedTable yields its rows as lists of [<OUTCOME>, <GIVEN_1_OUTCOME>, ..., <P>], the same
+    as those read by a regular YAML loader.
+    """
+
+    def __init__(self):
+        self.width = None
+        self.codes = array("q")
+        self.symbols: List[Dict[str, int]] = []
+        self.probabilities = array("d")
+
+    def append(self, labels: List[str], p: float):
+        if self.width is None:
+            self.width = len(labels)
+            self.symbols = [dict() for _ in labels]
+
+        if len(labels) != self.width:
+            raise ValueError(f"table row has {len(labels) + 1} columns, expected {self.width + 1}")
+
+        for symbols, label in zip(self.symbols, labels):
+            self.codes.append(symbols.setdefault(label, len(symbols)))
+
+        self.probabilities.append(p)
+
+    def __len__(self) -> int:
+        return len(self.probabilities)
+
+    def __iter__(self) -> Iterator[List]:
+        labels = [list(symbols) for symbols in self.symbols]
+        for i, p in enumerate(self.probabilities):
+            row = self.codes[i * self.width:(i + 1) * self.width]
+            yield [labels[j][code] for j, code in enumerate(row)] + [p]
+
+    def dense(self, variable: Variable, parents: List[str], domains: List[List[str]]) -> Optional[DenseProbabilityTable]:
+        """
+        Scatter the rows into the flat array of a DenseProbabilityTable, without creating any per-row objects.
+        @param variable: The Variable the table is for
+        @param parents: The names of the parents of the variable
+        @param domains: The outcomes of each parent, in the same order as the parents
+        @return: A DenseProbabilityTable, or None if the rows do not fit the given domains (such as a table over
+            latent parents, or a row with an unknown outcome), in which case a regular table should be built instead
+        """
+        from numpy import array as np_array, float64, frombuffer, full, int64, nan, zeros
+
+        domains = [variable.outcomes] + list(domains)
+
+        if len(self) == 0 or self.width != len(domains):
+            return None
+
+        codes = frombuffer(self.codes, dtype=int64).reshape(-1, self.width)
+
+        size = 1
+        for domain in domains:
+            size *= len(domain)
+
+        index = zeros(len(self), dtype=int64)
+
+        for column, (domain, symbols) in enumerate(zip(domains, self.symbols)):
+            position = {outcome: i for i, outcome in enumerate(domain)}
+            if any(label.strip() not in position for label in symbols):
+                return None
+
+            remap = np_array([position[label.strip()] for label in symbols], dtype=int64)
+            index = index * len(domain) + remap[codes[:, column]]
+
+        probabilities = full(size, nan)
+        probabilities[index] = frombuffer(self.probabilities, dtype=float64)
+
+        return DenseProbabilityTable(variable, parents, domains[1:], probabilities)
+
+    def table(self, variable: Variable, parents: List[str]) -> ConditionalProbabilityTable:
+        """
+        Build a regular ConditionalProbabilityTable from the rows.
+        """
+        return ConditionalProbabilityTable(variable, parents, list(self))
+
+
+def stream_yaml(f: Union[IO, bytes, str]) -> dict:
+    """
+    Parse a YAML model from a stream of parse events, reading the rows of each endogenous variable's table into a
+    StreamedTable rather than constructing a Python list for every row.
+    @param f: A (text or binary) file object containing a single YAML document, or the document itself
+    @return: The document as a dictionary, where the "table" of each endogenous variable is a StreamedTable
+    """
+    from yaml import parse as yaml_parse
+    from yaml.constructor import SafeConstructor
+    from yaml.events import AliasEvent, MappingEndEvent, MappingStartEvent, ScalarEvent, SequenceEndEvent, SequenceStartEvent
+    from yaml.nodes import ScalarNode
+    from yaml.resolver import Resolver
+
+    events = yaml_parse(f, Loader=safe_loader())
+    resolver = Resolver()
+    constructor = SafeConstructor()
+    anchors = dict()
+
+    def scalar(event):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = resolver.resolve(ScalarNode, event.value, event.implicit)
+
+        # Construct without the constructor's cache of nodes, which would otherwise hold onto every value
+        return constructor.yaml_constructors.get(tag, constructor.yaml_constructors[None])(constructor, ScalarNode(tag, event.value))
+
+    def table():
+        streamed = StreamedTable()
+
+        for event in events:
+            if isinstance(event, SequenceEndEvent):
+                return streamed
+
+            if not isinstance(event, SequenceStartEvent):
+                raise ValueError(f"expected a table row, found {event}")
+
+            row = []
+            for item in events:
+                if isinstance(item, SequenceEndEvent):
+                    break
+                if not isinstance(item, ScalarEvent):
+                    raise ValueError(f"expected a value in a table row, found {item}")
+                row.append(item)
+
+            streamed.append([str(scalar(item)) for item in row[:-1]], float(scalar(row[-1])))
+
+    def node(event, path: tuple):
+        if isinstance(event, AliasEvent):
+            return anchors[event.anchor]
+
+        if isinstance(event, ScalarEvent):
+            value = scalar(event)
+
+        elif isinstance(event, SequenceStartEvent):
+            if len(path) == 3 and path[0] == "endogenous" and path[2] == "table":
+                value = table()
+            else:
+                value = []
+                for item in events:
+                    if isinstance(item, SequenceEndEvent):
+                        break
+                    value.append(node(item, path + (len(value),)))
+
+        elif isinstance(event, MappingStartEvent):
+            value = dict()
+            for item in events:
+                if isinstance(item, MappingEndEvent):
+                    break
+                key = node(item, path)
+                value[key] = node(next(events), path + (key,))
+
+        else:
+            raise ValueError(f"unexpected {event}")
+
+        if event.anchor is not None:
+            anchors[event.anchor] = value
+
+        return value
+
+    next(events)    # StreamStart
+    next(events)    # DocumentStart
+    document = node(next(events), ())
+
+    return document
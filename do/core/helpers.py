@@ -1,5 +1,22 @@
 from itertools import chain, combinations
-from typing import Iterator
+from typing import Any, Generator, Iterator
+
+
+class _Logger:
+    """
+    Stands in for the loguru logger, which is only imported the first time something is logged.
+    """
+
+    def __getattr__(self, name: str):
+        from loguru import logger as loguru_logger
+
+        # Only looked up once; later uses find the attribute directly
+        attribute = getattr(loguru_logger, name)
+        setattr(self, name, attribute)
+        return attribute
+
+
+logger = _Logger()
 
 
 def power_set(variable_list: list or set, allow_empty_set=True) -> Iterator[any]:
@@ -46,3 +63,28 @@ def within_precision(a: float, b: float) -> bool:
     @return: True if the values are within the margin of error acceptable, False otherwise
     """
     return abs(a - b) < 1 / (10 ** 5)
+
+
+def trampoline(root: Generator) -> Any:
+    """
+    Run a recursive computation written as generators on an explicit stack, rather than the call stack, so that its
+    depth is not limited by the recursion limit. Instead of calling itself, each step yields a generator for the
+    sub-computation it needs, and is sent that sub-computation's result once it completes; a step's return value
+    is its result.
+    @param root: The generator of the outermost step
+    @return: The result of the outermost step
+    """
+    stack = [root]
+    value = None
+
+    while True:
+        try:
+            request = stack[-1].send(value)
+        except StopIteration as done:
+            stack.pop()
+            if not stack:
+                return done.value
+            value = done.value
+        else:
+            stack.append(request)
+            value = None
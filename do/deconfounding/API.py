@@ -1,8 +1,9 @@
-from typing import Collection, Optional
+from typing import Collection, Optional, Tuple, Union
 
 from ..core.Expression import Expression
 from ..core.Graph import Graph
 from ..core.Model import Model
+from ..core.Stats import Stats, measure
 from ..core.Types import Vertex, Path
 from ..core.Variables import Intervention
 
@@ -12,7 +13,10 @@ from .Do import treat
 
 class API:
 
-    def treat(self, expression: Expression, interventions: Collection[Intervention], model: Model) -> float:
+    def treat(self, expression: Expression, interventions: Collection[Intervention], model: Model, stats: bool = False) -> Union[float, Tuple[float, Stats]]:
+        if stats:
+            return measure(treat, expression, interventions, model)
+
         return treat(expression, interventions, model)
 
     def backdoors(self, x: Collection[Vertex], y: Collection[Vertex], graph: Graph, z: Optional[Collection[Vertex]] = None) -> Collection[Path]:
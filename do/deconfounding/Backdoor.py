@@ -1,7 +1,10 @@
 from itertools import product
-from typing import Collection, List, Optional
+from typing import Collection, Iterator, List, Optional, Tuple
 
+from ..core.Budget import active as active_budget
 from ..core.Graph import Graph
+from ..core.Hooks import span
+from ..core.Stats import active as active_stats
 from ..core.Types import Path, Vertex
 from ..core.Exceptions import IntersectingSets
 
@@ -32,12 +35,57 @@ def backdoors(src: Collection[Vertex], dst: Collection[Vertex], graph: Graph, dc
     paths = []
 
     # Use the product of src, dst to try each possible pairing
-    for s, t in product(src_str, dst_str):
-        paths += _backdoor_paths_pair(s, t, graph, dcf_str)
+    with span("backdoors", src=sorted(src_str), dst=sorted(dst_str)):
+        for s, t in product(src_str, dst_str):
+            paths += _backdoor_paths_pair(s, t, graph, dcf_str)
 
     return paths
 
 
+def any_backdoor_path(src: Collection[Vertex], dst: Collection[Vertex], graph: Graph, dcf: Optional[Collection[Vertex]] = None) -> bool:
+    """
+    Determine whether there is any backdoor path, not blocked by a given (possibly empty) deconfounding set, between
+    some source set of vertices and some destination set, without enumerating the paths. Unlike backdoors, which
+    may find exponentially many paths, this takes time linear in the size of the graph.
+    @param src: The source set of (string) vertices to search for paths from
+    @param dst: The destination set of (string) vertices to search from src towards.
+    @param dcf: An optional set of (string) vertices that may serve as a sufficient deconfounding set to block or open
+        backdoor paths.
+    @return: True if backdoors would return any path, False otherwise
+    """
+
+    src_str = str_map(src)
+    dst_str = str_map(dst)
+    dcf_str = str_map(dcf) if dcf else set()
+
+    if not disjoint(src_str, dst_str, dcf_str):
+        raise IntersectingSets
+
+    for s in src_str:
+
+        # A backdoor path leaves s for one of its parents, and reaches a destination vertex other than that parent;
+        #   from there, the moves allowed are those of the search for every path, except that each vertex is entered
+        #   at most once in each direction. Parents which are themselves destinations are searched from separately.
+        parents = graph.parents(s)
+        searches = [([p for p in parents if p not in dst_str], dst_str)]
+        searches.extend(([p], dst_str - {p}) for p in parents if p in dst_str)
+
+        for start, targets in searches:
+            seen = {(p, "up") for p in start}
+            stack = list(seen)
+
+            while stack:
+                cur, previous = stack.pop()
+                for step in _moves(cur, previous, graph, dcf_str):
+                    if step[0] in targets:
+                        return True
+                    if step[0] != s and step not in seen:
+                        seen.add(step)
+                        stack.append(step)
+
+    return False
+
+
 def deconfound(src: Collection[Vertex], dst: Collection[Vertex], graph: Graph) -> Collection[Collection[Vertex]]:
 
     src_str = str_map(src)
@@ -47,25 +95,23 @@ def deconfound(src: Collection[Vertex], dst: Collection[Vertex], graph: Graph) -
     disallowed_vertices = src_str | dst_str | set().union(*[graph.descendants(s) for s in src_str])
 
     valid_deconfounding_sets = list()
+    budget = active_budget()
 
     # Candidates deconfounding sets remaining are the power set of all the possible remaining vertices
-    for tentative_dcf in power_set(graph.v - disallowed_vertices):
-
-        # Tentative, indicating that no specific cross product in this subset has yet yielded any backdoor paths
-        any_backdoor_paths = False
+    with span("deconfound", src=sorted(src_str), dst=sorted(dst_str), candidates=len(graph.v - disallowed_vertices)):
+        for tentative_dcf in power_set(graph.v - disallowed_vertices):
 
-        # Cross represents one (x in X, y in Y) tuple
-        for s, t in product(src_str, dst_str):
+            if budget is not None:
+                budget.check()
 
-            # Get any/all backdoor paths for this particular pair of vertices in src,dst with given potential
-            #   deconfounding set
-            if len(_backdoor_paths_pair(s, t, graph, set(tentative_dcf))) > 0:
-                any_backdoor_paths = True
-                break
+            # Valid if it blocks every backdoor path between any pair of vertices of src and dst; only whether any
+            #   path remains open is found, as the paths themselves may be exponentially many
+            if not any_backdoor_path(src_str, dst_str, graph, set(tentative_dcf)):
+                valid_deconfounding_sets.append(tentative_dcf)
 
-        # None found in any cross product -> Valid subset
-        if not any_backdoor_paths:
-            valid_deconfounding_sets.append(tentative_dcf)
+    stats = active_stats()
+    if stats is not None:
+        stats.size("deconfounding_sets", len(valid_deconfounding_sets))
 
     return list(minimal_sets(*valid_deconfounding_sets))
 
@@ -81,11 +127,30 @@ def all_paths_cumulative(s: str, t: str, path: list, path_list: list, graph: Gra
     @param path_list: A list which will contain lists of paths from s to t.
     @return: A list of lists of Variables, where each sublist denotes a path from s to t .
     """
-    if s == t:
-        return path_list + [path + [t]]
-    if s not in path:
-        for child in graph.children(s):
-            path_list = all_paths_cumulative(child, t, path + [s], path_list, graph)
+    path_list = list(path_list)
+    path = list(path)
+    on_path = set(path)
+
+    # A depth-first search with an explicit stack, extending and backtracking one path in place, so that neither
+    #   the length of a path nor the number of paths is limited by recursion, and only complete paths are copied
+    stack = [iter([s])]
+
+    while stack:
+        cur = next(stack[-1], None)
+
+        if cur is None:
+            stack.pop()
+            if stack:
+                on_path.discard(path.pop())
+
+        elif cur == t:
+            path_list.append(path + [t])
+
+        elif cur not in on_path:
+            path.append(cur)
+            on_path.add(cur)
+            stack.append(iter(graph.children(cur)))
+
     return path_list
 
 
@@ -129,56 +194,86 @@ def _backdoor_paths_pair(s: Collection[str], t: Collection[str], graph: Graph, d
         Endpoints s and t are the first and last elements of any sublist.
     """
 
-    def get_backdoor_paths(cur: str, path: list, path_list: list, previous="up") -> list:
-        """
-        Return a list of lists of all paths from a source to a target, with conditional movement of either
-            child to parent or parent to child. This may include an edge case that is not a backdoor path, which
-            is filtered in the parent function, otherwise all paths will be backdoor paths.
-        This is a heavily modified version of the graph-traversal algorithm provided by Dr. Eric Neufeld.
-        @param cur: The current (string) vertex we are at in a traversal.
-        @param path: The current path from s, our source.
-        @param path_list: A list of lists, each sublist being a path discovered so far.
-        @param previous: Whether moving from the previous variable to current we moved "up" (child to parent) or
-            "down" (from parent to child); this movement restriction is involved in backdoor path detection
-        @return: A list of lists, where each sublist is a path from s to t.
-        """
+    # Get all possible backdoor paths, by a depth-first search with an explicit stack, extending and backtracking
+    #   one path in place; only complete paths are copied
+    backdoor_paths = []
+    path = []
+    on_path = set()
+    stack = [iter([(s, "up")])]
+
+    # The number of paths may grow exponentially with the size of the graph, so the deadline of any budget is checked
+    #   as the search goes
+    budget = active_budget()
+    steps = 0
+
+    while stack:
+        if budget is not None:
+            steps += 1
+            if steps % 1024 == 0:
+                budget.check()
+
+        step = next(stack[-1], None)
+
+        if step is None:
+            stack.pop()
+            if stack:
+                on_path.remove(path.pop())
+            continue
+
+        cur, previous = step
 
         # Reached target
         if cur == t:
-            return path_list + [path + [t]]
+            backdoor_paths.append(path + [t])
 
         # No infinite loops
-        if cur not in path:
+        elif cur not in on_path:
+            path.append(cur)
+            on_path.add(cur)
+            stack.append(_moves(cur, previous, graph, dcf))
 
-            if previous == "down":
+    stats = active_stats()
+    if stats is not None:
+        stats.size("backdoor_paths", len(backdoor_paths))
+
+    # Filter out the paths that don't "enter" x; see the definition of a backdoor path
+    return list(filter(lambda l: len(l) > 2 and l[0] in graph.children(l[1]) and l[1] != t, backdoor_paths))
 
-                # We can ascend on a controlled collider, OR an ancestor of a controlled collider
-                if cur in dcf or any(map(lambda v: v in dcf, graph.descendants(cur))):
-                    for parent in graph.parents(cur):
-                        path_list = get_backdoor_paths(parent, path + [cur], path_list, "up")
 
-                # We can *continue* to descend on a non-controlled variable
-                if cur not in dcf:
-                    for child in graph.children(cur):
-                        path_list = get_backdoor_paths(child, path + [cur], path_list, "down")
+def _moves(cur: str, previous: str, graph: Graph, dcf: Collection[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Every step onwards from the current vertex, with conditional movement of either child to parent or parent
+        to child. This may include an edge case that is not a backdoor path, which is filtered by the caller,
+        otherwise all paths will be backdoor paths.
+    This is a heavily modified version of the graph-traversal algorithm provided by Dr. Eric Neufeld.
+    @param cur: The current (string) vertex we are at in a traversal.
+    @param previous: Whether moving from the previous variable to current we moved "up" (child to parent) or
+        "down" (from parent to child); this movement restriction is involved in backdoor path detection
+    @param dcf: A set of (string) variables, by which movement through any variable is controlled
+    @return: An iterator of pairs of the next vertex, and whether moving to it is "up" or "down"
+    """
 
-            if previous == "up" and cur not in dcf:
+    if previous == "down":
 
-                # We can ascend on a non-controlled variable
-                for parent in graph.parents(cur):
-                    path_list = get_backdoor_paths(parent, path + [cur], path_list, "up")
+        # We can ascend on a controlled collider, OR an ancestor of a controlled collider
+        if cur in dcf or (dcf and any(map(lambda v: v in dcf, graph.descendants(cur)))):
+            for parent in graph.parents(cur):
+                yield parent, "up"
 
-                # We can descend on a non-controlled reverse-collider
-                for child in graph.children(cur):
-                    path_list = get_backdoor_paths(child, path + [cur], path_list, "down")
+        # We can *continue* to descend on a non-controlled variable
+        if cur not in dcf:
+            for child in graph.children(cur):
+                yield child, "down"
 
-        return path_list
+    if previous == "up" and cur not in dcf:
 
-    # Get all possible backdoor paths
-    backdoor_paths = get_backdoor_paths(s, [], [])
+        # We can ascend on a non-controlled variable
+        for parent in graph.parents(cur):
+            yield parent, "up"
 
-    # Filter out the paths that don't "enter" x; see the definition of a backdoor path
-    return list(filter(lambda l: len(l) > 2 and l[0] in graph.children(l[1]) and l[1] != t, backdoor_paths))
+        # We can descend on a non-controlled reverse-collider
+        for child in graph.children(cur):
+            yield child, "down"
 
 
 def str_map(to_filter: Collection[Vertex]):
@@ -1,23 +1,38 @@
 from itertools import product
-from loguru import logger
-from typing import Collection
+from typing import Collection, Optional
 
+from ..core.Budget import active as active_budget
 from ..core.Expression import Expression
+from ..core.Hooks import enabled, span
 from ..core.Inference import inference
 from ..core.Model import Model
+from ..core.Stats import Stats, active
 from ..core.Variables import Outcome, Intervention
+from ..core.helpers import logger
 
 from .Backdoor import backdoors, deconfound
 from .Exceptions import NoDeconfoundingSet
 
 
 def treat(expression: Expression, interventions: Collection[Intervention], model: Model) -> float:
-    
+
+    stats = active()
+    if stats is None and not enabled():
+        return _treat(expression, interventions, model, None)
+
+    with span("treat", query=str(expression), interventions=[str(x) for x in interventions]):
+        if stats is None:
+            return _treat(expression, interventions, model, None)
+
+        with stats.phase("treat"):
+            return _treat(expression, interventions, model, stats)
+
+
+def _treat(expression: Expression, interventions: Collection[Intervention], model: Model, stats: Optional[Stats]) -> float:
+
     head = set(expression.head())
     body = set(expression.body())
 
-    print(head, body, interventions)
-
     # If there are no Interventions, we can compute a standard query
     if len(interventions) == 0:
         return inference(expression, model)
@@ -25,7 +40,12 @@ def treat(expression: Expression, interventions: Collection[Intervention], model
     # There are interventions; may need to find some valid Z to compute
     else:
 
-        paths = backdoors(interventions, head, model.graph(), body)
+        if stats is None:
+            paths = backdoors(interventions, head, model.graph(), body)
+        else:
+            with stats.phase("backdoors"):
+                paths = backdoors(interventions, head, model.graph(), body)
+            stats.count("backdoor_path", len(paths))
 
         # No backdoor paths; augment graph space and compute
         if len(paths) == 0:
@@ -33,16 +53,16 @@ def treat(expression: Expression, interventions: Collection[Intervention], model
             expression_transform = Expression(expression.head(), set(expression.body()) | set(Outcome(x.name, x.outcome) for x in interventions))
             logger.info(f"translated expression: {expression_transform}")
             logger.info(f"disabling incoming edges on graph: {[x.name for x in interventions]}")
-            model.graph().disable_incoming(*interventions)
-            p = inference(expression_transform, model)
-            logger.info("resetting edge transformations")
-            model.graph().reset_disabled()
-            return p
+            return inference(expression_transform, model.intervened(interventions))
 
         # Backdoor paths found; find deconfounding set to compute
         # Find all possible deconfounding sets, and use possible subsets
         logger.info("computing deconfounding sets")
-        deconfounding_sets = deconfound(interventions, head, model.graph())
+        if stats is None:
+            deconfounding_sets = deconfound(interventions, head, model.graph())
+        else:
+            with stats.phase("deconfound"):
+                deconfounding_sets = deconfound(interventions, head, model.graph())
         logger.info(f"resulting deconfounding sets: {deconfounding_sets}")
 
         # Filter down the deconfounding sets not overlapping with our query body
@@ -50,6 +70,9 @@ def treat(expression: Expression, interventions: Collection[Intervention], model
         if len(vertex_dcf) == 0:
             raise NoDeconfoundingSet
 
+        if stats is not None:
+            stats.count("deconfounding_set", len(vertex_dcf))
+
         # Compute with every possible deconfounding set as a safety measure; ensuring they all match
         probability = None  # Sentinel value
         for z_set in vertex_dcf:
@@ -77,9 +100,22 @@ def _marginalize_query(expression: Expression, interventions: Collection[Interve
 
     head = set(expression.head())
     body = set(expression.body())
-
-    # Augment graph (isolating interventions as roots) and create engine
-    model.graph().disable_incoming(*interventions)
+    stats = active()
+    budget = active_budget()
+
+    # The whole product of outcomes of Z is checked against the budget before any of it is computed
+    if budget is not None or stats is not None:
+        size = 1
+        for var in deconfound:
+            size *= len(model.variable(var).outcomes)
+        if stats is not None:
+            stats.size("adjustment_product", size)
+        if budget is not None:
+            budget.enumerate(size)
+
+    # Augment graph (isolating interventions as roots) and create engine; the model given is left unchanged, so that
+    #   a model shared between threads may be treated on concurrently
+    intervened = model.intervened(interventions)
     as_outcomes = {Outcome(x.name, x.outcome) for x in interventions}
 
     probability = 0.0
@@ -90,17 +126,19 @@ def _marginalize_query(expression: Expression, interventions: Collection[Interve
         # Construct the respective Outcome list of each Z outcome cross product
         z_outcomes = {Outcome(x, cross[i]) for i, x in enumerate(deconfound)}
 
+        if stats is not None:
+            stats.count("adjustment_term")
+
         # First, we do P(Y | do(X), Z)
         ex1 = Expression(head, body | as_outcomes | z_outcomes)
         logger.info(f"computing sub-query: {ex1}")
-        p_y_x_z = inference(ex1, model)
+        p_y_x_z = inference(ex1, intervened)
 
         # Second, P(Z)
         ex2 = Expression(z_outcomes, body | as_outcomes)
         logger.info(f"computing sub-query: {ex2}")
-        p_z = inference(ex2, model)
+        p_z = inference(ex2, intervened)
 
         probability += p_y_x_z * p_z
 
-    model.graph().reset_disabled()
     return probability
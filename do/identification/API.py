@@ -1,17 +1,28 @@
-from itertools import product
-from typing import Mapping, Set, Tuple, Union
+from contextvars import copy_context
+from itertools import islice, product
+from typing import TYPE_CHECKING, Callable, Collection, List, Mapping, Optional, Sequence, Set, Tuple, Union
 
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+from ..core.Budget import active as active_budget
+from ..core.Exceptions import CyclicGraph
+from ..core.Graph import to_label
+from ..core.Hooks import span
 from ..core.Model import Model
+from ..core.Stats import Stats, active, collect, measure
+from ..core.Types import Vertex
 from ..core.Variables import Intervention, Outcome
 
-from .LatentGraph import latent_transform
+from .Exceptions import Fail
+from .LatentGraph import CACHE_SIZE, LatentGraph, latent_transform
 from .Identification import Identification, simplify_expression
 from .PExpression import PExpression, TemplateExpression
 
 
 class API:
 
-    def identification(self, y: Set[Outcome], x: Set[Intervention], model: Model, include_proof: bool = True) -> Union[float, Tuple[float, str]]:
+    def identification(self, y: Set[Outcome], x: Set[Intervention], model: Model, include_proof: bool = True, executor: Optional["Executor"] = None, stats: bool = False) -> Union[float, Tuple[float, str], Tuple[Union[float, Tuple[float, str]], Stats]]:
         """
         The Identification algorithm presented in Shpitser & Pearl, 2007.
 
@@ -21,6 +32,14 @@ class API:
             model (Model): The given model, which may include exogenous variables.
             include_proof (bool, optional): Controls whether a proof should be generated along 
                 with the expression and returned. Defaults to True.
+            executor (Executor, optional): A thread or process pool on which the independent c-components of
+                the effect are identified and evaluated. Results are combined in a fixed order, so the value is
+                the same as when run without one. On a thread pool, both identification and evaluation run under
+                the budget (see do.core.Budget) of the caller; a process pool does not enforce a budget. Defaults
+                to None, running serially.
+            stats (bool, optional): Controls whether the Stats collected while identifying and evaluating the
+                effect are returned along with the result. Work done on a process pool is not counted. Defaults
+                to False.
 
         Raises:
             Fail: Raises a Fail exception if the effect cannot be identified, containing the hedge
@@ -29,39 +48,40 @@ class API:
         Returns:
             Union[float, Tuple[float, str]]: The result is represented as a float in the range [0, 1],
             representing the resulting effect. Returns this float if include_proof is False. Returns
-            a tuple (result, proof) if include_proof is True, where proof is a string. 
+            a tuple (result, proof) if include_proof is True, where proof is a string. If stats is True,
+            returns a tuple of this and the Stats collected.
         """
 
+        if stats:
+            return measure(self.identification, y, x, model, include_proof, executor)
+
+        collector = active()
+
+        if model._g.cyclic:
+            raise CyclicGraph(f"vertices on or below a cycle: {', '.join(model._g.cyclic)}")
+
         endogenous = set(model._v.keys())
         exogenous = model._g.v - endogenous
 
         latent = latent_transform(model._g.copy(), exogenous)
         
         p = PExpression([], [TemplateExpression(x, list(latent.parents(x))) for x in latent.v])
-        expression = Identification({v.name for v in y}, {v.name for v in x}, p, latent, include_proof)
-
-        def _process(current: Union[PExpression, TemplateExpression], known: Mapping[str, str]):
-            
-            if isinstance(current, TemplateExpression):
-                t = model.table(current.head)
-                return t.probability_lookup(Outcome(current.head, known[current.head]), [Outcome(v, known[v]) for v in model.variable(current.head).parents])
+        with span("identification", y=sorted(v.name for v in y), x=sorted(v.name for v in x)):
+            if collector is None:
+                expression = Identification({v.name for v in y}, {v.name for v in x}, p, latent, include_proof, executor)
+            else:
+                with collector.phase("identification"):
+                    expression = Identification({v.name for v in y}, {v.name for v in x}, p, latent, include_proof, executor)
 
-            elif len(current.sigma) == 0:
-                i = 1
-                for term in current.terms:
-                    i *= _process(term, known)
-                return i
+        known = {v.name: v.outcome for v in y} | {v.name: v.outcome for v in x}
 
+        with span("id.evaluate"):
+            if collector is None:
+                result = _evaluate(expression, known, model, executor)
             else:
-                t = 0
-                for values in product(*[model.variable(v).outcomes for v in current.sigma]):
-                    i = 1
-                    for term in current.terms:
-                        i *= _process(term, known | dict(zip(current.sigma, values)))
-                    t += i
-                return t
-
-        result = _process(expression, {v.name: v.outcome for v in y} | {v.name: v.outcome for v in x})
+                with collector.phase("evaluation"):
+                    result = _evaluate(expression, known, model, executor)
+
         return (result, expression.proof()) if include_proof else result
 
     def proof(self, y: Set[Outcome], x: Set[Intervention], model: Model) -> str:
@@ -89,3 +109,241 @@ class API:
         p = PExpression([], [TemplateExpression(x, list(latent.parents(x))) for x in latent.v])
         expression = Identification({v.name for v in y}, {v.name for v in x}, p, latent, True)
         return expression.proof()
+
+    def identifiable_many(self, pairs: Sequence[Tuple[Collection[Vertex], Collection[Vertex]]], model: Model, executor: Optional["Executor"] = None, chunk_size: int = 32, cache_size: Optional[int] = CACHE_SIZE) -> List[Tuple[bool, Optional[Tuple[LatentGraph, Set[str]]]]]:
+        """
+        Determine which of many effects are identifiable in a model, without evaluating them or generating proofs.
+        The latent projection of the model is computed once, and the c-components, subgraphs and ancestor sets
+        found while screening one pair are reused for every other pair.
+
+        Args:
+            pairs (Sequence[Tuple[Collection[Vertex], Collection[Vertex]]]): A sequence of (Y, X) pairs, each being
+                a collection of outcome variables and a collection of treatment variables. Only the names of the
+                variables are used.
+            model (Model): The given model, which may include exogenous variables.
+            executor (Executor, optional): A thread or process pool on which to screen the pairs. Defaults to None,
+                screening serially.
+            chunk_size (int, optional): The number of pairs screened per task when an executor is given. Pairs
+                within one task share their cached graph computations. Defaults to 32.
+            cache_size (int, optional): The most subgraphs and ancestor sets each graph keeps cached while the pairs
+                are screened, or None for no limit. The cache is released once every pair is screened.
+
+        Returns:
+            List[Tuple[bool, Optional[Tuple[LatentGraph, Set[str]]]]]: One result per pair, in the same order as
+            the pairs given. Each is (True, None) if the effect is identifiable, or (False, hedge) otherwise, where
+            hedge is the (graph, c-component) pair with which ID failed.
+        """
+
+        endogenous = set(model._v.keys())
+        exogenous = model._g.v - endogenous
+
+        latent = latent_transform(model._g.copy(), exogenous, cache_size)
+        queries = [({to_label(v) for v in y}, {to_label(v) for v in x}) for y, x in pairs]
+
+        try:
+            if executor is None:
+                return _identifiable(queries, latent)
+
+            chunks = [queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)]
+            futures = [executor.submit(_identifiable, chunk, latent) for chunk in chunks]
+            return [result for future in futures for result in future.result()]
+
+        finally:
+            latent.clear_cache()
+
+
+def _identifiable(queries: Sequence[Tuple[Set[str], Set[str]]], latent: LatentGraph) -> List[Tuple[bool, Optional[Tuple[LatentGraph, Set[str]]]]]:
+    """
+    Run ID, without a proof, on each of a sequence of (Y, X) pairs of variable names.
+    @return: A list of (True, None) for each identifiable effect, or (False, hedge) for each that is not
+    """
+
+    p = PExpression([], [TemplateExpression(x, list(latent.parents(x))) for x in latent.v])
+
+    # Pairs often reduce to the same sub-problems (such as the c-components at line 4), which are identified once
+    memo = dict()
+
+    results = []
+    for y, x in queries:
+        try:
+            Identification(y, x, p, latent, False, memo=memo)
+            results.append((True, None))
+        except Fail as hedge:
+            results.append((False, (hedge.args[0], hedge.args[1])))
+
+    return results
+
+
+def _evaluate(expression: PExpression, known: Mapping[str, str], model: Model, executor: Optional["Executor"]) -> float:
+    """
+    Evaluate an expression identified by ID, serially or on an executor.
+    """
+    if executor is None:
+        return _process(expression, known, model)
+
+    return _process_parallel(expression, known, model, executor)
+
+
+def _process(current: Union[PExpression, TemplateExpression], known: Mapping[str, str], model: Model) -> float:
+    """
+    Evaluate an expression identified by ID.
+    @param current: The PExpression or TemplateExpression to evaluate
+    @param known: A mapping of variable names to the outcome each is fixed to
+    @param model: The model containing the tables of each variable
+    @return: The probability the expression evaluates to
+    """
+
+    stats = active()
+    budget = active_budget()
+
+    if budget is not None:
+        budget.step()
+
+    if isinstance(current, TemplateExpression):
+        if stats is not None:
+            stats.count("table_lookup")
+
+        t = model.table(current.head)
+        return t.probability_lookup(Outcome(current.head, known[current.head]), [Outcome(v, known[v]) for v in model.variable(current.head).parents])
+
+    elif len(current.sigma) == 0:
+        i = 1
+        for term in current.terms:
+            i *= _process(term, known, model)
+        return i
+
+    else:
+        if budget is not None or stats is not None:
+            size = 1
+            for v in current.sigma:
+                size *= len(model.variable(v).outcomes)
+            if stats is not None:
+                stats.size("summed_assignments", size)
+            if budget is not None:
+                budget.enumerate(size)
+
+        t = 0
+        for values in product(*[model.variable(v).outcomes for v in current.sigma]):
+            if stats is not None:
+                stats.count("summed_assignment")
+
+            i = 1
+            for term in current.terms:
+                i *= _process(term, known | dict(zip(current.sigma, values)), model)
+            t += i
+        return t
+
+
+def _process_term(term: Union[PExpression, TemplateExpression], known: Mapping[str, str], sigma: Sequence[str], assignments: Sequence[Sequence[str]], model: Model) -> Tuple[List[float], Optional[Stats]]:
+    """
+    Evaluate one term of a product under every assignment of the variables summed over around it.
+    @return: A list of the value of the term, one for each assignment, in the same order as the assignments; and, if
+        a collector is attached, the Stats of the work done, collected separately so that workers never share one
+    """
+    if active() is None:
+        return [_process(term, known | dict(zip(sigma, values)), model) for values in assignments], None
+
+    with collect() as stats:
+        return [_process(term, known | dict(zip(sigma, values)), model) for values in assignments], stats
+
+
+def _process_term_shared(term: Union[PExpression, TemplateExpression], known: Mapping[str, str], sigma: Sequence[str], assignments: Sequence[Sequence[str]], name: str) -> Tuple[List[float], Optional[Stats]]:
+    """
+    Evaluate one term of a product, as _process_term, in a model shared by the process which sent the task.
+    @param name: The name of the segment of shared memory containing the model
+    """
+    from ..core.Shared import attached
+
+    with attached(name) as model:
+        return _process_term(term, known, sigma, assignments, model)
+
+
+# The most assignments evaluated per task by _process_parallel; few expressions sum over more, so most are sent to
+#   the executor once per term
+CHUNK_SIZE = 2 ** 14
+
+
+def _process_parallel(current: PExpression, known: Mapping[str, str], model: Model, executor: "Executor") -> float:
+    """
+    Evaluate an expression identified by ID, evaluating each term of the outermost product (one per c-component,
+    if ID split the graph at line 4) on the given executor. The values are multiplied and summed in the same order
+    as _process, so the result is identical. The assignments summed over are enumerated in chunks of CHUNK_SIZE, one
+    chunk at a time, rather than all at once.
+
+    On a thread pool, each term is evaluated in a copy of the caller's context, so under the caller's budget, with
+    the Stats it collects merged into the caller's. A process pool receives neither: the terms sent to it run without
+    a budget, and are not counted. The model is sent to a process pool once, in shared memory (see do.core.Shared),
+    rather than with every task.
+    @param current: The PExpression to evaluate
+    @param known: A mapping of variable names to the outcome each is fixed to
+    @param model: The model containing the tables of each variable
+    @param executor: A thread or process pool to evaluate the terms on
+    @return: The probability the expression evaluates to
+    """
+
+    stats = active()
+    budget = active_budget()
+
+    # The whole product of outcomes summed over is checked against the budget before any of it is enumerated
+    if budget is not None or stats is not None:
+        size = 1
+        for v in current.sigma:
+            size *= len(model.variable(v).outcomes)
+        if stats is not None:
+            stats.size("summed_assignments", size)
+        if budget is not None:
+            budget.enumerate(size)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    if isinstance(executor, ThreadPoolExecutor):
+        return _sum_terms(current, known, model, lambda term, chunk: executor.submit(copy_context().run, _process_term, term, known, current.sigma, chunk, model))
+
+    from ..core.Shared import SharedModel, share
+
+    # A model sent to a process is pickled with every task, unless it is shared, in which case only the name of its
+    #   segment is sent; a model which is not is shared for the duration of the evaluation
+    if isinstance(model, SharedModel):
+        return _sum_terms(current, known, model, lambda term, chunk: executor.submit(_process_term, term, known, current.sigma, chunk, model))
+
+    shared = share(model)
+    try:
+        return _sum_terms(current, known, model, lambda term, chunk: executor.submit(_process_term_shared, term, known, current.sigma, chunk, shared.name))
+    finally:
+        shared.unlink()
+
+
+def _sum_terms(current: PExpression, known: Mapping[str, str], model: Model, submit: Callable[[Union[PExpression, TemplateExpression], List[Sequence[str]]], "Future"]) -> float:
+    """
+    Sum the product of the terms of an expression over every assignment of the variables summed over, a chunk of
+    assignments at a time, each term of a chunk being evaluated by a task submitted to an executor.
+    @param submit: Submits a task evaluating a term under each assignment of a chunk
+    """
+    stats = active()
+    budget = active_budget()
+    assignments = product(*[model.variable(v).outcomes for v in current.sigma])
+
+    t = 0
+    for chunk in iter(lambda: list(islice(assignments, CHUNK_SIZE)), []):
+        futures = [submit(term, chunk) for term in current.terms]
+
+        values = []
+        for future in futures:
+            term_values, worker_stats = future.result()
+            values.append(term_values)
+            if stats is not None and worker_stats is not None:
+                stats.merge(worker_stats)
+
+        if stats is not None:
+            stats.count("summed_assignment", len(chunk))
+
+        for j in range(len(chunk)):
+            i = 1
+            for term_values in values:
+                i *= term_values[j]
+            t += i
+
+        if budget is not None:
+            budget.check()
+
+    return t
@@ -1,11 +1,21 @@
-from typing import List, Optional, Set, Tuple, Union
+from contextvars import copy_context
+from typing import TYPE_CHECKING, Dict, Generator, List, Optional, Set, Tuple, Union
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+from ..core.Budget import active as active_budget
+from ..core.Hooks import enabled, event
+from ..core.Stats import Stats, active, collect
+from ..core.helpers import trampoline
 
 from .Exceptions import Fail as FAIL
 from .LatentGraph import LatentGraph as Graph
 from .PExpression import PExpression, TemplateExpression
+from .Proof import ProofStep
 
 
-def Identification(y: Set[str], x: Set[str], p: PExpression, g: Graph, prove: bool = True):
+def Identification(y: Set[str], x: Set[str], p: PExpression, g: Graph, prove: bool = True, executor: Optional["Executor"] = None, memo: Optional[Dict[tuple, PExpression]] = None):
     """
     The Identification algorithm presented in Shpitser & Pearl, 2007.
 
@@ -17,8 +27,14 @@ def Identification(y: Set[str], x: Set[str], p: PExpression, g: Graph, prove: bo
             name "given" some set of prior variables.
         g (Graph): A LatentGraph which has undergone augmentation to remove any exogenous variables, replacing
             them with bidirected arcs connecting their children.
-        prove (bool, optional): Controls whether or not an additional process of proof generation should be
-            undertaken when identifying the resulting expression. Defaults to True.
+        prove (bool, optional): Controls whether or not the steps of a proof should be recorded when identifying
+            the resulting expression. Steps are only rendered to text once the proof is requested. Defaults to True.
+        executor (Executor, optional): A thread or process pool on which the independent sub-problems of each
+            c-component at line 4 are identified. The results are assembled in the order of the components, so
+            the expression is the same as when run without one. Defaults to None, running serially.
+        memo (Dict, optional): A table of the sub-calls already identified, which are reused rather than identified
+            again. A table may be shared by any number of runs on the same graph G and distribution P. Defaults to
+            None, using a new table for this run only.
 
     Returns:
         PExpression: A resulting PExpression containing any number of nested PExpressions or (terminal)
@@ -26,246 +42,246 @@ def Identification(y: Set[str], x: Set[str], p: PExpression, g: Graph, prove: bo
             through the main API.
     """
 
-    def _identification(_y: Set[str], _x: Set[str], _p: PExpression, _g: Graph, _prove: bool = True, i=0, passdown_proof: Optional[List[Tuple[int, List[str]]]] = None) -> PExpression:
-        
-        def s(a_set):
-            if len(a_set) == 0:
-                return "Ø"
-            return "{" + ', '.join(a_set) + "}"
+    return _identification(y, x, p, g, prove, executor=executor, memo=memo)
+
+
+def _identification(_y: Set[str], _x: Set[str], _p: PExpression, _g: Graph, _prove: bool = True, i=0, passdown_proof: Optional[List[Tuple[int, ProofStep]]] = None, executor: Optional["Executor"] = None, memo: Optional[Dict[tuple, PExpression]] = None) -> PExpression:
+    return trampoline(_identify(_y, _x, _p, _g, _prove, i, passdown_proof, executor, memo))
+
+
+def _identify_component(_y: Set[str], _x: Set[str], _p: PExpression, _g: Graph, _prove: bool, i: int, memo: Dict[tuple, PExpression]) -> Tuple[PExpression, Optional[Stats]]:
+    """
+    Identify a sub-problem on an executor.
+    @return: The expression identified; and, if a collector is attached, the Stats of the work done, collected
+        separately so that workers never share one
+    """
+    if active() is None:
+        return _identification(_y, _x, _p, _g, _prove, i, memo=memo), None
+
+    with collect() as stats:
+        return _identification(_y, _x, _p, _g, _prove, i, memo=memo), stats
+
+
+def _identify(_y: Set[str], _x: Set[str], _p: PExpression, _g: Graph, _prove: bool, i: int, passdown_proof: Optional[List[Tuple[int, ProofStep]]], executor: Optional["Executor"], memo: Optional[Dict[tuple, PExpression]]) -> Generator[Generator, PExpression, PExpression]:
+
+    # Run by trampoline, so that the depth of the recursion is not limited by the call stack: each recursive call is
+    #   yielded as a generator, and its result sent back
+
+    # The same call can be reached through different branches, or by other runs on the same graph; every graph
+    #   reached is an induced subgraph of the original, so its vertices identify it
+    if memo is None:
+        memo = dict()
+
+    key = (frozenset(_y), frozenset(_x), frozenset(_g.V), _p_key(_p))
+
+    stats = active()
+    hooks = enabled()
+    if stats is not None:
+        stats.count("id_call")
+        stats.reach(i)
+
+    budget = active_budget()
+    if budget is not None:
+        budget.step()
+
+    # A sub-call already identified is reused, its proof being a copy of the steps of the derivation recorded, so
+    #   that a proof stands on its own even when the derivation was recorded by another run sharing the memo. An entry
+    #   recorded without a proof has no steps to copy, so is identified again when a proof is wanted.
+    derived = memo.get(key)
+    if derived is not None and (not _prove or derived.internal_proof):
+        if stats is not None:
+            stats.count("memo_hit")
+        if hooks:
+            event("id.memo_hit", depth=i)
 
-        # The continuation of a proof that is ongoing if this is a recursive ID call, or a 'fresh' new proof sequence otherwise
         proof_chain = passdown_proof if passdown_proof else []
+        if _prove:
+            proof_chain.extend((i + depth, step) for depth, step in derived.internal_proof)
+
+        return PExpression(derived.sigma, derived.terms, proof_chain)
 
-        # noinspection PyPep8Naming
-        def An(vertices):
-            return _g.ancestors(vertices)
+    start = len(passdown_proof) if passdown_proof else 0
+    result = yield _identification_step(_y, _x, _p, _g, _prove, i, passdown_proof, executor, memo)
+
+    # The steps of this derivation are those it added to the proof, recorded relative to its depth
+    steps = [(depth - i, step) for depth, step in result.internal_proof[start:]] if _prove else []
+    memo[key] = PExpression(result.sigma, result.terms, steps)
+    return result
+
+
+def _identification_step(_y: Set[str], _x: Set[str], _p: PExpression, _g: Graph, _prove: bool, i: int, passdown_proof: Optional[List[Tuple[int, ProofStep]]], executor: Optional["Executor"], memo: Dict[tuple, PExpression]) -> Generator[Generator, PExpression, PExpression]:
+
+    # The continuation of a proof that is ongoing if this is a recursive ID call, or a 'fresh' new proof sequence otherwise
+    proof_chain = passdown_proof if passdown_proof else []
+    stats = active()
+    hooks = enabled()
+
+    # noinspection PyPep8Naming
+    def An(vertices):
+        return _g.ancestors(vertices)
+
+    if _prove:
+        proof_chain.append((i, ProofStep("begin", y=_y, x=_x)))
+
+    # 1
+    if _x == set():
+        if stats is not None:
+            stats.count("id_line_1")
+        if hooks:
+            event("id.line_1", depth=i)
 
         if _prove:
-            proof_chain.append((i, [f"ID Begin: Y = {s(_y)}, X = {s(_x)}"]))
+            proof_chain.append((i, ProofStep("1", g=_g, y=_y)))
 
-        # 1
-        if _x == set():
-            if _prove:
-                proof_chain.append((i, [
-                    "1: if X == Ø, return Σ_{V \\ Y} P(V)",
-                    f"  --> Σ_{s(_g.V - _y)} P({s(_g.V)})",
-                    "",
-                    f"[***** Standard Probability Rules *****]"
-                ]))
-
-            return p_operator(_g.V - _y, _p, proof_chain)
-
-        # 2
-        if _g.V != An(_y):
-            w = _g.V - An(_y)
-            if _prove:
-                proof_chain.append((i, [
-                    "2: if V != An(Y)",
-                    f"--> {s(_g.V)} != {s(An(_y))}",
-                    "  return ID(y, x ∩ An(y), P(An(Y)), An(Y)_G)",
-                    f"  --> ID({s(_y)}, {s(_x)} ∩ {s(An(_y))}, P({s(An(_y))}), An({s(An(_y))})_G)",
-                    "",
-                    f"  [***** Do-Calculus: Rule 3 *****]",
-                    "  let W = V \\ An(Y)_G",
-                    f"      W = {s(_g.V)} \\ {s(An(_y))}",
-                    f"      W = {s(w)}",
-                    f"  G \\ W = An(Y)_G",
-                    f"  {s(_g.V)} \\ {s(w)} = {s(An(_y))}",
-                    "  P_{x,z} (y | w) = P_{x} (y | w) if (Y ⊥⊥ Z | X, W) _G_X,Z(W)",
-                    f"  let y = y ({s(_y)}), x = x ∩ An(Y) ({s(_x & An(_y))}), z = w ({s(w)})" ", w = Ø",
-                    "  P_{" f"{s((_x & An(_y)) | w)}" "} " f"({s(_y)}) = P_{s(_x & An(_y))} ({s(_y)}) if ({s(_y)} ⊥⊥ {s(w)} | {s(_x & An(_y))}) _G_{s(_x)}",
-                ]))
-
-            return _identification(_y, _x & An(_y), p_operator(_g.V - _g[An(_y)].V, _p), _g[An(_y)], _prove, i+1, proof_chain)
-
-
-        # 3
-        w = (_g.V - _x) - _g.without_incoming(_x).ancestors(_y)
+        return p_operator(_g.V - _y, _p, proof_chain)
+
+    # 2
+    an_y = An(_y)
+    if _g.V != an_y:
+        if stats is not None:
+            stats.count("id_line_2")
+        if hooks:
+            event("id.line_2", depth=i)
 
         if _prove:
-            proof_chain.append((i, [
-                "let W = (V \\ X) \\ An(Y)_G_X",
-                f"--> W = ({s(_g.V)} \\ {s(_x)}) \\ An({s(_y)})_G_{s(_x)}",
-                f"--> W = {s(_g.V - _x)} \\ {s(_g.without_incoming(_x).ancestors(_y))}",
-                f"--> W = {s(w)}"
-            ]))
-
-        if w != set():
+            proof_chain.append((i, ProofStep("2", g=_g, y=_y, x=_x, an_y=an_y)))
+
+        return (yield _identify(_y, _x & an_y, p_operator(_g.V - _g[an_y].V, _p), _g[an_y], _prove, i+1, proof_chain, executor, memo))
+
+
+    # 3
+    an_y_x = _g.without_incoming(_x).ancestors(_y)
+    w = (_g.V - _x) - an_y_x
+
+    if _prove:
+        proof_chain.append((i, ProofStep("let W", g=_g, y=_y, x=_x, an_y_x=an_y_x, w=w)))
+
+    if w != set():
+        if stats is not None:
+            stats.count("id_line_3")
+        if hooks:
+            event("id.line_3", depth=i)
+
+        if _prove:
+            proof_chain.append((i, ProofStep("3", y=_y, x=_x, w=w)))
+
+        return (yield _identify(_y, _x | w, _p, _g, _prove, i+1, proof_chain, executor, memo))
+
+    C_V_minus_X = _g[_g.V - _x].C
+
+    # Line 4
+    if len(C_V_minus_X) > 1:
+        if stats is not None:
+            stats.count("id_line_4")
+        if hooks:
+            event("id.line_4", depth=i)
+
+        if _prove:
+            proof_chain.append((i, ProofStep("4", g=_g, y=_y, x=_x, components=C_V_minus_X)))
+
+        if executor is None:
+            components = []
+            for s_i in C_V_minus_X:
+                components.append((yield _identify(s_i, _g.V - s_i, _p, _g, _prove, i+1, None, None, memo)))
+
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            # Sub-problems are only submitted from this level; nested calls run serially in the worker, so a
+            #   bounded pool can never wait on itself. On a thread pool, each runs in a copy of this context, so under
+            #   the same budget, and collects its own Stats, merged into these
+            if isinstance(executor, ThreadPoolExecutor):
+                futures = [executor.submit(copy_context().run, _identify_component, s_i, _g.V - s_i, _p, _g, _prove, i+1, memo) for s_i in C_V_minus_X]
+            else:
+                futures = [executor.submit(_identify_component, s_i, _g.V - s_i, _p, _g, _prove, i+1, memo) for s_i in C_V_minus_X]
+
+            components = []
+            for future in futures:
+                component, worker_stats = future.result()
+                components.append(component)
+                if stats is not None and worker_stats is not None:
+                    stats.merge(worker_stats)
+
+        return PExpression(_g.V - (_y | _x), components, proof_chain)
+
+    else:
+
+        # At this point we have a single component
+        S = C_V_minus_X[0]
+
+        if _prove:
+            proof_chain.append((i, ProofStep("single component", g=_g, x=_x, S=S)))
+
+        # Line 5 - G is a single c-component
+        if len(_g.C) == 1:
+            if stats is not None:
+                stats.count("id_line_5")
+            if hooks:
+                event("id.line_5", depth=i)
+
             if _prove:
-                proof_chain.append((i, [
-                    "3: W != Ø",
-                    "  return ID(y, x ∪ w, P, G)",
-                    f"  --> ID({s(_y)}, {s(_x)} ∪ {s(w)}, P, G)",
-                    "",
-                    "  [***** Do-Calculus: Rule 3 *****]",
-                    "  P_{x, z} (y | w) = P_{x} if (Y ⊥⊥ Z | X, W)_G_X_Z(W)",
-                    "  let y = y, x = x, z = w, w = Ø",
-                    "  P_{x} (y | w) = P_{x,z} (y | w) if (Y ⊥⊥ Z | X, W) _G_X,Z(W)",
-                    f"  P_{s(_x)} ({s(_y)}) = P_" "{" f"{s(_x)[1:-1]}, {s(w)[1:-1]}" "}" f" ({s(_y)}) if ({s(_y)} ⊥⊥ {s(w)} | {s(_x)})_G_{s(_x)}"
-                ]))
-
-            return _identification(_y, _x | w, _p, _g, _prove, i+1, proof_chain)
-
-        C_V_minus_X = _g[_g.V - _x].C
-
-        # Line 4
-        if len(C_V_minus_X) > 1:
+                proof_chain.append((i, ProofStep("5", g=_g, y=_y, x=_x, S=S)))
+
+            raise FAIL(_g, S, proof_chain)
+
+        # Line 6 - a single c-component
+        if S in _g.C:
+
+            dists = []
+            for vi in S:
+                given = _g.v_Pi[:_g.v_Pi.index(vi)]
+                dists.append(TemplateExpression(vi, given))
+
+            if stats is not None:
+                stats.count("id_line_6")
+            if hooks:
+                event("id.line_6", depth=i)
+
             if _prove:
-                proof_chain.append((i, [
-                    "4: C(G \\ X) = {S_1, ..., S_k}",
-                    f"--> C(G \\ X) = C({s(_g.V)} \\ {s(_x)}) = {', '.join(list(map(s, C_V_minus_X)))}",
-                    "  return Σ_{V \\ y ∪ x} Π_i ID(Si, v \\ Si, P, G)",
-                    "  --> Σ_{" f"{s(_g.V)} \\ {s(_y)} ∪ {s(_x)}" "} Π [",
-                    *[f"      --> ID({s(Si)}, {s(_g.V - Si)}, P, G)" for Si in C_V_minus_X],
-                    "  ]",
-                    "",
-                    "  [***** Proof *****]",
-                    "  P_{x} (y) = Σ_{v \\ (y ∪ x)} Π_i P_{v \\ S_i} (S_i)",
-                    "  1. [***** Do-Calculus: Rule 3 *****]",
-                    "     Π_i P_{v \\ S_i} (S_i) = Π_i P_{A_i} (S_i), where A_i = An(S_i)_G \\ S_i",
-                    "     Π [",
-                        *[f"       P_{s(_g.V - si)} ({s(si)[1:-1]})" for si in C_V_minus_X],
-                    "     ] = Π [",
-                        *[f"       P_{s(_g.ancestors(si)-si)} ({s(si)[1:-1]})" for si in C_V_minus_X],
-                    "     ]",
-
-                    "  2. [***** Chain Rule *****]",
-                    "     Π_i P_{A_i} (S_i) = Π_i Π_{V_j ∈ S_i} P_{A_i} (V_j | V_π^(j-1) \\ A_i)",
-
-                    "     Π [",
-                        *[f"       P_{s(_g.ancestors(si)-si)} ({s(si)[1:-1]})" for si in C_V_minus_X],
-                    "     ] = Π [",
-                        *[" ".join(["       Π ["]  + [
-                            f"P_{s(_g.ancestors(si)-si)} ({vj} | {s(set(_g.v_Pi[:_g.v_Pi.index(vj)]) - _g.ancestors({vj}))})" for vj in si
-                        ] + ["]"]) for si in C_V_minus_X],
-                    "     ]",
-
-                    "  3. [***** Rule 2 or Rule 3 *****]",
-                    "     Π_i Π_{V_j ∈ S_i} P_{A_i} (V_j | V_π^(j-1) \\ A_i) = Π_i Π_{V_j ∈ S_i} P(V_j | V_π^(j-1))",
-                    "     a. if A ∈ A_i ∩ V_π^(j-1), A can be removed as an intervention by Rule 2",
-                    "        All backdoor paths from A_i to V_j with a node not in V_π^(j-1) are d-separated.",
-                    "        Paths must also be bidirected arcs only.",
-                    "        let x = x, y = y, z = {A}, w = Ø",
-                    "        P_{x,z} (y | w) = P_{x} (y | z, w) if (Y ⊥⊥ Z | X, W)_X_Z_",
-                    "     b. if A ∈ A_i \\ V_π^(j-1), A can be removed as an intervention by Rule 3",
-                    "         let x = x, y = V_j, z = {A}, w = Ø",
-                    "         P_{x,z} (y | w) = P_{x} (y | w) if (Y ⊥⊥ Z | X, W)_G_X_Z(W)",
-                    "         (V_j ⊥⊥ A | V_π^(j-1)) G_{A_i}",
-
-                    "     Π [",
-                        *[" ".join(["       Π ["]  + [
-                            f"P_{s(_g.ancestors(si)-si)} ({vj} | {s(set(_g.v_Pi[:_g.v_Pi.index(vj)]) - _g.ancestors({vj}))})" for vj in si
-                        ] + ["]"]) for si in C_V_minus_X],
-                    "     ] = Π [",
-                        *[" ".join(["       Π ["]  + [
-                            f"P ({vj} | {s(set(_g.v_Pi[:_g.v_Pi.index(vj)]))})" for vj in si
-                        ] + ["]"]) for si in C_V_minus_X],
-                    "     ]",
-
-                    "  4. [***** Grouping *****]",
-                    "     Π_i Π_{V_j ∈ S_i} P(V_j | V_π^(j-1)) = Π_i P(V_i | V_π^(i-1))",
-
-                    "     Π [",
-                        *[" ".join(["       Π ["]  + [
-                            f"P ({vj} | {s(set(_g.v_Pi[:_g.v_Pi.index(vj)]))})" for vj in si
-                        ] + ["]"]) for si in C_V_minus_X],
-                    "     ] = Π [",
-
-                    "     ]",
-
-                    "  5. [***** Chain Rule *****]",
-                    "     Π_i P(V_i | V_π^(i-1)) = P(v)"
-                ]))
-
-            return PExpression(_g.V - (_y | _x), [_identification(s_i, _g.V - s_i, _p, _g, _prove, i+1) for s_i in C_V_minus_X], proof_chain)
+                distributions = [(d.head, tuple(d.given)) for d in dists]
+                proof_chain.append((i, ProofStep("6", g=_g, y=_y, x=_x, S=S, distributions=distributions)))
 
+            return PExpression(S - _y, dists, proof_chain)
+
+        # 7
         else:
+            s_prime = next(s for s in _g.C if set(s) > set(S))
+            p = []
+
+            for v in s_prime:
+                rhs0 = _g.v_Pi[:_g.v_Pi.index(v)]
+                rhs1 = rhs0.copy()
 
-            # At this point we have a single component
-            S = C_V_minus_X[0]
+                rhs0 = list(set(rhs0) & s_prime)
+                rhs1 = list(set(rhs1) - s_prime)
+                rhs = rhs0 + rhs1
+                p.append(TemplateExpression(v, rhs))
+
+            g_s_prime = _g[s_prime]
+
+            if stats is not None:
+                stats.count("id_line_7")
+            if hooks:
+                event("id.line_7", depth=i)
 
             if _prove:
-                proof_chain.append((i, [
-                    "if C(G \\ X) = {S}",
-                    f"--> C({s(_g.V)} \\ {s(_x)}) = {s(S)}"
-                ]))
-
-            # Line 5
-            if set(S) == _g.V:
-                if _prove:
-                    proof_chain.append((i, [
-                        "5: if C(G) = {G}: FAIL(G, S)",
-                        f"--> G, S form hedges F, F' for Px(Y) -> {_g}, {S} for P_{_x}({_y})"
-                    ]))
-
-                raise FAIL(_g, S, proof_chain)
-
-            # Line 6 - a single c-component
-            if S in _g.C:
-
-                dists = []
-                dist_str = []
-                for vi in S:
-                    given = _g.v_Pi[:_g.v_Pi.index(vi)]
-                    if _prove:
-                        dist_str.append(f"P({vi})" if len(given) == 0 else f"P({vi} | {', '.join(given)})")
-                    dists.append(TemplateExpression(vi, given))
-
-                if _prove:
-                    proof_chain.append((i, [
-                        f"6: S ∈ C(G)",
-                        f"--> {s(S)} ∈ {', '.join(list(map(s, _g.C)))}",
-                        "  return Σ_{S-Y} π_{Vi ∈ S} P(Vi | V_π^(i-1))",
-                        f"  --> Σ_{s(S - _y)} π [{', '.join(dist_str)}]",
-                        "",
-                        "  [***** Proof *****]",
-                        f"  G has been partitioned into S = {s(S)} and X = {s(_x)} in G = {s(_g.V)}.",
-                        "  There are no bidirected arcs between S and X."
-                    ]))
-
-                return PExpression(S - _y, dists, proof_chain)
-
-            # 7
-            else:
-                s_prime = next(s for s in _g.C if set(s) > set(S))
-                p = []
-
-                msg = "  --> P = "
-
-                for v in s_prime:
-                    rhs0 = _g.v_Pi[:_g.v_Pi.index(v)]
-                    rhs1 = rhs0.copy()
-
-                    rhs0 = list(set(rhs0) & s_prime)
-                    rhs1 = list(set(rhs1) - s_prime)
-                    rhs = rhs0 + rhs1
-                    p.append(TemplateExpression(v, rhs))
-                    if _prove:
-                        msg += f"[{v}{(f' | ' + ', '.join(rhs)) if len(rhs) > 0 else ''}]"
-
-                g_s_prime = _g[s_prime]
-
-                if _prove:
-                    proof_chain.append((i, [
-                        f"7: if ∃(S') S ⊂ S' ∈ C(G)",
-                        f"--> let S = {s(S)}, S' = {s(s_prime)}",
-                        f"--> {s(S)} ⊂ {s(s_prime)} ∈ {', '.join(list(map(s, _g.C)))}",
-                        "  return ID(y, x ∩ S', π_{V_i ∈ S'} P(V_i | V_π^(i-1) ∩ S', V_π^(i-1) \\ S'), S')",
-                        msg,
-                        f"  --> ID({s(_y)}, {s(_x)} ∩ {s(s_prime)}, P, G = ({g_s_prime.V}, {g_s_prime.e}, {g_s_prime.e_bidirected}))",
-                        "",
-                        "  [***** Proof *****]",
-                        f"  G is partitioned into X = {s(_x)} and S = {s(S)}, where X ⊂ An(S).",
-                        "  M_{X \\ S'} induces G \\ (X \\ S') = S'.",
-                        "  P_{x} = P_{x ∩ S', X \\ S'} = P_{x ∩ S'}.",
-                    ]))
-
-                return _identification(_y, _x & s_prime, PExpression([], p), g_s_prime, _prove, i+1, proof_chain)
-
-    return _identification(y, x, p, g, prove)
+                distributions = [(t.head, tuple(t.given)) for t in p]
+                proof_chain.append((i, ProofStep("7", g=_g, y=_y, x=_x, S=S, s_prime=s_prime, g_s_prime=g_s_prime, distributions=distributions)))
+
+            return (yield _identify(_y, _x & s_prime, PExpression([], p), g_s_prime, _prove, i+1, proof_chain, executor, memo))
+
 
 def simplify_expression(original: PExpression, g: Graph, debug=False) -> PExpression:
 
+    # The same (x, y, z) independence tests recur across expressions and passes; only test each one once
+    independence = dict()
+
+    def ci(x: Set[str], y: Set[str], z: Set[str]) -> bool:
+        key = (frozenset(x), frozenset(y), frozenset(z))
+        if key not in independence:
+            independence[key] = g.m_separated(x, y, z)
+        return independence[key]
+
     def _simplify(current,i = 0):
 
         cpt_list_copy = list(filter(lambda i: isinstance(i, TemplateExpression), current.terms))
@@ -283,7 +299,8 @@ def simplify_expression(original: PExpression, g: Graph, debug=False) -> PExpres
 
             s.internal_proof.append((offset, c))
 
-        steps = []
+        removed = []
+        dropped = []
 
         # """
         # Remove unnecessary variables from body
@@ -295,13 +312,11 @@ def simplify_expression(original: PExpression, g: Graph, debug=False) -> PExpres
                 for variable in expression.given:
                     y = {variable}
                     z = set(expression.given) - y
-                    if g.ci(x, y, z):
-                        msg1 = f"{', '.join(x)} is independent of {', '.join(y)} given {', '.join(z)}, and can be removed."
-                        msg2 = f"p operator removed {variable} from body of {expression}"
+                    if ci(x, y, z):
                         if debug:
-                            print(msg1)
-                            print(msg2)
-                        steps.append(msg1)
+                            print(f"{', '.join(x)} is independent of {', '.join(y)} given {', '.join(z)}, and can be removed.")
+                            print(f"p operator removed {variable} from body of {expression}")
+                        removed.append((x, y, z))
                         expression.given.remove(variable)
                         removed_one = True
 
@@ -322,10 +337,9 @@ def simplify_expression(original: PExpression, g: Graph, debug=False) -> PExpres
             for query in remove:
                 current.sigma.remove(query.head)
                 current.terms.remove(query)
-                msg = f"{query.head} can be removed."
                 if debug:
-                    print(msg)
-                steps.append(msg)
+                    print(f"{query.head} can be removed.")
+                dropped.append(query.head)
         # """
 
         while True:
@@ -336,10 +350,6 @@ def simplify_expression(original: PExpression, g: Graph, debug=False) -> PExpres
                 current.terms.remove(cpt)
                 current.sigma.remove(cpt.head)
 
-        if len(steps) > 0:
-            tables = ", ".join(f"P({table.head} | {', '.join(table.given)})" if len(table.given) > 0 else f"P({table.head})" for table in cpt_list_copy)
-            steps.append(f"After simplification: {tables}")
-
         def distribution_position(item: Union[PExpression, TemplateExpression]):
             if isinstance(item, PExpression):
                 if len(item.sigma) == 0:
@@ -351,10 +361,8 @@ def simplify_expression(original: PExpression, g: Graph, debug=False) -> PExpres
         # Sort remaining expressions by the topological ordering
         current.terms.sort(key=distribution_position)
 
-        if len(steps) > 0:
-            steps.insert(0, "[***** Simplification *****]")
-
-        return steps
+        tables = [(table.head, tuple(table.given)) for table in cpt_list_copy] if removed or dropped else []
+        return ProofStep("simplification", removed=removed, dropped=dropped, tables=tables)
 
     if original.internal_proof:
         depth = original.internal_proof[-1][0] + 1
@@ -367,5 +375,15 @@ def simplify_expression(original: PExpression, g: Graph, debug=False) -> PExpres
     return p
 
 
-def p_operator(v: Set[str], p: PExpression, proof: List[Tuple[int, List[str]]] = None):
+def p_operator(v: Set[str], p: PExpression, proof: List[Tuple[int, ProofStep]] = None):
     return PExpression(list(v.copy() | set(p.sigma)), p.terms.copy(), proof)
+
+
+def _p_key(p: Union[PExpression, TemplateExpression]) -> tuple:
+    """
+    A hashable key describing the structure of a distribution, such that two distributions with the same key are
+    the same distribution.
+    """
+    if isinstance(p, TemplateExpression):
+        return p.head, tuple(p.given)
+    return tuple(p.sigma), tuple(map(_p_key, p.terms))
@@ -1,17 +1,36 @@
+from collections import OrderedDict
 from itertools import product
-from typing import List, Iterable, Set, Tuple
+from threading import Lock
+from typing import Callable, List, Iterable, Optional, Set, Tuple
 
 from ..core.Graph import Graph
+from ..core.Stats import active
+
+# The most subgraphs and ancestor closures a LatentGraph keeps by default
+CACHE_SIZE = 1024
 
 
 class LatentGraph(Graph):
 
-    def __init__(self, vertices: Set[str], edges: Set[Tuple[str, str]], e_bidirected: Set[Tuple[str, str]], fixed_topology: List[str] = None):
+    def __init__(self, vertices: Set[str], edges: Set[Tuple[str, str]], e_bidirected: Set[Tuple[str, str]], fixed_topology: List[str] = None, cache_size: Optional[int] = CACHE_SIZE):
         super().__init__(vertices, edges, fixed_topology)
         self.e_bidirected = e_bidirected.copy()
         self.V = vertices
+
+        # Adjacency of the bidirected arcs, to avoid scanning every arc when looking up a vertex's neighbours
+        self.bidirected = {vertex: set() for vertex in vertices}
+        for s, t in self.e_bidirected:
+            self.bidirected.setdefault(s, set()).add(t)
+            self.bidirected.setdefault(t, set()).add(s)
+
         self.C = self.make_components()
 
+        # Subgraphs and ancestor closures are only ever computed from the (unchanging) graph, so they are kept
+        #   and shared by every later ID call on this graph; the least recently used are evicted past cache_size
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = Lock()
+
         # Allows passing a topology down to a subgraph
         if fixed_topology:
 
@@ -20,21 +39,50 @@ class LatentGraph(Graph):
 
             # ensure topology fully represents the graph
             assert all(x in vertices for x in filtered_topology), "vertex in the given topology is not in the graph!"
-            assert all(x in filtered_topology for x in vertices), "vertex in the graph is not in the given topology!"
+            assert vertices <= set(filtered_topology), "vertex in the graph is not in the given topology!"
 
             self.v_Pi = filtered_topology
 
-        # Otherwise, generate it
+        # Otherwise, take the one the graph was sorted into
         else:
-            self.v_Pi = self.__kahns()
+            self.v_Pi = sorted(self.v, key=self.topology_map.get)
 
     def __str__(self):
         return f"Graph: V = {', '.join(self.v)}, E = {', '.join(list(map(str, self.e)))}, E (Bidirected) = {', '.join(list(map(str, self.e_bidirected)))}"
 
+    def _cached(self, key: tuple, build: Callable):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        value = build()
+
+        with self._lock:
+            self._cache[key] = value
+            if self._cache_size is not None and len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+        return value
+
     def __getitem__(self, v: Set[str]):
-        e = {(s, t) for (s, t) in self.e if s in v and t in v}
-        e_bidirected = {(s, t) for (s, t) in self.e_bidirected if s in v and t in v}
-        return LatentGraph(self.v & v, e, e_bidirected, self.v_Pi)
+        def build():
+            e = {(s, t) for (s, t) in self.e if s in v and t in v}
+            e_bidirected = {(s, t) for (s, t) in self.e_bidirected if s in v and t in v}
+            return LatentGraph(self.v & v, e, e_bidirected, self.v_Pi, self._cache_size)
+
+        return self._cached(("subgraph", frozenset(self.v & v)), build)
+
+    def __getstate__(self):
+        # The cache can be rebuilt, and is left out to keep copies sent to other processes small
+        state = self.__dict__.copy()
+        state["_cache"] = OrderedDict()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
 
     def __eq__(self, other):
         if not isinstance(other, LatentGraph):
@@ -45,37 +93,46 @@ class LatentGraph(Graph):
             all([(e[0], e[1]) in self.e_bidirected or (e[1], e[0]) in self.e_bidirected for e in other.e_bidirected])
 
     def biadjacent(self, v: str):
-        return {e[0] if e[0] != v else e[1] for e in self.e_bidirected if v in e}
+        return self.bidirected.get(v, set()).copy()
 
     def ancestors(self, y: Set[str]):
-        ans = y.copy()
-        for v in y:
-            for p in self.parents(v):
-                ans |= self.ancestors({p})
-        return ans
-
-    # puts nodes in topological ordering
-    def __kahns(self):
-
-        edges = self.e.copy()
-        vertices = self.v.copy()
-        v_Pi = []
-
-        s = vertices - ({e[0] for e in edges} | {e[1] for e in edges})
-        s |= set([e[0] for e in edges if e[0] not in {g[1] for g in edges}])
-        s = list(s)
-
-        while s:
-            n = s.pop()
-            v_Pi.append(n)
-
-            ms = {e[1] for e in edges if e[0] == n}
-            for m in ms:
-                edges.remove((n, m))
-                if {e for e in edges if e[1] == m} == set():
-                    s.append(m)
-
-        return v_Pi
+        def build():
+            ans = set(y)
+            queue = list(y)
+            while queue:
+                for p in self.parents(queue.pop()):
+                    if p not in ans:
+                        ans.add(p)
+                        queue.append(p)
+            return frozenset(ans)
+
+        return set(self._cached(("ancestors", frozenset(y)), build))
+
+    def clear_cache(self):
+        """
+        Drop every subgraph and ancestor closure cached for the graph
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def disable_outgoing(self, *disable):
+        self.clear_cache()
+        super().disable_outgoing(*disable)
+
+    def disable_incoming(self, *disable):
+        self.clear_cache()
+        super().disable_incoming(*disable)
+
+    def reset_disabled(self):
+        self.clear_cache()
+        super().reset_disabled()
+
+    def view(self, incoming_disabled=(), outgoing_disabled=()):
+        # Subgraphs and closures cached for the graph do not account for the edges disabled in the view
+        view = super().view(incoming_disabled, outgoing_disabled)
+        view._cache = OrderedDict()
+        view._lock = Lock()
+        return view
 
     def make_components(self):
 
@@ -89,7 +146,7 @@ class LatentGraph(Graph):
             q = [start]
 
             while q:
-                v = q.pop(0)
+                v = q.pop()
                 if v not in visited:
                     visited.add(v)
                     component.append(v)
@@ -102,13 +159,16 @@ class LatentGraph(Graph):
 
     def without_incoming(self, x: Iterable[str]):
         # return Graph(self.Edges - {edge for edge in self.Edges if edge[1] in x and edge[2] == "->"}, self.V)
-        return LatentGraph(self.v, self.e - {e for e in self.e if e[1] in x}, self.e_bidirected, self.v_Pi)
+        x = frozenset(x)
+        return self._cached(("without incoming", x), lambda: LatentGraph(self.v, self.e - {e for e in self.e if e[1] in x}, self.e_bidirected, self.v_Pi, self._cache_size))
 
     def collider(self, v1, v2, v3):
         return v1 in self.V and v2 in self.V and v3 in self.V and v1 in self.parents(v2) and v3 in self.children(v2)
 
     def all_paths(self, x: Iterable[str], y: Iterable[str]):
 
+        stats = active()
+
         def path_list(s, t):  # returns all paths from X to Y regardless of direction of link (no bd links)
 
             # generate a fake variable to represent unobservable variables
@@ -144,28 +204,73 @@ class LatentGraph(Graph):
                         r.append(UNOBSERVABLE)
                         r.append(each)
                         from_s_s.append(r)
+
+                if stats is not None:
+                    stats.size("path_frontier", len(from_s_s))
+
+            if stats is not None:
+                stats.size("all_paths", len(ans))
             return ans
 
         return [path_list(q, w) for q, w in product(x, y)]
 
-    def ci(self, x: Set[str], y: Set[str], z: Set[str]):
-        paths = self.all_paths(x, y)
-        for path_pair in paths:
-            for path in path_pair:
-                broke = False
-                for idx, element in enumerate(path):
-                    if 0 < idx < len(path) - 1:
-                        if self.collider(path[idx - 1], element, path[idx + 1]):
-                            return False
-                    if element in z:
-                        broke = True
-                        break
-                if not broke:
-                    return False
+    def m_separated(self, x: Set[str], y: Set[str], z: Set[str]) -> bool:
+        """
+        Determine whether X and Y are m-separated by Z, by a single reachability search from X over the directed
+        and bidirected edges of the graph. Each vertex is visited at most twice (once entered through an arrowhead,
+        once through a tail), so the search is linear in the size of the graph.
+        @param x: A set of (string) vertices
+        @param y: A set of (string) vertices
+        @param z: A set of (string) vertices to condition on
+        @return: True if every path between X and Y is blocked by Z, False otherwise
+        """
+        x = set(x) - set(z)
+        y = set(y) - set(z)
+
+        if x & y:
+            return False
+
+        # A collider is open if it is in Z, or is an ancestor of some vertex in Z
+        an_z = self.ancestors(set(z))
+
+        # A state is (vertex, arrived through an arrowhead into the vertex)
+        visited = set()
+        queue = [(v, False) for v in x]
+
+        while queue:
+            state = queue.pop()
+            if state in visited:
+                continue
+            visited.add(state)
+
+            v, into = state
+
+            if v in y:
+                return False
+
+            if v not in z:
+
+                # Leaving v by a tail never makes v a collider
+                queue.extend((c, True) for c in self.children(v))
+
+                # Leaving v by an arrowhead is only a non-collider if we did not arrive by an arrowhead
+                if not into:
+                    queue.extend((p, False) for p in self.parents(v))
+                    queue.extend((b, True) for b in self.bidirected.get(v, ()))
+
+            if into and v in an_z:
+
+                # v is an open collider; continue through any edge with an arrowhead at v
+                queue.extend((p, False) for p in self.parents(v))
+                queue.extend((b, True) for b in self.bidirected.get(v, ()))
+
         return True
 
+    def ci(self, x: Set[str], y: Set[str], z: Set[str]):
+        return self.m_separated(x, y, z)
+
 
-def latent_transform(g: Graph, u: Set[str]):
+def latent_transform(g: Graph, u: Set[str], cache_size: Optional[int] = CACHE_SIZE):
 
     V = g.v.copy()
     E = set(g.e.copy())
@@ -173,6 +278,13 @@ def latent_transform(g: Graph, u: Set[str]):
 
     Un = u.copy()
 
+    # The parents and children of each vertex, kept in step with E, so no step scans every edge
+    parents_of = {v: set() for v in V}
+    children_of = {v: set() for v in V}
+    for s, t in E:
+        children_of[s].add(t)
+        parents_of[t].add(s)
+
     # Collapse unobservable variables, such as U1 -> U2 -> V ==> U1 -> V
     reduction = True
     while reduction:
@@ -181,8 +293,8 @@ def latent_transform(g: Graph, u: Set[str]):
         remove = set()
         for un in Un:
 
-            parents = [edge[0] for edge in E if edge[1] == un]       # Edges : parent -> u
-            children = [edge[1] for edge in E if edge[0] == un]      # Edges : u -> child
+            parents = list(parents_of[un])        # Edges : parent -> u
+            children = list(children_of[un])      # Edges : u -> child
 
             # All parents are unobservable, all children are observable, at least one parent
             if all(x in u for x in parents) and len(parents) > 0 and all(x not in u for x in children):
@@ -191,14 +303,20 @@ def latent_transform(g: Graph, u: Set[str]):
                 # Remove edges from parents to u
                 for parent in parents:
                     E.remove((parent, un))
+                    children_of[parent].remove(un)
+                parents_of[un].clear()
 
                 # Remove edges from u to children
                 for child in children:
                     E.remove((un, child))
+                    parents_of[child].remove(un)
+                children_of[un].clear()
 
                 # Replace with edge from edge parent to each child
                 for cr in product(parents, children):
                     E.add((cr[0], cr[1]))
+                    children_of[cr[0]].add(cr[1])
+                    parents_of[cr[1]].add(cr[0])
 
                 # U can be removed entirely from graph
                 remove.add(un)
@@ -216,12 +334,15 @@ def latent_transform(g: Graph, u: Set[str]):
         cur = Un.pop()
         V.remove(cur)
 
-        assert len([edge for edge in E if edge[1] == cur]) == 0, \
+        assert len(parents_of[cur]) == 0, \
             "Unobservable still had parent left."
 
         # All outgoing edges of this unobservable
-        child_edges = {edge for edge in E if edge[0] == cur}
+        child_edges = {(cur, child) for child in children_of[cur]}
         E -= child_edges
+        for child in children_of[cur]:
+            parents_of[child].remove(cur)
+        children_of[cur].clear()
 
         # Replace all edges from this unobservable to its children with bidirected arcs
         child_edges = list(child_edges)
@@ -229,5 +350,5 @@ def latent_transform(g: Graph, u: Set[str]):
             a, b = child_edges[i], child_edges[(i + 1) % len(child_edges)]
             E_Bidirected.add((a[1], b[1]))
 
-    print(V, u)
-    return LatentGraph(V, E, E_Bidirected, [x for x in g.topology_sort() if x in V - u])
+    observed = V - u
+    return LatentGraph(V, E, E_Bidirected, [x for x in g.topology_sort() if x in observed], cache_size)
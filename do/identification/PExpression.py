@@ -1,9 +1,11 @@
 from typing import Collection, List, Sequence, Tuple
 
+from .Proof import ProofStep, render_proof
+
 
 class PExpression:
 
-    def __init__(self, sigma: Collection[str], terms: list = None, proof: List[Tuple[int, List[str]]] = None):
+    def __init__(self, sigma: Collection[str], terms: list = None, proof: List[Tuple[int, ProofStep]] = None):
         self.sigma = list(sigma)
         self.terms = list(terms) if terms else []
         self.internal_proof = proof if proof else []
@@ -27,20 +29,21 @@ class PExpression:
         return buf
 
     def copy(self):
-        copied_proof = [(i, [s for s in block]) for i, block in self.internal_proof]
+        copied_proof = self.internal_proof.copy()
         return PExpression(self.sigma.copy(), [x.copy() for x in self.terms], copied_proof)
 
     def proof(self) -> str:
-        s = ""
-        for j, block in self.internal_proof:
-            indent = " " * 3 * j
-            for line in block:
-                s += indent + line + '\n'
-            s += '\n'
-
+        return render_proof(self.proof_steps())
+
+    def proof_steps(self) -> List[Tuple[int, ProofStep]]:
+        """
+        Collect the (unrendered) steps of the proof of this expression, followed by those of any nested expressions.
+        @return: A list of (depth, ProofStep) pairs, in the order the proof is read
+        """
+        steps = self.internal_proof.copy()
         for child in filter(lambda x: isinstance(x, PExpression), self.terms):
-            s += child.proof()
-        return s
+            steps.extend(child.proof_steps())
+        return steps
 
 
 class TemplateExpression:
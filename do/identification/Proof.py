@@ -0,0 +1,271 @@
+from typing import Callable, Collection, Dict, List, Sequence, Tuple
+
+from .LatentGraph import LatentGraph as Graph
+
+
+class ProofStep:
+    """
+    A single step of a proof generated by the Identification algorithm. A step only records which line of the
+    algorithm was taken and the sets involved; the text of the step is built when the proof is rendered, so that
+    recording a proof costs about as much as not recording one.
+    """
+
+    __slots__ = ("line", "data")
+
+    def __init__(self, line: str, **data):
+        """
+        Constructor for a ProofStep
+        @param line: The line of the algorithm this step records. Ex: "1", "4", "begin", "simplification"
+        @param data: The sets, graphs and expressions involved in the step, passed on to the renderer for the line
+        """
+        self.line = line
+        self.data = data
+
+    def __str__(self) -> str:
+        return "\n".join(self.render())
+
+    def render(self) -> List[str]:
+        """
+        Render the step as text.
+        @return: A list of strings, each being one line of the proof
+        """
+        return _renderers[self.line](**self.data)
+
+    def as_dict(self) -> dict:
+        """
+        Convert the step to a dictionary of plain values (strings and lists), suitable for formats other than text,
+        such as JSON.
+        @return: A dictionary of the line of the algorithm and the data involved
+        """
+        def plain(item):
+            if isinstance(item, (set, frozenset)):
+                return sorted(map(plain, item))
+            if isinstance(item, (list, tuple)):
+                return [plain(el) for el in item]
+            if isinstance(item, (str, int, float)):
+                return item
+            return str(item)
+
+        return {"line": self.line, **{key: plain(value) for key, value in self.data.items()}}
+
+
+def render_proof(steps: Sequence[Tuple[int, ProofStep]]) -> str:
+    """
+    Render a sequence of proof steps as text, each step indented by its depth in the recursion.
+    @param steps: A sequence of (depth, ProofStep) pairs
+    @return: The proof as a string
+    """
+    s = ""
+    for j, step in steps:
+        indent = " " * 3 * j
+        for line in step.render():
+            s += indent + line + '\n'
+        s += '\n'
+    return s
+
+
+def s(a_set: Collection[str]) -> str:
+    if len(a_set) == 0:
+        return "Ø"
+    return "{" + ', '.join(a_set) + "}"
+
+
+def _begin(y, x) -> List[str]:
+    return [f"ID Begin: Y = {s(y)}, X = {s(x)}"]
+
+
+def _line_1(g: Graph, y) -> List[str]:
+    return [
+        "1: if X == Ø, return Σ_{V \\ Y} P(V)",
+        f"  --> Σ_{s(g.V - y)} P({s(g.V)})",
+        "",
+        f"[***** Standard Probability Rules *****]"
+    ]
+
+
+def _line_2(g: Graph, y, x, an_y) -> List[str]:
+    w = g.V - an_y
+    return [
+        "2: if V != An(Y)",
+        f"--> {s(g.V)} != {s(an_y)}",
+        "  return ID(y, x ∩ An(y), P(An(Y)), An(Y)_G)",
+        f"  --> ID({s(y)}, {s(x)} ∩ {s(an_y)}, P({s(an_y)}), An({s(an_y)})_G)",
+        "",
+        f"  [***** Do-Calculus: Rule 3 *****]",
+        "  let W = V \\ An(Y)_G",
+        f"      W = {s(g.V)} \\ {s(an_y)}",
+        f"      W = {s(w)}",
+        f"  G \\ W = An(Y)_G",
+        f"  {s(g.V)} \\ {s(w)} = {s(an_y)}",
+        "  P_{x,z} (y | w) = P_{x} (y | w) if (Y ⊥⊥ Z | X, W) _G_X,Z(W)",
+        f"  let y = y ({s(y)}), x = x ∩ An(Y) ({s(x & an_y)}), z = w ({s(w)})" ", w = Ø",
+        "  P_{" f"{s((x & an_y) | w)}" "} " f"({s(y)}) = P_{s(x & an_y)} ({s(y)}) if ({s(y)} ⊥⊥ {s(w)} | {s(x & an_y)}) _G_{s(x)}",
+    ]
+
+
+def _let_w(g: Graph, y, x, an_y_x, w) -> List[str]:
+    return [
+        "let W = (V \\ X) \\ An(Y)_G_X",
+        f"--> W = ({s(g.V)} \\ {s(x)}) \\ An({s(y)})_G_{s(x)}",
+        f"--> W = {s(g.V - x)} \\ {s(an_y_x)}",
+        f"--> W = {s(w)}"
+    ]
+
+
+def _line_3(y, x, w) -> List[str]:
+    return [
+        "3: W != Ø",
+        "  return ID(y, x ∪ w, P, G)",
+        f"  --> ID({s(y)}, {s(x)} ∪ {s(w)}, P, G)",
+        "",
+        "  [***** Do-Calculus: Rule 3 *****]",
+        "  P_{x, z} (y | w) = P_{x} if (Y ⊥⊥ Z | X, W)_G_X_Z(W)",
+        "  let y = y, x = x, z = w, w = Ø",
+        "  P_{x} (y | w) = P_{x,z} (y | w) if (Y ⊥⊥ Z | X, W) _G_X,Z(W)",
+        f"  P_{s(x)} ({s(y)}) = P_" "{" f"{s(x)[1:-1]}, {s(w)[1:-1]}" "}" f" ({s(y)}) if ({s(y)} ⊥⊥ {s(w)} | {s(x)})_G_{s(x)}"
+    ]
+
+
+def _line_4(g: Graph, y, x, components) -> List[str]:
+
+    # The graph work below is only needed for the text of the proof, so it is only done when rendering
+    def given(vj):
+        return set(g.v_Pi[:g.v_Pi.index(vj)])
+
+    return [
+        "4: C(G \\ X) = {S_1, ..., S_k}",
+        f"--> C(G \\ X) = C({s(g.V)} \\ {s(x)}) = {', '.join(list(map(s, components)))}",
+        "  return Σ_{V \\ y ∪ x} Π_i ID(Si, v \\ Si, P, G)",
+        "  --> Σ_{" f"{s(g.V)} \\ {s(y)} ∪ {s(x)}" "} Π [",
+        *[f"      --> ID({s(Si)}, {s(g.V - Si)}, P, G)" for Si in components],
+        "  ]",
+        "",
+        "  [***** Proof *****]",
+        "  P_{x} (y) = Σ_{v \\ (y ∪ x)} Π_i P_{v \\ S_i} (S_i)",
+        "  1. [***** Do-Calculus: Rule 3 *****]",
+        "     Π_i P_{v \\ S_i} (S_i) = Π_i P_{A_i} (S_i), where A_i = An(S_i)_G \\ S_i",
+        "     Π [",
+            *[f"       P_{s(g.V - si)} ({s(si)[1:-1]})" for si in components],
+        "     ] = Π [",
+            *[f"       P_{s(g.ancestors(si)-si)} ({s(si)[1:-1]})" for si in components],
+        "     ]",
+
+        "  2. [***** Chain Rule *****]",
+        "     Π_i P_{A_i} (S_i) = Π_i Π_{V_j ∈ S_i} P_{A_i} (V_j | V_π^(j-1) \\ A_i)",
+
+        "     Π [",
+            *[f"       P_{s(g.ancestors(si)-si)} ({s(si)[1:-1]})" for si in components],
+        "     ] = Π [",
+            *[" ".join(["       Π ["] + [
+                f"P_{s(g.ancestors(si)-si)} ({vj} | {s(given(vj) - g.ancestors({vj}))})" for vj in si
+            ] + ["]"]) for si in components],
+        "     ]",
+
+        "  3. [***** Rule 2 or Rule 3 *****]",
+        "     Π_i Π_{V_j ∈ S_i} P_{A_i} (V_j | V_π^(j-1) \\ A_i) = Π_i Π_{V_j ∈ S_i} P(V_j | V_π^(j-1))",
+        "     a. if A ∈ A_i ∩ V_π^(j-1), A can be removed as an intervention by Rule 2",
+        "        All backdoor paths from A_i to V_j with a node not in V_π^(j-1) are d-separated.",
+        "        Paths must also be bidirected arcs only.",
+        "        let x = x, y = y, z = {A}, w = Ø",
+        "        P_{x,z} (y | w) = P_{x} (y | z, w) if (Y ⊥⊥ Z | X, W)_X_Z_",
+        "     b. if A ∈ A_i \\ V_π^(j-1), A can be removed as an intervention by Rule 3",
+        "         let x = x, y = V_j, z = {A}, w = Ø",
+        "         P_{x,z} (y | w) = P_{x} (y | w) if (Y ⊥⊥ Z | X, W)_G_X_Z(W)",
+        "         (V_j ⊥⊥ A | V_π^(j-1)) G_{A_i}",
+
+        "     Π [",
+            *[" ".join(["       Π ["] + [
+                f"P_{s(g.ancestors(si)-si)} ({vj} | {s(given(vj) - g.ancestors({vj}))})" for vj in si
+            ] + ["]"]) for si in components],
+        "     ] = Π [",
+            *[" ".join(["       Π ["] + [
+                f"P ({vj} | {s(given(vj))})" for vj in si
+            ] + ["]"]) for si in components],
+        "     ]",
+
+        "  4. [***** Grouping *****]",
+        "     Π_i Π_{V_j ∈ S_i} P(V_j | V_π^(j-1)) = Π_i P(V_i | V_π^(i-1))",
+
+        "     Π [",
+            *[" ".join(["       Π ["] + [
+                f"P ({vj} | {s(given(vj))})" for vj in si
+            ] + ["]"]) for si in components],
+        "     ] = Π [",
+
+        "     ]",
+
+        "  5. [***** Chain Rule *****]",
+        "     Π_i P(V_i | V_π^(i-1)) = P(v)"
+    ]
+
+
+def _single_component(g: Graph, x, S) -> List[str]:
+    return [
+        "if C(G \\ X) = {S}",
+        f"--> C({s(g.V)} \\ {s(x)}) = {s(S)}"
+    ]
+
+
+def _line_5(g: Graph, y, x, S) -> List[str]:
+    return [
+        "5: if C(G) = {G}: FAIL(G, S)",
+        f"--> G, S form hedges F, F' for Px(Y) -> {g}, {S} for P_{x}({y})"
+    ]
+
+
+def _line_6(g: Graph, y, x, S, distributions) -> List[str]:
+    dist_str = [f"P({vi})" if len(given) == 0 else f"P({vi} | {', '.join(given)})" for vi, given in distributions]
+    return [
+        f"6: S ∈ C(G)",
+        f"--> {s(S)} ∈ {', '.join(list(map(s, g.C)))}",
+        "  return Σ_{S-Y} π_{Vi ∈ S} P(Vi | V_π^(i-1))",
+        f"  --> Σ_{s(S - y)} π [{', '.join(dist_str)}]",
+        "",
+        "  [***** Proof *****]",
+        f"  G has been partitioned into S = {s(S)} and X = {s(x)} in G = {s(g.V)}.",
+        "  There are no bidirected arcs between S and X."
+    ]
+
+
+def _line_7(g: Graph, y, x, S, s_prime, g_s_prime: Graph, distributions) -> List[str]:
+    msg = "  --> P = " + "".join(f"[{v}{(f' | ' + ', '.join(rhs)) if len(rhs) > 0 else ''}]" for v, rhs in distributions)
+    return [
+        f"7: if ∃(S') S ⊂ S' ∈ C(G)",
+        f"--> let S = {s(S)}, S' = {s(s_prime)}",
+        f"--> {s(S)} ⊂ {s(s_prime)} ∈ {', '.join(list(map(s, g.C)))}",
+        "  return ID(y, x ∩ S', π_{V_i ∈ S'} P(V_i | V_π^(i-1) ∩ S', V_π^(i-1) \\ S'), S')",
+        msg,
+        f"  --> ID({s(y)}, {s(x)} ∩ {s(s_prime)}, P, G = ({g_s_prime.V}, {g_s_prime.e}, {g_s_prime.e_bidirected}))",
+        "",
+        "  [***** Proof *****]",
+        f"  G is partitioned into X = {s(x)} and S = {s(S)}, where X ⊂ An(S).",
+        "  M_{X \\ S'} induces G \\ (X \\ S') = S'.",
+        "  P_{x} = P_{x ∩ S', X \\ S'} = P_{x ∩ S'}.",
+    ]
+
+
+def _simplification(removed, dropped, tables) -> List[str]:
+    steps = [f"{', '.join(x)} is independent of {', '.join(y)} given {', '.join(z)}, and can be removed." for x, y, z in removed]
+    steps.extend(f"{head} can be removed." for head in dropped)
+
+    if len(steps) == 0:
+        return []
+
+    steps.append("After simplification: " + ", ".join(f"P({head} | {', '.join(given)})" if len(given) > 0 else f"P({head})" for head, given in tables))
+    steps.insert(0, "[***** Simplification *****]")
+    return steps
+
+
+_renderers: Dict[str, Callable[..., List[str]]] = {
+    "begin": _begin,
+    "1": _line_1,
+    "2": _line_2,
+    "let W": _let_w,
+    "3": _line_3,
+    "4": _line_4,
+    "single component": _single_component,
+    "5": _line_5,
+    "6": _line_6,
+    "7": _line_7,
+    "simplification": _simplification,
+}
@@ -0,0 +1,76 @@
+from pytest import raises
+
+from do.core.Budget import Budget, active, limit
+from do.core.Exceptions import BudgetExceeded
+from do.core.Expression import Expression
+from do.core.Stats import collect
+from do.core.Variables import Intervention, Outcome
+
+from ..source import api, models
+
+pearl34 = models["pearl-3.4.yml"]
+query = Expression(Outcome("Xj", "xj"), Outcome("X1", "x1"))
+
+
+def test_Unlimited():
+    with limit() as budget:
+        assert active() is budget
+        assert api.probability(query, pearl34) == api.probability(query, pearl34)
+
+    assert active() is None
+    assert budget.steps > 0
+    assert budget.combinations > 0
+
+
+def test_Steps():
+    with raises(BudgetExceeded) as e:
+        with limit(steps=3):
+            api.probability(query, pearl34)
+
+    assert e.value.budget.steps == 4
+    assert e.value.stats.counts["query"] == 4
+
+
+def test_Deadline():
+    with raises(BudgetExceeded) as e:
+        with limit(seconds=0):
+            api.identification({Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}, pearl34, False)
+
+    assert "deadline" in str(e.value)
+
+
+def test_Combinations():
+    with raises(BudgetExceeded):
+        with limit(combinations=100):
+            api.identification({Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}, pearl34, False)
+
+
+def test_FactorSize():
+    treatment = Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], pearl34
+    expected = api.treat(*treatment)
+
+    with raises(BudgetExceeded) as e:
+        with limit(factor_size=2):
+            api.treat(*treatment)
+
+    assert "factor" in str(e.value)
+
+    # The graph is restored, so the model is unaffected
+    assert not pearl34.graph().incoming_disabled
+    assert api.treat(*treatment) == expected
+
+
+def test_OuterStats():
+    with collect() as stats:
+        with raises(BudgetExceeded) as e:
+            with limit(steps=3):
+                api.probability(query, pearl34)
+
+    assert e.value.stats is stats
+
+
+def test_Budget():
+    budget = Budget(steps=1)
+    budget.step()
+    with raises(BudgetExceeded):
+        budget.step()
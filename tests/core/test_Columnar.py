@@ -0,0 +1,67 @@
+from pytest import raises
+
+from do.core.Columnar import from_probabilities, from_records, read_csv
+from do.core.Exceptions import InvalidOutcome
+from do.core.Variables import Outcome
+from do.core.helpers import within_precision
+
+from ..source import api, models
+
+spec = {
+    "endogenous": {
+        "X": {"outcomes": ["x", "~x"], "parents": []},
+        "Y": {"outcomes": ["y", "~y"], "parents": ["X"]}
+    }
+}
+
+records = [("x", "y")] * 3 + [("x", "~y")] + [("~x", "~y")] * 4
+
+
+def test_FromProbabilities():
+
+    model = models["pearl-3.4.yml"]
+
+    spec = {"endogenous": {v.name: {"outcomes": v.outcomes, "parents": v.parents} for v in model.all_variables()}}
+    tables = dict()
+
+    for variable in model.all_variables():
+        table = model.table(variable.name)
+        columns = {name: [] for name in [variable.name] + table.parents + ["P"]}
+        for outcome, given, p in table.table_rows:
+            columns[variable.name].append(outcome.outcome)
+            for o in given:
+                columns[o.name].append(o.outcome)
+            columns["P"].append(p)
+        tables[variable.name] = columns
+
+    built = from_probabilities(spec, tables)
+
+    for variable in model.all_variables():
+        for outcome, given, p in model.table(variable.name).table_rows:
+            assert built.table(variable.name).probability_lookup(outcome, given) == p
+
+
+def test_FromRecords(tmp_path):
+
+    path = tmp_path / "records.csv"
+    path.write_text("X,Y\n" + "\n".join(",".join(r) for r in records) + "\n")
+
+    # read in chunks smaller than the data
+    assert len(list(read_csv(path, chunk_size=3))) == 3
+
+    for model in [from_records(spec, read_csv(path, chunk_size=3)), api.learn_model(spec, path)]:
+        assert model.table("X").probability_lookup(Outcome("X", "x"), []) == 0.5
+        assert model.table("Y").probability_lookup(Outcome("Y", "y"), [Outcome("X", "x")]) == 0.75
+        assert model.table("Y").probability_lookup(Outcome("Y", "y"), [Outcome("X", "~x")]) == 0.0
+
+
+def test_Smoothing():
+
+    columns = {"X": [r[0] for r in records], "Y": [r[1] for r in records]}
+    model = from_records(spec, columns, smoothing=1)
+
+    assert within_precision(model.table("Y").probability_lookup(Outcome("Y", "y"), [Outcome("X", "~x")]), 1 / 6)
+    assert within_precision(model.table("Y").probability_lookup(Outcome("Y", "y"), [Outcome("X", "x")]), 4 / 6)
+
+    with raises(InvalidOutcome):
+        from_records(spec, {"X": ["x", "z"], "Y": ["y", "y"]})
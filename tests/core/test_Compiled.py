@@ -0,0 +1,96 @@
+from pytest import raises
+
+from do.core.Compiled import compiled_size, from_buffer, load, save, write
+from do.core.ConditionalProbabilityTable import DenseProbabilityTable
+from do.core.Exceptions import IncompatibleModelFile, MissingTableRow, MissingVariable
+from do.core.Expression import Expression
+from do.core.Model import from_path
+from do.core.Variables import Outcome
+from do.core.helpers import within_precision
+
+from ..source import api, models
+
+
+def test_RoundTrip(tmp_path):
+
+    for name, model in models.items():
+
+        path = tmp_path / (name + ".dcm")
+        save(model, path)
+        compiled = from_path(path)
+
+        assert compiled.graph().v == model.graph().v
+        assert compiled.graph().e == model.graph().e
+
+        for variable in model.all_variables():
+            assert compiled.variable(variable.name) == variable
+
+            table = compiled.table(variable.name)
+            assert isinstance(table, DenseProbabilityTable)
+
+            for outcome, given, p in model.table(variable.name).table_rows:
+                assert table.probability_lookup(outcome, given) == p
+
+            assert len(table.table_rows) == len(model.table(variable.name).table_rows)
+
+
+def test_LatentParent(tmp_path):
+
+    # a latent parent appearing in none of the rows of its child's table has no outcomes to lay the table out by
+    model = api.instantiate_model({"name": "latent parent", "endogenous": {
+        "X": {"outcomes": ["x", "~x"], "parents": ["U"], "table": [["x", 0.5], ["~x", 0.5]]},
+        "Y": {"outcomes": ["y", "~y"], "parents": ["X"], "table": [[y, x, 0.5] for y in ["y", "~y"] for x in ["x", "~x"]]},
+    }, "exogenous": {"U": ["X"]}})
+
+    with raises(MissingVariable):
+        save(model, tmp_path / "latent.dcm")
+
+
+def test_Inference(tmp_path):
+
+    model = models["pearl-3.4.yml"]
+    api.compile_model(model, tmp_path / "pearl-3.4.dcm")
+    compiled = api.instantiate_model(tmp_path / "pearl-3.4.dcm")
+
+    query = Expression(Outcome("Xj", "xj"), [Outcome("X4", "x4")])
+    assert within_precision(api.probability(query, compiled), api.probability(query, model))
+
+
+def test_Buffer():
+
+    model = models["pearl-3.4.yml"]
+    buffer = bytearray(compiled_size(model))
+    write(model, buffer)
+
+    table = from_buffer(memoryview(buffer).cast("B")).table("Xj")
+    priors = [Outcome("X6", "x6"), Outcome("X4", "x4"), Outcome("X5", "x5")]
+
+    assert table.probability_lookup(Outcome("Xj", "xj"), priors) == model.table("Xj").probability_lookup(Outcome("Xj", "xj"), priors)
+
+    with raises(MissingTableRow):
+        table.probability_lookup(Outcome("Xj", "foo"), priors)
+
+    with raises(MissingTableRow):
+        table.probability_lookup(Outcome("Xj", "xj"), priors[1:])
+
+
+def test_Incompatible(tmp_path):
+
+    path = tmp_path / "bad.dcm"
+    path.write_bytes(b"\0" * 64)
+
+    with raises(IncompatibleModelFile):
+        load(path)
+
+
+def test_CopyOnWrite(tmp_path):
+
+    path = tmp_path / "pearl-3.4.dcm"
+    save(models["pearl-3.4.yml"], path)
+
+    compiled = load(path)
+    compiled.set_probability(Outcome("X1", "x1"), [], 0.25)
+
+    # the file, and so every other process mapping it, is unchanged
+    assert compiled.table("X1").probability_lookup(Outcome("X1", "x1"), []) == 0.25
+    assert load(path).table("X1").probability_lookup(Outcome("X1", "x1"), []) == 0.4
@@ -1,5 +1,8 @@
+from pytest import raises
+
 from do.core.Variables import Outcome, Intervention, Variable
-from do.core.Graph import to_label
+from do.core.Exceptions import CyclicGraph
+from do.core.Graph import Graph, to_label
 
 from ..source import models
 graph = models["pearl-3.4.yml"]._g
@@ -104,6 +107,23 @@ def test_topology_sort():
             assert after not in graph.ancestors(v)
 
 
+def test_topology_sort_cycle():
+
+    cyclic = Graph({"A", "B", "C", "D"}, {("A", "B"), ("B", "C"), ("C", "B"), ("C", "D")}, ["A", "B", "C", "D"])
+
+    # only the vertices above the cycle can be sorted
+    assert cyclic.topology_sort(strict=False) == ["A"]
+
+    with raises(CyclicGraph):
+        cyclic.topology_sort()
+
+    with raises(CyclicGraph):
+        Graph(cyclic.v, cyclic.e)
+
+    # a graph with a cycle may still be built, to be validated
+    assert Graph(cyclic.v, cyclic.e, strict=False).get_topology("A") == 1
+
+
 def test_graph_copy():
 
     graph_2 = graph.copy()
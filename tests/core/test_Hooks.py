@@ -0,0 +1,79 @@
+from json import load
+from threading import Thread
+
+from pytest import raises
+
+from do.core.Expression import Expression
+from do.core.Hooks import ChromeTraceExporter, Exporter, Histograms, JSONExporter, enabled, exporting, install, span, uninstall
+from do.core.Variables import Intervention, Outcome
+
+from ..source import api, model_path
+
+
+def workload():
+    model = api.instantiate_model(model_path / "pearl-3.4.yml")
+    api.validate(model)
+    api.probability(Expression(Outcome("Xj", "xj"), Outcome("X1", "x1")), model)
+    api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], model)
+    api.identification({Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}, model, False)
+
+
+def test_Disabled():
+    assert not enabled()
+
+    with span("unused", detail=1) as s:
+        assert s is None
+
+
+def test_Histograms():
+    with exporting(Histograms()) as (histograms,):
+        assert enabled()
+        workload()
+
+    assert not enabled()
+
+    summary = histograms.summary()
+    for name in ["model.load", "graph.build", "graph.topology_sort", "inference", "treat", "backdoors", "deconfound", "identification", "id.evaluate"]:
+        assert summary[name]["count"] > 0, name
+        assert 0 < summary[name]["p50"] <= summary[name]["max"] <= summary[name]["total"]
+
+    assert summary["inference.jeffrey_rule"]["count"] > 0
+    assert "p50" not in summary["inference.jeffrey_rule"]
+    assert any(name.startswith("id.line_") for name in summary)
+
+    # Nothing more is recorded once uninstalled
+    counts = dict(histograms.counts)
+    workload()
+    assert histograms.counts == counts
+
+
+def test_Files(tmp_path):
+    with exporting(JSONExporter(tmp_path / "spans.json"), ChromeTraceExporter(tmp_path / "trace.json")):
+        workload()
+
+    with (tmp_path / "spans.json").open() as f:
+        records = load(f)
+    assert {"model.load", "inference"} <= {r["name"] for r in records}
+    assert all(r["duration"] is None or r["duration"] >= 0 for r in records)
+
+    with (tmp_path / "trace.json").open() as f:
+        trace = load(f)
+    assert {e["ph"] for e in trace["traceEvents"]} == {"X", "i"}
+    assert next(e for e in trace["traceEvents"] if e["name"] == "model.load")["args"]["path"].endswith("pearl-3.4.yml")
+
+
+def test_Install():
+    # an exporter must record
+    with raises(TypeError):
+        Exporter()
+
+    # installing and uninstalling from other threads, while spans are recorded, loses no exporter
+    histograms = [Histograms() for _ in range(8)]
+    threads = [Thread(target=lambda h=h: (install(h), workload(), uninstall(h))) for h in histograms]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not enabled()
+    assert all(h.counts["inference"] > 0 for h in histograms)
@@ -1,11 +1,14 @@
 from os.path import dirname, abspath
 from pathlib import Path
+from pytest import raises
 from yaml import safe_load
 
 from do.API import API
-from do.core.Model import from_dict
+from do.core.Exceptions import CyclicGraph, DuplicateTableRow, InconsistentDistribution, InvalidModel, InvalidOutcome, MissingTableRow
+from do.core.Graph import Graph
+from do.core.Model import Model, from_dict
 from do.core.Expression import Expression
-from do.core.Variables import parse_outcomes_and_interventions
+from do.core.Variables import Intervention, Outcome, parse_outcomes_and_interventions
 
 from do.core.helpers import within_precision
 
@@ -35,3 +38,76 @@ def test_Inference():
 
             result = api.probability(Expression(head, body), m)
             assert within_precision(result, expected)
+
+
+def test_Validate(tmp_path):
+
+    for name, model in models.items():
+        assert api.validate(model)
+
+        # a compiled model is checked directly from its arrays
+        api.compile_model(model, tmp_path / (name + ".dcm"))
+        assert api.validate(api.instantiate_model(tmp_path / (name + ".dcm")))
+
+
+def test_ValidateProblems():
+
+    model = from_dict({
+        "endogenous": {
+            "X": {"outcomes": ["x", "~x"], "parents": [], "table": [["x", 0.5], ["~x", 0.6]]},
+            "Y": {"outcomes": ["y", "~y"], "parents": ["X"], "table": [["y", "x", 0.5], ["~y", "x", 0.5], ["y", "x", 0.5], ["y", "~x", 1.0], ["y", "z", 0.0]]}
+        }
+    })
+
+    with raises(InvalidModel) as e:
+        api.validate(model)
+
+    problems = {(type(p), str(p)) for p in e.value.problems}
+    assert problems == {
+        (InconsistentDistribution, "P(X) sums to 1.1"),
+        (InvalidOutcome, "Y = y | X = z"),
+        (MissingTableRow, "Y = ~y | X = ~x"),
+        (DuplicateTableRow, "Y = y | X = x")
+    }
+
+    cyclic = Model(Graph({"X", "Y"}, {("X", "Y"), ("Y", "X")}, ["X", "Y"]), model._v, model._d)
+    with raises(InvalidModel) as e:
+        api.validate(cyclic)
+
+    assert any(isinstance(p, CyclicGraph) for p in e.value.problems)
+
+    # a cyclic model fails to load, unless loaded to be validated, when the cycle is reported with any other problems
+    data = {"endogenous": {
+        "X": {"outcomes": ["x", "~x"], "parents": ["Y"], "table": [["x", "y", 1.0], ["~x", "y", 0.0], ["x", "~y", 1.0], ["~x", "~y", 0.0]]},
+        "Y": {"outcomes": ["y", "~y"], "parents": ["X"], "table": [["y", "x", 1.0], ["~y", "x", 0.0], ["y", "~x", 1.0], ["~y", "~x", 0.0]]},
+    }}
+    with raises(CyclicGraph):
+        from_dict(data)
+
+    loaded = from_dict(data, strict=False)
+    with raises(InvalidModel) as e:
+        api.validate(loaded)
+
+    assert [str(p) for p in e.value.problems if isinstance(p, CyclicGraph)] == ["vertices on or below a cycle: X, Y"]
+
+    # and querying it fails, rather than computing each variable in terms of the other forever
+    with raises(CyclicGraph):
+        api.probability(Expression(Outcome("X", "x")), loaded)
+    with raises(CyclicGraph):
+        api.treat(Expression(Outcome("Y", "y")), [Intervention("X", "x")], loaded)
+    with raises(CyclicGraph):
+        api.identification({Outcome("Y", "y")}, {Intervention("X", "x")}, loaded, False)
+
+
+def test_DeepInference():
+    # A chain far longer than the recursion limit; each variable has a single outcome, so the query is linear in its
+    #   length, but recurses through every variable
+    length = 1500
+    endogenous = {"V0": {"outcomes": ["v0"], "parents": [], "table": [["v0", 1.0]]}}
+    for i in range(1, length):
+        endogenous[f"V{i}"] = {"outcomes": [f"v{i}"], "parents": [f"V{i - 1}"], "table": [[f"v{i}", f"v{i - 1}", 1.0]]}
+
+    model = from_dict({"name": "chain", "endogenous": endogenous})
+    query = Expression(parse_outcomes_and_interventions(f"V{length - 1} = v{length - 1}"))
+
+    assert api.probability(query, model) == 1.0
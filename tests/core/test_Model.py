@@ -1,8 +1,13 @@
 from pytest import raises
 
-from do.core.Exceptions import MissingVariable
+from do.core.ConditionalProbabilityTable import ConditionalProbabilityTable, DenseProbabilityTable
+from do.core.Exceptions import CyclicGraph, MissingVariable, ReadOnlyModel
+from do.core.Expression import Expression
+from do.core.Graph import Graph
+from do.core.Model import LazyModel, from_path
+from do.core.Variables import Outcome, Variable
 
-from ..source import models
+from ..source import api, model_path, models
 model = models["pearl-3.4.yml"]
 
 
@@ -15,3 +20,151 @@ def test_Lookup():
     # ensure a latent variable fails to be retrieved...
     with raises(MissingVariable):
         model.variable("Z")
+
+
+def test_StreamedLoading():
+
+    for file in model_path.iterdir():
+
+        model = models[file.name]
+        streamed = from_path(file, stream=True)
+
+        assert streamed.graph().v == model.graph().v
+        assert streamed.graph().e == model.graph().e
+
+        for variable in model.all_variables():
+            assert streamed.variable(variable.name) == variable
+
+            table = streamed.table(variable.name)
+            assert isinstance(table, DenseProbabilityTable)
+
+            for outcome, given, p in model.table(variable.name).table_rows:
+                assert table.probability_lookup(outcome, given) == p
+
+
+def test_StreamedFallback(tmp_path):
+
+    # an outcome missing from the variable's outcomes cannot be laid out densely, so the rows are kept as they are
+    path = tmp_path / "fallback.yml"
+    path.write_text("""
+endogenous:
+  X:
+    outcomes: [x, ~x]
+    parents: []
+    table: [[x, 0.5], [~x, 0.25], [y, 0.25]]
+""")
+
+    table = from_path(path, stream=True).table("X")
+    assert not isinstance(table, DenseProbabilityTable)
+    assert [(row[0].outcome, row[2]) for row in table.table_rows] == [("x", 0.5), ("~x", 0.25), ("y", 0.25)]
+
+
+def test_LazyModel():
+
+    for file in model_path.iterdir():
+
+        model = models[file.name]
+        lazy = from_path(file, lazy=True, cache_size=2)
+
+        assert isinstance(lazy, LazyModel)
+        assert lazy.graph().v == model.graph().v
+        assert lazy.graph().e == model.graph().e
+
+        # nothing is built until it is looked up
+        assert len(lazy._d) == 0
+
+        for variable in model.all_variables():
+            table = lazy.table(variable.name)
+            assert lazy.table(variable.name) is table
+            assert len(lazy._d) <= 2
+
+            for outcome, given, p in model.table(variable.name).table_rows:
+                assert table.probability_lookup(outcome, given) == p
+
+    with raises(MissingVariable):
+        from_path(model_path / "pearl-3.4.yml", lazy=True).table("Z")
+
+
+def test_LazyInference():
+
+    lazy = api.instantiate_model(model_path / "pearl-3.4.yml", lazy=True, cache_size=1)
+    model = models["pearl-3.4.yml"]
+
+    query = Expression(Outcome("Xj", "xj"), Outcome("Xi", "xi"))
+    assert api.probability(query, lazy) == api.probability(query, model)
+
+
+def test_Updates():
+
+    model = from_path(model_path / "pearl-3.4.yml")
+    graph = model.graph()
+
+    # cache every closure, so that stale ones would be noticed
+    for v in graph.v:
+        graph.ancestors(v)
+        graph.descendants(v)
+
+    def consistent():
+        fresh = Graph(set(graph.v), set(graph.e))
+        for s, t in graph.e:
+            assert graph.get_topology(s) < graph.get_topology(t)
+        for v in graph.v:
+            assert graph.ancestors(v) == fresh.ancestors(v)
+            assert graph.descendants(v) == fresh.descendants(v)
+
+    model.set_probability(Outcome("X1", "x1"), [], 0.25)
+    model.set_probability(Outcome("X1", "~x1"), [], 0.75)
+    assert model.table("X1").probability_lookup(Outcome("X1", "x1"), []) == 0.25
+    assert api.validate(model)
+
+    # Xj is a sink; W is added below it
+    w = Variable("W", ["w", "~w"], ["Xj"])
+    model.add_variable(w, ConditionalProbabilityTable(w, ["Xj"], [["w", "xj", 0.5], ["~w", "xj", 0.5], ["w", "~xj", 0.1], ["~w", "~xj", 0.9]]))
+    consistent()
+
+    # an edge from W into X1 would create a cycle
+    with raises(CyclicGraph):
+        model.add_edge("W", "X1", ConditionalProbabilityTable(model.variable("X1"), ["W"], []))
+    assert ("W", "X1") not in graph.e
+    consistent()
+
+    # an edge against the current topological order, which reorders it
+    v = Variable("V", ["v", "~v"], [])
+    model.add_variable(v, ConditionalProbabilityTable(v, [], [["v", 0.5], ["~v", 0.5]]))
+    assert graph.get_topology("V") > graph.get_topology("X1")
+
+    x1 = model.variable("X1")
+    model.add_edge("V", "X1", ConditionalProbabilityTable(Variable("X1", x1.outcomes, ["V"]), ["V"], [["x1", "v", 0.2], ["~x1", "v", 0.8], ["x1", "~v", 0.6], ["~x1", "~v", 0.4]]))
+    assert model.variable("X1").parents == ["V"]
+    assert "V" in graph.ancestors("Xj")
+    consistent()
+    assert api.validate(model)
+
+    model.remove_edge("V", "X1", ConditionalProbabilityTable(x1, [], [["x1", 0.4], ["~x1", 0.6]]))
+    model.remove_variable("V")
+    model.remove_variable("W")
+    assert graph.v == models["pearl-3.4.yml"].graph().v
+    consistent()
+
+    with raises(ValueError):
+        model.remove_variable("X1")
+
+
+def test_ReadOnly():
+
+    shared = api.instantiate_model(model_path / "pearl-3.4.yml", shared=True)
+
+    with raises(ReadOnlyModel):
+        shared.set_probability(Outcome("X1", "x1"), [], 0.25)
+
+
+def test_LazyUpdates():
+
+    lazy = from_path(model_path / "pearl-3.4.yml", lazy=True, cache_size=1)
+    lazy.set_probability(Outcome("X1", "x1"), [], 0.25)
+
+    # a modified table is never evicted
+    for variable in lazy.all_variables():
+        lazy.table(variable.name)
+
+    assert lazy.table("X1").probability_lookup(Outcome("X1", "x1"), []) == 0.25
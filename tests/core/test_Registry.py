@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from do.core.ConditionalProbabilityTable import DenseProbabilityTable
+from do.core.Expression import Expression
+from do.core.Registry import ModelRegistry, footprint, prewarm
+from do.core.Model import from_path
+from do.core.Variables import Intervention, Outcome
+
+from ..source import api, model_path, models
+
+
+def test_Deduplication(tmp_path):
+
+    registry = ModelRegistry()
+
+    model = registry.get(model_path / "pearl-3.4.yml")
+    assert registry.get(model_path / "pearl-3.4.yml") is model
+    assert model_path / "pearl-3.4.yml" in registry
+
+    # the same content under another name is the same model
+    copy = tmp_path / "copy.yml"
+    copy.write_text((model_path / "pearl-3.4.yml").read_text())
+    assert registry.get(copy) is model
+
+    # changing the file loads it again
+    copy.write_text((model_path / "pearl-3.6.yml").read_text())
+    assert registry.get(copy) is not model
+
+    data = {"endogenous": {"X": {"outcomes": ["x", "~x"], "parents": [], "table": [["x", 0.5], ["~x", 0.5]]}}}
+    assert registry.get(data) is registry.get({"endogenous": dict(data["endogenous"])})
+
+    assert len(registry) == 3
+    assert not registry.contains(model_path / "pearl-3.4.yml", lazy=True)
+    assert registry.get(model_path / "pearl-3.4.yml", lazy=True) is not model
+    assert registry.contains(model_path / "pearl-3.4.yml", lazy=True)
+
+
+def test_Eviction():
+
+    model = models["pearl-3.4.yml"]
+    registry = ModelRegistry(max_bytes=footprint(model) + 1)
+
+    first = registry.get(model_path / "pearl-3.4.yml")
+    registry.get(model_path / "pearl-3.6.yml")
+
+    assert len(registry) == 1
+    assert registry.get(model_path / "pearl-3.4.yml") is not first
+
+
+def test_Prewarm():
+
+    model = from_path(model_path / "pearl-3.4.yml")
+    prewarm(model)
+
+    for variable in model.all_variables():
+        assert isinstance(model.table(variable.name), DenseProbabilityTable)
+        assert ("ancestors", variable.name) in model.graph().closures
+
+    query = Expression(Outcome("Xj", "xj"), Outcome("Xi", "xi"))
+    assert api.probability(query, model) == api.probability(query, models["pearl-3.4.yml"])
+
+
+def test_Shared():
+
+    assert api.instantiate_model(model_path / "pearl-3.4.yml", shared=True) is api.instantiate_model(model_path / "pearl-3.4.yml", shared=True)
+    assert api.instantiate_model(model_path / "pearl-3.4.yml") is not api.instantiate_model(model_path / "pearl-3.4.yml")
+
+
+def test_Concurrent():
+
+    registry = ModelRegistry()
+    model = registry.get(model_path / "pearl-3.4.yml")
+
+    # treat intervenes on a view of the graph, so it never disturbs queries running on the same model at once
+    effect = Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")]
+    marginal = Expression(Outcome("Xj", "xj"), Outcome("X1", "x1"))
+    expected = api.treat(*effect, model), api.probability(marginal, model)
+
+    def query(i: int) -> float:
+        return api.treat(*effect, model) if i % 2 else api.probability(marginal, model)
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(query, range(64)))
+
+    assert all(result == expected[i % 2 == 0] for i, result in enumerate(results))
+    assert not model.graph().incoming_disabled
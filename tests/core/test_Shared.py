@@ -0,0 +1,44 @@
+from concurrent.futures import ProcessPoolExecutor
+from pickle import dumps
+
+from do.core.ConditionalProbabilityTable import DenseProbabilityTable
+from do.core.Expression import Expression
+from do.core.Shared import SharedModel
+from do.core.Variables import Intervention, Outcome
+from do.core.helpers import within_precision
+
+from ..source import api, models
+
+query = Expression(Outcome("X3", "x3"), Outcome("X1", "x1"))
+
+
+def _probe(model):
+    return type(model).__name__, model.name, api.probability(query, model)
+
+
+def test_Shared():
+
+    model = models["pearl-3.4.yml"]
+    shared = api.share_model(model)
+
+    try:
+        assert isinstance(shared, SharedModel)
+        assert shared.graph().e == model.graph().e
+        assert all(isinstance(shared.table(v.name), DenseProbabilityTable) for v in model.all_variables())
+
+        # only the name of the segment is pickled
+        assert len(dumps(shared)) < 200
+
+        expected = api.probability(query, model)
+
+        with ProcessPoolExecutor(2) as executor:
+            for kind, name, p in executor.map(_probe, [shared] * 4):
+                assert kind == "SharedModel"
+                assert name == shared.name
+                assert p == expected
+
+            y, x = {Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}
+            assert within_precision(api.identification(y, x, shared, False, executor), api.identification(y, x, model, False))
+
+    finally:
+        shared.unlink()
@@ -0,0 +1,104 @@
+
+from do.core.Expression import Expression
+from do.core.Model import from_path
+from do.core.Stats import Stats, active, collect
+from do.core.Variables import Intervention, Outcome
+
+from ..source import api, model_path, models
+
+pearl34 = models["pearl-3.4.yml"]
+
+
+def test_Collect():
+    query = Expression(Outcome("Xj", "xj"), Outcome("X1", "x1"))
+
+    assert active() is None
+
+    with collect() as stats:
+        assert active() is stats
+        p = api.probability(query, pearl34)
+
+    assert active() is None
+    assert p == api.probability(query, pearl34)
+
+    assert stats.counts["query"] > 1
+    assert stats.counts["table_lookup"] > 0
+    assert stats.counts["jeffrey_rule"] > 0
+    assert stats.depth > 0
+    assert stats.timings["inference"] > 0
+
+    # Nothing is recorded once detached
+    counts = dict(stats.counts)
+    api.probability(query, pearl34)
+    assert stats.counts == counts
+
+
+def test_StatsReturned():
+    query = Expression(Outcome("Xj", "xj"), Outcome("X1", "x1"))
+
+    p, stats = api.probability(query, pearl34, stats=True)
+    assert p == api.probability(query, pearl34)
+    assert isinstance(stats, Stats)
+    assert stats.as_dict()["counts"]["query"] == stats.counts["query"]
+
+    p, stats = api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], pearl34, stats=True)
+    assert p == api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], pearl34)
+    assert stats.counts["adjustment_term"] > 0
+    assert {"treat", "backdoors", "deconfound", "inference"} <= set(stats.timings)
+
+    (p, proof), stats = api.identification({Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}, pearl34, stats=True)
+    assert p == api.identification({Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}, pearl34, False)
+    assert stats.counts["id_call"] > 0
+    assert stats.counts["table_lookup"] > 0
+    assert {"identification", "evaluation"} <= set(stats.timings)
+
+
+def test_CacheStats():
+    model = from_path(model_path / "pearl-3.4.yml", lazy=True, cache_size=2)
+    query = Expression(Outcome("Xj", "xj"), Outcome("X1", "x1"))
+
+    with collect() as stats:
+        api.probability(query, model)
+
+    assert stats.counts["table_cache_miss"] > 0
+    assert stats.counts["closure_cache_hit"] + stats.counts["closure_cache_miss"] > 0
+
+
+def test_Accumulate():
+    query = Expression(Outcome("Xj", "xj"), Outcome("X1", "x1"))
+    stats = Stats()
+
+    with collect(stats):
+        api.probability(query, pearl34)
+    once = stats.counts["query"]
+
+    with collect(stats):
+        api.probability(query, pearl34)
+    assert stats.counts["query"] == 2 * once
+
+
+def test_Largest():
+    with collect() as stats:
+        api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], pearl34)
+
+    assert stats.largest["backdoor_paths"] > 0
+    assert stats.largest["adjustment_product"] > 1
+    assert stats.as_dict()["largest"] == stats.largest
+    assert "peak_bytes" not in stats.as_dict()
+
+
+def test_Memory():
+    from tracemalloc import is_tracing
+
+    with collect(memory=True) as stats:
+        assert is_tracing()
+        api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], pearl34)
+
+    assert not is_tracing()
+    assert stats.peak_bytes > 0
+    assert {"treat", "backdoors", "deconfound", "inference"} <= set(stats.memory)
+
+    # Phases nest, so no phase allocates more at once than the whole query
+    assert all(0 < usage["peak_bytes"] <= stats.peak_bytes for usage in stats.memory.values())
+    assert stats.memory["inference"]["peak_bytes"] <= stats.memory["treat"]["peak_bytes"]
+    assert stats.as_dict()["peak_bytes"] == stats.peak_bytes
@@ -7,6 +7,7 @@ from do.core.Expression import Expression
 from do.core.Model import Model
 from do.core.Variables import Intervention, parse_outcomes_and_interventions
 from do.core.helpers import within_precision
+from do.deconfounding.Backdoor import any_backdoor_path
 
 from ..source import api, models
 
@@ -55,3 +56,14 @@ def test_Deconfounding():
         model = models[data["graph_filename"]]
 
         deconfounding_validation(model, data["tests"])
+
+
+def test_AnyBackdoorPath():
+
+    # whether any backdoor path is open agrees with the paths enumerated, with and without a deconfounding set
+    for name in ["pearl-3.4.yml", "pearl-7.5.yml", "melanoma.yml"]:
+        graph = models[name].graph()
+        for x in sorted(graph.v):
+            for y in sorted(graph.v - {x}):
+                for dcf in [set()] + [{z} for z in sorted(graph.v - {x, y})]:
+                    assert any_backdoor_path({x}, {y}, graph, dcf) == (len(api.backdoors({x}, {y}, graph, dcf)) > 0), (name, x, y, dcf)
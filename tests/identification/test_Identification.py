@@ -1,7 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pytest import raises
+
 from do.API import API
+from do.core.Budget import limit
+from do.core.Shared import _attached as shared_models, share
+from do.core.Stats import collect
+from do.core.Exceptions import BudgetExceeded
 from do.core.Expression import Expression
 from do.core.Variables import Intervention, Outcome
+from do.core.Model import from_dict
 from do.core.helpers import within_precision
+from do.identification.Exceptions import Fail
+from do.identification.Identification import Identification
+from do.identification.LatentGraph import latent_transform
+from do.identification.PExpression import PExpression, TemplateExpression
 
 from ..source import models
 melanoma = models["melanoma.yml"]
@@ -35,4 +48,128 @@ def test_melanoma():
 def test_proof():
     print(api.proof({Outcome("Y", "y")}, {Intervention("X", "x")}, melanoma))
 
+
+def test_proof_steps():
+    y, x = {"Y"}, {"X"}
+    g = latent_transform(melanoma.graph().copy(), melanoma.graph().v - set(melanoma._v.keys()))
+    p = PExpression([], [TemplateExpression(v, list(g.parents(v))) for v in g.v])
+
+    steps = Identification(y, x, p, g, True).proof_steps()
+    assert steps[0][1].as_dict() == {"line": "begin", "y": ["Y"], "x": ["X"]}
+    assert all(isinstance(step.as_dict()["line"], str) for _, step in steps)
+
+    assert Identification(y, x, p, g, False).proof_steps() == []
+
+
+def test_executor():
+    y, x = {Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}
+    serial, proof = api.identification(y, x, pearl34)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert api.identification(y, x, pearl34, executor=executor) == (serial, proof)
+
+    # sets are rebuilt when sent to another process, so summation order (but not the value) may differ
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert within_precision(api.identification(y, x, pearl34, False, executor), serial)
+
+        # the model is sent to the workers in shared memory, which is released once the effect is evaluated
+        assert not shared_models
+
+        shared = share(pearl34)
+        try:
+            assert within_precision(api.identification(y, x, shared, False, executor), serial)
+        finally:
+            shared.unlink()
+
+
+def test_executor_budget():
+    y, x = {Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}
+    _, stats = api.identification(y, x, pearl34, False, stats=True)
+
+    # terms evaluated on a thread pool are counted, and run under the caller's budget, where most steps are taken
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        _, threaded = api.identification(y, x, pearl34, False, executor, stats=True)
+        assert threaded.counts["table_lookup"] == stats.counts["table_lookup"]
+        assert threaded.counts["summed_assignment"] == stats.counts["summed_assignment"]
+
+        with limit() as budget:
+            api.identification(y, x, pearl34, False, executor)
+
+        with raises(BudgetExceeded), limit(steps=budget.steps // 2):
+            api.identification(y, x, pearl34, False, executor)
+
+
+def test_executor_identification_budget():
+    g = latent_transform(pearl34.graph().copy(), set())
+    p = PExpression([], [TemplateExpression(v, list(g.parents(v))) for v in g.v])
+
+    with limit() as serial, collect() as stats:
+        Identification({"Xj"}, {"Xi"}, p, g, False)
+
+    # the sub-problems identified on a thread pool take their steps under the caller's budget, and are counted
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with limit() as threaded, collect() as threaded_stats:
+            Identification({"Xj"}, {"Xi"}, p, g, False, executor)
+
+        assert threaded.steps == serial.steps
+        assert threaded_stats.counts["id_call"] == stats.counts["id_call"]
+        assert threaded_stats.counts["id_line_4"] > 0
+
+        with raises(BudgetExceeded), limit(steps=serial.steps - 1):
+            Identification({"Xj"}, {"Xi"}, p, g, False, executor)
+
+
+def test_identifiable_many():
+
+    bow = from_dict({
+        "endogenous": {
+            "X": {"outcomes": ["x", "~x"], "parents": [], "table": [["x", 0.5], ["~x", 0.5]]},
+            "Y": {"outcomes": ["y", "~y"], "parents": ["X"], "table": [["y", "x", 0.3], ["y", "~x", 0.6], ["~y", "x", 0.7], ["~y", "~x", 0.4]]}
+        },
+        "exogenous": {"U": ["X", "Y"]}
+    })
+
+    results = api.identifiable_many([({"Y"}, {"X"}), ([Outcome("X", "x")], [])], bow)
+    assert results[0][0] is False and results[0][1][1] == {"Y"}
+    assert results[1] == (True, None)
+
+    pairs = [({y}, {x}) for y in ["Xj", "X5", "X6"] for x in ["Xi", "X3", "X4"]]
+    results = api.identifiable_many(pairs, pearl34)
+
+    for (y, x), (identifiable, _) in zip(pairs, results):
+        try:
+            api.proof({Outcome(v, v.lower()) for v in y}, {Intervention(v, v.lower()) for v in x}, pearl34)
+            assert identifiable
+        except Fail:
+            assert not identifiable
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert api.identifiable_many(pairs, pearl34, executor, chunk_size=2) == results
+
+
+def test_memo():
+    # the order in which a set is rendered may differ between equal sets, so the steps are compared as plain values
+    def steps(expression):
+        return [(depth, step.as_dict()) for depth, step in expression.proof_steps()]
+
+    g = latent_transform(pearl34.graph().copy(), set())
+    p = PExpression([], [TemplateExpression(v, list(g.parents(v))) for v in g.v])
+
+    memo = dict()
+    for y in sorted(g.v):
+        for x in sorted(g.v - {y}):
+            fresh = Identification({y}, {x}, p, g, True)
+            shared = Identification({y}, {x}, p, g, True, memo=memo)
+            assert str(fresh) == str(shared)
+
+            # a sub-problem reused from an earlier run is proven as in a run of its own
+            assert steps(fresh) == steps(shared)
+
+    # a memo filled without proofs is still used to identify, and proofs are derived again where wanted
+    unproven = dict()
+    for y in sorted(g.v):
+        Identification({y}, g.v - {y}, p, g, False, memo=unproven)
+    for y in sorted(g.v):
+        assert steps(Identification({y}, g.v - {y}, p, g, True, memo=unproven)) == steps(Identification({y}, g.v - {y}, p, g, True))
+
 ##################################################################################
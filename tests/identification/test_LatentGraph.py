@@ -300,3 +300,47 @@ def tests():
 
             print("*********** Proof (Simplified)")
             print(simplify.proof())
+
+
+def test_m_separation_directed():
+
+    chain = parse_graph_string("A->B->C.")
+    assert not chain.m_separated({"A"}, {"C"}, set())
+    assert chain.m_separated({"A"}, {"C"}, {"B"})
+
+    collider = parse_graph_string("A->C<-B.C->D.")
+    assert collider.m_separated({"A"}, {"B"}, set())
+    assert not collider.m_separated({"A"}, {"B"}, {"C"})
+    assert not collider.m_separated({"A"}, {"B"}, {"D"})
+
+
+def test_m_separation_bidirected():
+
+    g = parse_graph_string("A<->B.")
+    assert not g.m_separated({"A"}, {"B"}, set())
+
+    g = parse_graph_string("A<->C<->B.")
+    assert g.m_separated({"A"}, {"B"}, set())
+    assert not g.m_separated({"A"}, {"B"}, {"C"})
+
+    assert not g_5.ci({"Y"}, {"Z1"}, set())
+    assert g_5.ci({"Y"}, {"Z1"}, {"X", "Z2", "Z3"})
+    assert not g_5.ci({"Z3"}, {"X"}, {"Z1", "Z2"})
+
+
+def test_cache_size():
+
+    g = parse_graph_string("A->B->C->D.A<->D.")
+    bounded = LatentGraph(g.v, g.e, g.e_bidirected, g.v_Pi, cache_size=2)
+
+    # The least recently used entries are evicted, and give the same results when rebuilt
+    first = bounded[{"A", "B"}]
+    assert bounded.ancestors({"C"}) == {"A", "B", "C"}
+    assert bounded[{"A", "B"}] is first
+    assert bounded.without_incoming({"B"}).parents("B") == set()
+    assert len(bounded._cache) == 2
+    assert bounded.ancestors({"C"}) == {"A", "B", "C"}
+    assert bounded[{"A", "B"}] is not first and bounded[{"A", "B"}] == first
+
+    bounded.clear_cache()
+    assert not bounded._cache
@@ -7,8 +7,9 @@ from do.core.Model import from_path
 
 api = API()
 
-# directory of YML files containing valid models for testing purposes
-model_path = Path("models")
+# directory of YML files containing valid models for testing purposes, found relative to the tests rather than the
+#   directory they are run from
+model_path = Path(__file__).resolve().parent.parent / "models"
 assert model_path.is_dir()
 
 models = dict()
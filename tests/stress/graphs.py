@@ -0,0 +1,131 @@
+"""
+Large synthetic graphs, and a check that an algorithm stays within time and memory ceilings on them as they grow.
+
+The ceilings depend on the machine, and may not be met on a shared one, so the stress tests are skipped unless the
+environment variable DO_STRESS is set. With DO_STRESS=1, graphs of 1,000 and 10,000 vertices are checked; set
+DO_STRESS=large to also check graphs of 100,000 vertices, which takes some minutes.
+"""
+from gc import collect
+from os import environ
+from random import Random
+from time import perf_counter
+from tracemalloc import get_traced_memory, is_tracing, reset_peak, start, stop
+from typing import Callable, List, Set, Tuple
+
+from pytest import mark
+
+# Applied to every stress test module, as its pytestmark
+stress = mark.skipif(not environ.get("DO_STRESS"), reason="set DO_STRESS to run the stress tests")
+
+SIZES = [1_000, 10_000] + ([100_000] if environ.get("DO_STRESS") == "large" else [])
+
+# How much more than linearly the time and memory of an algorithm may grow between two sizes, to allow for noise
+#   (and for the log factors of sorting, hashing and such) without letting anything quadratic through
+SLACK = 4
+
+Edges = Set[Tuple[str, str]]
+
+
+def chain(n: int) -> Tuple[Set[str], Edges]:
+    """
+    v0 -> v1 -> ... -> v(n-1)
+    """
+    v = [f"v{i}" for i in range(n)]
+    return set(v), set(zip(v, v[1:]))
+
+
+def tree(n: int, branching: int = 3) -> Tuple[Set[str], Edges]:
+    """
+    A complete tree rooted at v0, each vertex vi being the parent of the next branching vertices not yet placed.
+    """
+    return {f"v{i}" for i in range(n)}, {(f"v{(i - 1) // branching}", f"v{i}") for i in range(1, n)}
+
+
+def layered(n: int, width: int = 50, parents: int = 4, seed: int = 0) -> Tuple[Set[str], Edges]:
+    """
+    A dense DAG of layers of width vertices, each vertex (after the first layer) having a number of parents in the
+    layer before it. Every vertex can be reached from a root along exponentially many paths.
+    """
+    random = Random(seed)
+    e = set()
+
+    for i in range(width, n):
+        layer = i // width
+        for p in random.sample(range((layer - 1) * width, layer * width), parents):
+            e.add((f"v{p}", f"v{i}"))
+
+    return {f"v{i}" for i in range(n)}, e
+
+
+def latent(n: int, latents: int, seed: int = 0) -> Tuple[Set[str], Edges, Set[str]]:
+    """
+    A chain of n observed vertices, with a number of latent vertices, each confounding two observed vertices; every
+    tenth latent vertex is the parent of another latent vertex, which is collapsed into it.
+    @return: The vertices, edges, and the latent vertices
+    """
+    random = Random(seed)
+    v, e = chain(n)
+    u = {f"u{j}" for j in range(latents)}
+
+    for j in range(latents):
+        if j % 10 == 1:
+            e.add((f"u{j - 1}", f"u{j}"))
+        for child in random.sample(range(n), 2):
+            e.add((f"u{j}", f"v{child}"))
+
+    return v | u, e, u
+
+
+def measure(setup: Callable[[int], tuple], algorithm: Callable, n: int) -> Tuple[float, int]:
+    """
+    Run an algorithm on the arguments set up for a size; once traced, for the peak memory it allocates, and a few
+    times untraced, for the least time it takes (being slowed considerably by tracing).
+    @return: A pair of the time taken, in seconds, and the peak bytes allocated
+    """
+    tracing = is_tracing()
+    if not tracing:
+        start()
+
+    try:
+        arguments = setup(n)
+        collect()
+        reset_peak()
+        before, _ = get_traced_memory()
+        algorithm(*arguments)
+        _, peak = get_traced_memory()
+    finally:
+        if not tracing:
+            stop()
+
+    seconds = []
+    for _ in range(3):
+        arguments = setup(n)
+        begin = perf_counter()
+        algorithm(*arguments)
+        seconds.append(perf_counter() - begin)
+
+    return min(seconds), max(peak - before, 0)
+
+
+def scales(setup: Callable[[int], tuple], algorithm: Callable, seconds: float, memory: int) -> List[Tuple[int, float, int]]:
+    """
+    Check that an algorithm stays within its ceilings at every size, and that its time and memory grow no faster
+    than (about) linearly between sizes.
+    @param setup: Builds the arguments of the algorithm for a number of vertices, which is not measured
+    @param algorithm: The algorithm to run on the arguments
+    @param seconds: The ceiling on time, per 1,000 vertices
+    @param memory: The ceiling on the peak memory allocated, in bytes per vertex
+    @return: The size, time and peak memory of each run
+    """
+    runs = [(n, *measure(setup, algorithm, n)) for n in SIZES]
+
+    for n, t, peak in runs:
+        assert t <= seconds * n / 1000, f"{t:.3f}s on {n} vertices exceeds the ceiling of {seconds * n / 1000:.3f}s"
+        assert peak <= memory * n, f"{peak} bytes on {n} vertices exceeds the ceiling of {memory * n} bytes"
+
+    # Very short times and small allocations are mostly noise, so growth is measured from a floor
+    for (n1, t1, peak1), (n2, t2, peak2) in zip(runs, runs[1:]):
+        assert t2 <= SLACK * n2 / n1 * max(t1, 0.002), f"time grew from {t1:.4f}s on {n1} to {t2:.4f}s on {n2} vertices"
+        assert peak2 <= SLACK * n2 / n1 * max(peak1, 2 ** 16), f"memory grew from {peak1} on {n1} to {peak2} bytes on {n2} vertices"
+
+    return runs
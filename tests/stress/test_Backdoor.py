@@ -0,0 +1,66 @@
+from time import perf_counter
+
+from pytest import raises
+
+from do.core.Budget import limit
+from do.core.Exceptions import BudgetExceeded
+from do.core.Graph import Graph
+from do.deconfounding.Backdoor import any_backdoor_path, backdoors, deconfound
+
+from .graphs import chain, layered, scales, stress, tree
+
+pytestmark = stress
+
+
+def confounded(n: int) -> Graph:
+    """
+    A chain, with v0 also a parent of v2, so that v1 <- v0 -> v2 is a backdoor path from v1 to v2.
+    """
+    v, e = chain(n)
+    return Graph(v, e | {("v0", "v2")})
+
+
+def confounded_layered(n: int) -> Graph:
+    """
+    A layered DAG below x, with z a parent of x and of y, and y a child of the last layer: x <- z -> y is the only
+    backdoor path from x to y, but there are exponentially many directed paths from x to y through the layers.
+    """
+    v, e = layered(n)
+    e |= {("x", f"v{i}") for i in range(50)} | {(f"v{n - 1}", "y"), ("z", "x"), ("z", "y")}
+    return Graph(v | {"x", "y", "z"}, e)
+
+
+def test_Backdoors():
+
+    # The search climbs from the middle of the chain to its root
+    runs = scales(lambda n: (Graph(*chain(n)), n // 2), lambda g, m: backdoors({f"v{m}"}, {f"v{m + 1}"}, g), seconds=0.1, memory=2000)
+    assert backdoors({"v500"}, {"v501"}, Graph(*chain(runs[0][0]))) == []
+
+    # The search visits every vertex of the tree
+    scales(lambda n: (Graph(*tree(n)),), lambda g: backdoors({"v1"}, {"v2"}, g), seconds=0.1, memory=2000)
+    assert backdoors({"v1"}, {"v2"}, Graph(*tree(1000))) == [["v1", "v0", "v2"]]
+
+
+def test_BackdoorsLayered():
+
+    # Between two vertices of the last layer there are exponentially many backdoor paths; whether there is any is
+    #   still found in linear time
+    scales(lambda n: (Graph(*layered(n)), n), lambda g, n: any_backdoor_path({f"v{n - 1}"}, {f"v{n - 2}"}, g), seconds=0.1, memory=2000)
+    assert any_backdoor_path({"v999"}, {"v998"}, Graph(*layered(1000)))
+
+    # backdoors enumerates paths, so it is exponential on layered DAGs, even where only a few of the paths are backdoor
+    #   paths; all that is guaranteed is that it stops soon after the deadline of a budget
+    graph = Graph(*layered(1000))
+    begin = perf_counter()
+    with raises(BudgetExceeded), limit(seconds=0.5):
+        backdoors({"v999"}, {"v998"}, graph)
+    assert perf_counter() - begin < 2
+
+
+def test_Deconfound():
+    scales(lambda n: (confounded(n),), lambda g: deconfound({"v1"}, {"v2"}, g), seconds=0.1, memory=2000)
+    assert deconfound({"v1"}, {"v2"}, confounded(1000)) == [{"v0"}]
+
+    # On a layered DAG the deconfounding sets are still decided in linear time each, as only z is a candidate
+    scales(lambda n: (confounded_layered(n),), lambda g: deconfound({"x"}, {"y"}, g), seconds=0.1, memory=2000)
+    assert deconfound({"x"}, {"y"}, confounded_layered(1000)) == [{"z"}]
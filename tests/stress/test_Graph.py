@@ -0,0 +1,26 @@
+from do.core.Graph import Graph
+
+from .graphs import chain, layered, scales, stress, tree
+
+pytestmark = stress
+
+shapes = [chain, tree, layered]
+
+
+def test_TopologySort():
+    for shape in shapes:
+        scales(lambda n: (Graph(*shape(n)),), lambda g: g.topology_sort(), seconds=0.02, memory=500)
+
+
+def test_Descendants():
+    for shape in shapes:
+        scales(lambda n: (Graph(*shape(n)),), lambda g: g.descendants("v0"), seconds=0.02, memory=500)
+
+    assert len(Graph(*tree(1000)).descendants("v0")) == 999
+
+
+def test_Ancestors():
+    for shape in shapes:
+        scales(lambda n: (Graph(*shape(n)),), lambda g: g.ancestors(f"v{len(g.v) - 1}"), seconds=0.02, memory=500)
+
+    assert len(Graph(*chain(1000)).ancestors("v999")) == 999
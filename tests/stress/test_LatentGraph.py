@@ -0,0 +1,43 @@
+from do.core.Graph import Graph
+from do.identification.LatentGraph import LatentGraph, latent_transform
+
+from .graphs import chain, latent, scales, stress
+
+pytestmark = stress
+
+
+def bidirected(n: int) -> LatentGraph:
+    """
+    A chain of n vertices, each confounded with the next, forming a single c-component.
+    """
+    v, e = chain(n)
+    return LatentGraph(v, e, set(e))
+
+
+def test_LatentTransform():
+
+    def setup(n: int):
+        v, e, u = latent(n, n // 2)
+        return Graph(v, e), u
+
+    runs = scales(setup, latent_transform, seconds=0.2, memory=5000)
+
+    g = latent_transform(*setup(runs[0][0]))
+    assert g.v == {f"v{i}" for i in range(runs[0][0])}
+    assert len(g.e_bidirected) > 0
+
+
+def test_MakeComponents():
+    runs = scales(lambda n: (bidirected(n),), lambda g: g.make_components(), seconds=0.05, memory=1000)
+    assert len(bidirected(runs[0][0]).make_components()) == 1
+
+
+def test_MSeparation():
+
+    # Every vertex is connected to the next both by an edge and by an arc; conditioning on a vertex in the middle
+    #   leaves open the colliders on the arcs either side of it, so the search crosses the whole graph
+    def separated(g: LatentGraph, n: int) -> bool:
+        return g.ci({"v0"}, {f"v{n - 1}"}, {f"v{n // 2}"})
+
+    scales(lambda n: (bidirected(n), n), separated, seconds=0.1, memory=2000)
+    assert not separated(bidirected(1000), 1000)
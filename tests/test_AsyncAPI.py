@@ -0,0 +1,74 @@
+from asyncio import TimeoutError, gather, run
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+
+from pytest import raises
+
+from do import AsyncAPI
+from do.AsyncAPI import _call
+from do.core.Exceptions import BudgetExceeded
+from do.core.Expression import Expression
+from do.core.Variables import Intervention, Outcome
+from do.core.helpers import within_precision
+
+from .source import api, model_path, models
+
+
+def test_AsyncAPI():
+
+    model = models["pearl-3.4.yml"]
+    y, x = {Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}
+
+    async def queries():
+        with ThreadPoolExecutor(2) as executor:
+            facade = AsyncAPI(executor)
+
+            loaded = await facade.instantiate_model(model_path / "pearl-3.4.yml")
+            assert loaded.graph().e == model.graph().e
+
+            return await gather(
+                facade.probability(Expression(Outcome("X3", "x3"), Outcome("X1", "x1")), loaded),
+                facade.identification(y, x, loaded, False),
+                facade.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], model),
+                facade.validate(loaded)
+            )
+
+    p, identified, treated, valid = run(queries())
+
+    assert p == api.probability(Expression(Outcome("X3", "x3"), Outcome("X1", "x1")), model)
+    assert within_precision(identified, treated)
+    assert valid
+
+
+def test_Timeout():
+
+    model = models["pearl-3.4.yml"]
+    ran = []
+
+    async def stalled():
+        with ThreadPoolExecutor(1) as executor:
+            executor.submit(sleep, 0.5)
+
+            facade = AsyncAPI(executor, timeout=0.05)
+            with raises(TimeoutError):
+                await facade._run(None, ran.append, True)
+
+            # a per-call timeout overrides the default
+            assert await facade.probability(Expression(Outcome("X1", "x1")), model, timeout=5) == 0.4
+
+    run(stalled())
+
+    # the call timed out before it started, and so never ran
+    assert ran == []
+
+
+def test_Deadline():
+    # The timeout is passed on as the query's deadline, so a query which times out stops itself
+    with raises(BudgetExceeded):
+        _call("probability", monotonic(), Expression(Outcome("Xj", "xj"), Outcome("X1", "x1")), models["pearl-3.4.yml"])
+
+    # The deadline is fixed when the call is made, so a query which waited for a worker past it does not run
+    deadline = monotonic() + 0.05
+    sleep(0.1)
+    with raises(BudgetExceeded):
+        _call("probability", deadline, Expression(Outcome("Xj", "xj"), Outcome("X1", "x1")), models["pearl-3.4.yml"])
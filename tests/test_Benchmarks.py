@@ -0,0 +1,74 @@
+from benchmarks.compare import compare, enumerate_query, run, unexpected
+from benchmarks.generators import random_model, random_query
+from benchmarks.suite import BENCHMARKS, run_suite, scaling
+
+from .source import api
+
+from do.core.Exceptions import MissingTableRow
+from do.core.Expression import Expression
+from do.core.Model import from_dict
+from do.core.Variables import Outcome
+from do.core.helpers import within_precision
+
+
+def test_RandomModel():
+    for seed in range(5):
+        data = random_model(10, density=0.3, cardinality=3, latent=2, max_parents=2, seed=seed)
+        assert data == random_model(10, density=0.3, cardinality=3, latent=2, max_parents=2, seed=seed)
+
+        model = from_dict(data)
+        assert api.validate(model)
+        assert all(len(model.variable(v).parents) <= 2 for v in model._v)
+
+        x, y = random_query(data, seed)
+        assert x not in model.graph().descendants(y)
+
+
+def test_Suite():
+    report = run_suite(models=None, sizes=[4, 6], repeat=1, seeds=1)
+
+    assert {"timestamp", "python", "platform"} <= set(report["metadata"])
+    assert {r["benchmark"] for r in report["results"]} == {"load"} | set(BENCHMARKS)
+    assert set(scaling(report["results"])["load"]) == {4, 6}
+
+
+def test_Budget():
+
+    # Every run is stopped at the deadline, and each benchmark is then skipped at larger sizes
+    report = run_suite(models=None, sizes=[12, 16], benchmarks=["inference", "deconfound"], repeat=1, seeds=1, budget=0)
+    results = [r for r in report["results"] if r["benchmark"] != "load"]
+
+    assert all(r["skipped"] for r in results)
+    assert all(r["exceeded"] == 0 for r in results if r["parameters"]["vertices"] == 12)
+
+
+def test_Compare():
+    report = compare(models=3, vertices=5, density=0.4, cardinality=2, latent=0, max_parents=2)
+
+    assert not report["disagreements"]
+    assert {"marginal/enumeration", "effect/treat", "effect/identification"} <= set(report["summary"])
+    assert all(result["agree"] for result in report["results"])
+
+
+def test_Unexpected():
+    data = random_model(4, seed=0)
+    latent = random_model(4, latent=1, seed=0)
+
+    def missing():
+        raise MissingTableRow
+
+    assert unexpected(data, "inference", run(missing))
+    assert not unexpected(data, "inference", run(lambda: 0.5))
+    assert not unexpected(data, "identification", {"error": "Fail"})
+    assert unexpected(data, "treat", {"error": "MissingVariable"})
+    assert not unexpected(latent, "treat", {"error": "MissingVariable"})
+
+
+def test_Enumeration():
+    data = random_model(6, density=0.5, seed=1)
+    model = from_dict(data)
+
+    x, y = random_query(data, 1)
+    xo, yo = model.variable(x).outcomes[0], model.variable(y).outcomes[0]
+
+    assert within_precision(enumerate_query(data, {y: yo}, {x: xo}, {}), api.probability(Expression(Outcome(y, yo), Outcome(x, xo)), model))
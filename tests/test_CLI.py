@@ -0,0 +1,78 @@
+from json import dumps, loads
+
+from do.__main__ import main
+from do.core.Expression import Expression
+from do.core.Variables import Intervention, Outcome
+from do.core.helpers import within_precision
+
+from .source import api, model_path, models
+
+queries = [
+    {"id": "marginal", "head": "Xj = xj"},
+    {"head": "Xj = xj", "body": "X1 = x1"},
+    {"id": "effect", "head": "Xj = xj", "body": "do(Xi = xi)"},
+    {"id": "identified", "head": "Xj = xj", "body": "do(Xi = xi)", "backend": "identification"},
+    {"id": "invalid", "head": "Xj = xj", "body": "do(Xi = xi)", "backend": "inference"},
+]
+
+
+def run(tmp_path, *options) -> dict:
+    query_file, output = tmp_path / "queries.jsonl", tmp_path / "results.jsonl"
+    query_file.write_text("\n".join(map(dumps, queries)) + "\n")
+
+    status = main([str(model_path / "pearl-3.4.yml"), str(query_file), "--output", str(output), *options])
+    assert status == 1
+
+    results = {result["id"]: result for result in map(loads, output.read_text().splitlines())}
+    assert set(results) == {"marginal", 2, "effect", "identified", "invalid"}
+    return results
+
+
+def test_CLI(tmp_path):
+    model = models["pearl-3.4.yml"]
+    effect = api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], model)
+
+    results = run(tmp_path, "--workers", "1")
+
+    assert within_precision(results["marginal"]["probability"], api.probability(Expression(Outcome("Xj", "xj")), model))
+    assert within_precision(results[2]["probability"], api.probability(Expression(Outcome("Xj", "xj"), Outcome("X1", "x1")), model))
+    assert results["effect"]["backend"] == "treat"
+    assert within_precision(results["effect"]["probability"], effect)
+    assert within_precision(results["identified"]["probability"], effect)
+    assert results["invalid"]["error"] == "ValueError"
+    assert "stats" not in results["marginal"]
+
+
+def test_CLILogging(tmp_path):
+    from loguru import logger
+
+    # an in-process run silences the package, but leaves the caller's handlers in place
+    messages = []
+    handler = logger.add(messages.append, level="INFO")
+    try:
+        run(tmp_path, "--workers", "1")
+        assert messages == []
+
+        logger.info("after the run")
+        assert len(messages) == 1
+
+        # and the package logs again once the run is over
+        api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], models["pearl-3.4.yml"])
+        assert len(messages) > 1
+    finally:
+        logger.remove(handler)
+
+
+def test_CLIParallel(tmp_path):
+    serial = run(tmp_path, "--workers", "1")
+    parallel = run(tmp_path, "--workers", "2", "--stats", "--timeout", "60")
+
+    for id, result in serial.items():
+        assert result.get("probability") == parallel[id].get("probability")
+
+    assert parallel["effect"]["stats"]["counts"]["adjustment_term"] > 0
+
+
+def test_CLITimeout(tmp_path):
+    results = run(tmp_path, "--workers", "1", "--timeout", "0")
+    assert results["effect"]["error"] == "BudgetExceeded"
@@ -0,0 +1,101 @@
+from itertools import product
+
+from pytest import raises
+
+from do.core.Expression import Expression
+from do.core.Variables import Intervention, Outcome
+from do.identification.Exceptions import Fail
+
+from .source import api, models
+
+pearl34 = models["pearl-3.4.yml"]
+
+
+def test_ExplainInference():
+    cost = api.explain(Expression(Outcome("Xj", "xj"), Outcome("X1", "x1")), pearl34)
+
+    assert cost.backend == "inference"
+    assert cost.variables == len(pearl34.graph().ancestors("Xj")) + 1
+    assert cost.treewidth >= 1
+    assert cost.max_factor <= cost.elimination_work == cost.work
+
+    # Only the ancestors of the query are involved
+    assert api.explain(Expression(Outcome("X1", "x1")), pearl34).variables == 1
+
+
+def test_ExplainTreat():
+    query = Expression(Outcome("Xj", "xj"), Intervention("Xi", "xi"))
+    cost = api.explain(query, pearl34)
+
+    assert cost.backend == "treat"
+    assert cost.backdoor_path
+    assert cost.adjustment_sets
+    assert all(size == 2 ** len(z) for z, size in cost.adjustment_sets)
+
+    # The number of adjustment terms is the number of times treat evaluates P(Z)
+    _, stats = api.treat(Expression(Outcome("Xj", "xj")), [Intervention("Xi", "xi")], pearl34, stats=True)
+    assert stats.counts["adjustment_term"] == sum(size for _, size in cost.adjustment_sets)
+
+
+def test_ExplainTreatLayered():
+    # Below X, layers of three variables each depending on every variable of the layer above give exponentially many
+    #   paths from X to Y; the one confounder, Z, is still found without enumerating them
+    def table(name, parents):
+        rows = [[outcome, *given, 0.5] for given in product(["t", "f"], repeat=len(parents)) for outcome in ["t", "f"]]
+        return {"outcomes": ["t", "f"], "parents": parents, "table": rows}
+
+    endogenous = {"Z": table("Z", []), "X": table("X", ["Z"])}
+    above = ["X"]
+    for depth in range(30):
+        layer = [f"L{depth}_{i}" for i in range(3)]
+        endogenous.update((v, table(v, above)) for v in layer)
+        above = layer
+    endogenous["Y"] = table("Y", above + ["Z"])
+
+    cost = api.explain(Expression(Outcome("Y", "t"), Intervention("X", "t")), api.instantiate_model({"name": "layered", "endogenous": endogenous}))
+    assert cost.backdoor_path
+    assert cost.adjustment_sets == [(["Z"], 2)]
+
+
+def test_ExplainTreatNoBackdoor():
+    # X1 is a root, so there is no backdoor path and treat makes one inference query
+    cost = api.explain(Expression(Outcome("Xj", "xj"), Intervention("X1", "x1")), pearl34)
+
+    assert cost.backdoor_path is False
+    assert cost.adjustment_sets is None
+    assert cost.work == cost.elimination_work
+
+
+def test_ExplainIdentification():
+    query = Expression(Outcome("Xj", "xj"), Intervention("Xi", "xi"))
+    cost = api.explain(query, pearl34, "identification")
+
+    assert cost.identifiable
+    assert set(cost.summed_variables) <= set(pearl34._v)
+
+    # The estimate is the number of lookups evaluation makes
+    _, stats = api.identification({Outcome("Xj", "xj")}, {Intervention("Xi", "xi")}, pearl34, False, stats=True)
+    assert stats.counts["table_lookup"] == cost.table_lookups == cost.work
+
+
+def test_ExplainUnidentifiable():
+    graph = {"name": "bow", "endogenous": {
+        "X": {"outcomes": ["x", "~x"], "parents": ["U"], "table": [["x", "u", 0.5], ["~x", "u", 0.5], ["x", "~u", 0.5], ["~x", "~u", 0.5]]},
+        "Y": {"outcomes": ["y", "~y"], "parents": ["X", "U"], "table": [[y, x, u, 0.5] for y in ["y", "~y"] for x in ["x", "~x"] for u in ["u", "~u"]]},
+    }, "exogenous": {"U": ["X", "Y"]}}
+    model = api.instantiate_model(graph)
+
+    with raises(Fail):
+        api.identification({Outcome("Y", "y")}, {Intervention("X", "x")}, model, False)
+
+    cost = api.explain(Expression(Outcome("Y", "y"), Intervention("X", "x")), model, "identification")
+    assert cost.identifiable is False
+    assert cost.work is None
+
+
+def test_ExplainBackends():
+    with raises(ValueError):
+        api.explain(Expression(Outcome("Xj", "xj")), pearl34, "sampling")
+
+    with raises(ValueError):
+        api.explain(Expression(Outcome("Xj", "xj"), Intervention("Xi", "xi")), pearl34, "inference")
@@ -0,0 +1,50 @@
+from subprocess import run
+from sys import executable
+
+from .source import model_path
+
+# Dependencies only needed once a model is loaded, a table is printed, or something is logged
+deferred = ["numpy", "yaml", "loguru", "json", "concurrent.futures"]
+
+
+def imported(statement: str) -> dict:
+    """
+    Run a statement in a fresh interpreter, reporting every module it imported along with its cumulative import time
+    (in microseconds) and whether it was imported at the top level, as measured by -X importtime.
+    """
+    result = run([executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True)
+
+    times = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = (int(cumulative), not name[1:].startswith(" "))
+
+    return times
+
+
+def test_LazyPackage():
+
+    # importing the package itself imports none of its submodules
+    times = imported("import do")
+    assert "do" in times
+    assert not any(name.startswith("do.") for name in times)
+
+
+def test_DeferredDependencies():
+
+    for statement in ["from do import API", "from do.deconfounding.Backdoor import backdoors", "from do.core.Model import from_path"]:
+        times = imported(statement)
+        assert not [name for name in deferred if name in times], statement
+
+    # and are imported on first use
+    times = imported(f"from do import API; API().instantiate_model({str(model_path / 'pearl-3.4.yml')!r})")
+    assert "yaml" in times
+
+
+def test_ImportTime():
+
+    # a generous bound, which importing numpy and loguru alone would exceed on most machines
+    times = imported("from do import API")
+    assert sum(cumulative for name, (cumulative, top) in times.items() if top and name.startswith("do")) < 500_000